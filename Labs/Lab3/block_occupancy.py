@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lab 3: DAB Block Occupancy Detector
+เป้าหมาย: ตรวจว่า DAB block ไหนใน Band III มีสัญญาณ จาก spectrum ครั้งเดียว (ไม่ต้องวน peak ทีละจุด)
+
+- สร้าง mask 1.536 MHz ของทุก block ครั้งเดียว แล้วรวม power ด้วย matrix multiply
+  (blocks x bins) @ (bins x sweeps) - รองรับทั้ง spectrum เดียวและ matrix เวลา x ความถี่
+- Score ต่อ block:
+  * snr_db      : power ใน block เทียบกับ shoulder (ช่อง guard ระหว่าง block)
+  * flatness    : spectral flatness ใน block (OFDM ของ DAB แบนราบ ~1, carrier เดี่ยว ~0)
+  * shoulder_db : ขอบใน block เทียบกับนอก block (DAB ตกชันที่ขอบ ±768 kHz)
+- หา block จากความถี่ด้วย sorted index + bisect
+- ใช้เป็น pre-filter ของ scanner ใน Lab 4: สแกนเฉพาะ block ที่มีสัญญาณ
+
+Usage:
+python3 block_occupancy.py                  # sweep Band III (band_sweep.py) แล้วแสดงตาราง
+
+Dependencies:
+pip install numpy pyrtlsdr
+"""
+
+import bisect
+
+import numpy as np
+
+from channelizer import DAB_BANDWIDTH, DAB_CHANNELS
+
+OCCUPANCY_FIELDS = [
+    ('block', 'U4'), ('frequency_mhz', 'f8'), ('coverage', 'f4'),
+    ('power_db', 'f4'), ('noise_db', 'f4'), ('snr_db', 'f4'),
+    ('flatness', 'f4'), ('shoulder_db', 'f4'), ('duty', 'f4'), ('occupied', '?')
+]
+
+class BlockIndex:
+    """ตาราง block เรียงตามความถี่ สำหรับค้นหาด้วย bisect"""
+
+    def __init__(self, channels=DAB_CHANNELS):
+        ordered = sorted(channels.items(), key=lambda item: item[1])
+        self.names = [name for name, _ in ordered]
+        self.frequencies_mhz = [frequency for _, frequency in ordered]
+
+    def __len__(self):
+        return len(self.names)
+
+    def lookup(self, frequency_mhz, tolerance_khz=500):
+        """block ที่ใกล้ที่สุด (name, frequency_mhz, error_khz) หรือ None ถ้าห่างเกิน tolerance"""
+        position = bisect.bisect_left(self.frequencies_mhz, frequency_mhz)
+        best = None
+        for index in (position - 1, position):
+            if 0 <= index < len(self.names):
+                error_khz = abs(frequency_mhz - self.frequencies_mhz[index]) * 1000
+                if error_khz <= tolerance_khz and (best is None or error_khz < best[2]):
+                    best = (self.names[index], self.frequencies_mhz[index], error_khz)
+        return best
+
+    def blocks_in_range(self, low_mhz, high_mhz):
+        """ชื่อ block ทั้งหมดที่ความถี่กลางอยู่ในช่วง [low_mhz, high_mhz]"""
+        start = bisect.bisect_left(self.frequencies_mhz, low_mhz)
+        stop = bisect.bisect_right(self.frequencies_mhz, high_mhz)
+        return self.names[start:stop]
+
+class BlockOccupancyDetector:
+    """
+    ตรวจ occupancy ของทุก DAB block จาก power spectrum (dB) ในครั้งเดียว
+
+    edge_width: ความกว้างของขอบใน block ที่ใช้เทียบกับ shoulder
+    guard: ระยะห่างจากขอบ block ก่อนเริ่ม shoulder (ข้าม roll-off ของสัญญาณ)
+    shoulder_width: ความกว้างของ shoulder แต่ละข้าง (ช่อง guard ระหว่าง block กว้าง 176 kHz)
+    """
+
+    def __init__(self, channels=DAB_CHANNELS, bandwidth=DAB_BANDWIDTH,
+                 edge_width=100e3, guard=20e3, shoulder_width=60e3,
+                 snr_threshold=6.0, flatness_threshold=0.5, shoulder_threshold=3.0):
+        self.index = BlockIndex(channels)
+        self.centers_hz = np.array(self.index.frequencies_mhz) * 1e6
+        self.bandwidth = bandwidth
+        self.edge_width = edge_width
+        self.guard = guard
+        self.shoulder_width = shoulder_width
+        self.snr_threshold = snr_threshold
+        self.flatness_threshold = flatness_threshold
+        self.shoulder_threshold = shoulder_threshold
+        self._masks = {}
+
+    def build_masks(self, frequencies_hz):
+        """
+        Mask (blocks x bins) ของ in-band, ขอบใน block และ shoulder นอก block
+
+        Cache ตามแกนความถี่ - sweep ซ้ำด้วยค่าเดิมไม่ต้องสร้างใหม่
+        """
+        key = (len(frequencies_hz), float(frequencies_hz[0]), float(frequencies_hz[-1]))
+        if key in self._masks:
+            return self._masks[key]
+
+        # ระยะจากกลาง block ของทุก bin: (blocks x bins)
+        offset = np.abs(frequencies_hz[np.newaxis, :] - self.centers_hz[:, np.newaxis])
+        half = self.bandwidth / 2
+
+        in_band = offset <= half
+        edge = in_band & (offset >= half - self.edge_width)
+        shoulder = ((offset > half + self.guard) &
+                    (offset <= half + self.guard + self.shoulder_width))
+
+        # block ที่ spectrum ครอบคลุมไม่ครบ ให้ coverage < 1
+        bin_width = abs(frequencies_hz[1] - frequencies_hz[0]) if len(frequencies_hz) > 1 else 1.0
+        coverage = np.minimum(1.0, in_band.sum(axis=1) * bin_width / self.bandwidth)
+
+        masks = tuple(m.astype(np.float32) for m in (in_band, edge, shoulder)) + (coverage,)
+        self._masks = {key: masks}
+        return masks
+
+    @staticmethod
+    def _masked_mean(mask, values):
+        """ค่าเฉลี่ยของ values (bins x sweeps) ภายใต้ mask (blocks x bins) - NaN ถ้า mask ว่าง"""
+        counts = mask.sum(axis=1)[:, np.newaxis]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (mask @ values) / counts
+
+    def detect(self, frequencies_hz, power_db):
+        """
+        ตาราง occupancy ของทุก block (numpy structured array เรียงตามความถี่)
+
+        power_db: spectrum เดียว (bins) หรือ matrix (sweeps x bins) เช่นจาก rtl_power log
+        ค่า dB เป็นค่าเฉลี่ยทุก sweep, duty คือสัดส่วน sweep ที่ block มีสัญญาณ
+        """
+        frequencies_hz = np.asarray(frequencies_hz, dtype=np.float64)
+        power_db = np.asarray(power_db, dtype=np.float32)
+        sweeps = power_db.reshape(-1, len(frequencies_hz))
+
+        # bin ที่ไม่มีข้อมูล (tile ที่อ่านไม่สำเร็จ) ถือเป็น noise floor - NaN จะลามทั้ง matrix multiply
+        finite = np.isfinite(sweeps)
+        if not finite.all():
+            sweeps = np.where(finite, sweeps, np.min(sweeps[finite]) if finite.any() else -100.0)
+
+        in_band, edge, shoulder, coverage = self.build_masks(frequencies_hz)
+
+        # (bins x sweeps) - power แบบ linear สำหรับเฉลี่ย และ log สำหรับ geometric mean
+        linear = np.power(10.0, sweeps.T / 10.0, dtype=np.float32)
+        log_power = sweeps.T * np.float32(np.log(10) / 10)
+
+        band_power = self._masked_mean(in_band, linear)
+        edge_power = self._masked_mean(edge, linear)
+        shoulder_power = self._masked_mean(shoulder, linear)
+        geometric = np.exp(self._masked_mean(in_band, log_power))
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            band_db = 10 * np.log10(band_power)
+            noise_db = 10 * np.log10(shoulder_power)
+            snr_db = band_db - noise_db
+            flatness = geometric / band_power
+            shoulder_db = 10 * np.log10(edge_power) - noise_db
+
+        occupied = ((snr_db >= self.snr_threshold) &
+                    (flatness >= self.flatness_threshold) &
+                    (shoulder_db >= self.shoulder_threshold) &
+                    (coverage[:, np.newaxis] >= 0.9))
+
+        table = np.zeros(len(self.index), dtype=OCCUPANCY_FIELDS)
+        table['block'] = self.index.names
+        table['frequency_mhz'] = self.index.frequencies_mhz
+        table['coverage'] = coverage
+        with np.errstate(invalid='ignore', divide='ignore'):
+            table['power_db'] = 10 * np.log10(np.mean(band_power, axis=1))
+            table['noise_db'] = 10 * np.log10(np.mean(shoulder_power, axis=1))
+        table['snr_db'] = np.mean(snr_db, axis=1)
+        table['flatness'] = np.mean(flatness, axis=1)
+        table['shoulder_db'] = np.mean(shoulder_db, axis=1)
+        table['duty'] = np.mean(occupied, axis=1)
+        table['occupied'] = table['duty'] >= 0.5
+        return table
+
+    def occupied_blocks(self, frequencies_hz, power_db):
+        """รายการ (block, frequency_mhz) ที่มีสัญญาณ - ใช้เป็น pre-filter ของ scanner"""
+        table = self.detect(frequencies_hz, power_db)
+        return [(str(row['block']), float(row['frequency_mhz'])) for row in table[table['occupied']]]
+
+def print_table(table):
+    """แสดงตาราง occupancy"""
+    print(f"{'Block':>5s} {'MHz':>8s} {'Power':>7s} {'SNR':>6s} {'Flat':>5s} {'Shldr':>6s} {'Duty':>5s}")
+    for row in table:
+        marker = " <- DAB" if row['occupied'] else ""
+        print(f"{row['block']:>5s} {row['frequency_mhz']:8.3f} {row['power_db']:7.1f} "
+              f"{row['snr_db']:6.1f} {row['flatness']:5.2f} {row['shoulder_db']:6.1f} "
+              f"{row['duty']:5.2f}{marker}")
+
+def main():
+    """Sweep Band III แล้วแสดงตาราง occupancy"""
+    print("=== Lab 3: DAB Block Occupancy ===")
+
+    from band_sweep import BandSweeper
+
+    try:
+        frequencies, power_db = BandSweeper().sweep()
+    except Exception as e:
+        print(f"Sweep error: {e}")
+        return
+
+    detector = BlockOccupancyDetector()
+    print_table(detector.detect(frequencies, power_db))
+
+if __name__ == "__main__":
+    main()
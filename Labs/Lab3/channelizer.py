@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lab 3: DAB Channelizer (แยกหลาย DAB block จาก capture ที่กว้างกว่า)
+เป้าหมาย: dongle ตัวเดียวรับได้หลาย block ที่อยู่ติดกันใน Band III
+
+- รับ I/Q ที่ sample rate สูงกว่า 2.048 Msps (เช่น 2.4 - 3.2 Msps หรือไฟล์ที่บันทึกไว้)
+- เลื่อนแต่ละ block ลง baseband ด้วย NCO (phase ต่อเนื่องข้าม block)
+- กรอง 1.536 MHz และ resample เป็น 2.048 Msps ด้วย polyphase resampler (L/M)
+- เก็บ filter state ระหว่าง block - ต่อ stream ได้ไม่มีรอยต่อ
+- คำนวณแบบ vectorized: ทุก L outputs ใช้ input ใหม่ M samples จึงเขียนเป็น
+  matrix multiply เดียว (frames x input window) @ (input window x L phases)
+
+Usage:
+python3 channelizer.py wideband.cu8 12B 12C        # แยก block เป็นไฟล์ cf32
+python3 channelizer.py --benchmark 3200000
+
+Dependencies:
+pip install numpy
+"""
+
+import sys
+import time
+from fractions import Fraction
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from iq_file import IQFileReader, write_metadata
+
+DAB_SAMPLE_RATE = 2048000   # sample rate มาตรฐานของ DAB demodulator
+DAB_BANDWIDTH = 1536000     # ความกว้างของ ensemble
+DAB_CHANNEL_SPACING = 1712000
+
+# ความถี่ DAB Band III (MHz) - ตารางเดียวกับ Lab 2
+DAB_CHANNELS = {
+    '5A': 174.928, '5B': 176.640, '5C': 178.352, '5D': 180.064,
+    '6A': 181.936, '6B': 183.648, '6C': 185.360, '6D': 187.072,
+    '7A': 188.928, '7B': 190.640, '7C': 192.352, '7D': 194.064,
+    '8A': 195.936, '8B': 197.648, '8C': 199.360, '8D': 201.072,
+    '9A': 202.928, '9B': 204.640, '9C': 206.352, '9D': 208.064,
+    '10A': 209.936, '10B': 211.648, '10C': 213.360, '10D': 215.072,
+    '11A': 216.928, '11B': 218.640, '11C': 220.352, '11D': 222.064,
+    '12A': 223.936, '12B': 225.648, '12C': 227.360, '12D': 229.072,
+    '13A': 230.784, '13B': 232.496, '13C': 234.208, '13D': 235.776,
+    '13E': 237.488, '13F': 239.200
+}
+
+def channel_frequency(channel):
+    """แปลงชื่อ block (เช่น '12B') หรือความถี่ (MHz/Hz) เป็น Hz"""
+    if isinstance(channel, str) and channel.upper() in DAB_CHANNELS:
+        return int(round(DAB_CHANNELS[channel.upper()] * 1e6))
+
+    frequency = float(channel)
+    return int(round(frequency * 1e6)) if frequency < 1e4 else int(frequency)
+
+def plan_tuning(channel_frequencies, sample_rate, margin=0.9):
+    """
+    หาความถี่กลางที่ครอบคลุมทุก block และตรวจว่าอยู่ในแบนด์ที่ใช้งานได้
+
+    margin: สัดส่วนของ Nyquist ที่ถือว่าใช้ได้ (ขอบแบนด์ของ RTL-SDR มี roll-off)
+    คืนค่า (center_frequency, fits)
+    """
+    low = min(channel_frequencies) - DAB_BANDWIDTH / 2
+    high = max(channel_frequencies) + DAB_BANDWIDTH / 2
+    center = int(round((low + high) / 2))
+    fits = (high - low) / 2 <= sample_rate / 2 * margin
+    return center, fits
+
+def design_lowpass(num_taps, cutoff, sample_rate, beta=8.0):
+    """ออกแบบ FIR low-pass แบบ windowed-sinc (Kaiser window) ไม่ต้องใช้ scipy"""
+    n = np.arange(num_taps) - (num_taps - 1) / 2
+    taps = np.sinc(2 * cutoff / sample_rate * n) * np.kaiser(num_taps, beta)
+    return taps / np.sum(taps)
+
+class PolyphaseResampler:
+    """
+    Rational resampler (L/M) แบบ polyphase พร้อม anti-alias filter ในตัว
+
+    ทำงานแบบ streaming: process() เรียกซ้ำกับ block ต่อๆ กันได้
+    ผลลัพธ์ต่อกันเหมือนประมวลผลทั้ง stream ในครั้งเดียว
+    """
+
+    def __init__(self, input_rate, output_rate=DAB_SAMPLE_RATE, passband=DAB_BANDWIDTH / 2,
+                 stopband=None, attenuation_db=60, max_denominator=1000):
+        ratio = Fraction(int(output_rate), int(input_rate)).limit_denominator(max_denominator)
+        self.up = ratio.numerator
+        self.down = ratio.denominator
+        self.input_rate = input_rate
+        self.output_rate = input_rate * self.up / self.down
+
+        # stopband: ขอบของ block ข้างเคียง (1.712 - 0.768 MHz) แต่ไม่เกิน Nyquist ของ output
+        if stopband is None:
+            stopband = min(DAB_CHANNEL_SPACING - passband, min(input_rate, self.output_rate) / 2)
+        if stopband <= passband:
+            raise ValueError("Sample rate too low for the requested passband")
+
+        # filter ต้นแบบทำงานที่ rate L * input_rate
+        prototype_rate = self.up * input_rate
+        transition = (stopband - passband) / prototype_rate
+        beta = 0.1102 * (attenuation_db - 8.7) if attenuation_db > 50 else 5.0
+        num_taps = int(np.ceil((attenuation_db - 8) / (2.285 * 2 * np.pi * transition))) + 1
+        self.taps_per_phase = int(np.ceil(num_taps / self.up))
+        num_taps = self.taps_per_phase * self.up
+
+        taps = design_lowpass(num_taps, (passband + stopband) / 2, prototype_rate, beta) * self.up
+
+        # phases[p, j] = taps[p + j*L] กลับลำดับ เพื่อใช้กับ window ที่เรียงจากเก่าไปใหม่
+        self.phases = taps.reshape(self.taps_per_phase, self.up).T[:, ::-1].astype(np.complex64)
+        self.phases = np.ascontiguousarray(self.phases)
+        # จำนวน output ต่อ frame: ครบรอบ phase (L) และอย่างน้อย 32 เพื่อให้ matrix กว้างพอสำหรับ BLAS
+        self.frame_outputs = self.up * -(-32 // self.up)
+        self.frame_step = self.frame_outputs // self.up * self.down  # input ที่ใช้ต่อ frame
+        self.frame_matrices = {}
+        self.reset()
+
+    def reset(self):
+        """ล้าง filter state (history = 0)"""
+        self.history = np.zeros(self.taps_per_phase - 1, dtype=np.complex64)
+        # เวลาของ output ถัดไป (หน่วย upsampled sample) นับจากต้น buffer (history + block)
+        self.next_time = (self.taps_per_phase - 1) * self.up
+
+    @property
+    def delay(self):
+        """Group delay ของ filter (samples ที่ output rate)"""
+        return (self.taps_per_phase * self.up - 1) / 2 / self.down
+
+    def frame_matrix(self, start_phase):
+        """
+        Matrix (2S x 2R) ที่คำนวณ R = frame_outputs outputs ติดกันจาก input window S samples
+
+        ทุก L outputs ใช้ input เพิ่ม M samples และวน phase ครบรอบ จึงใช้ matrix เดียว
+        ได้ทั้ง block (ขึ้นกับ phase ของ output แรกเท่านั้น จึง cache ไว้)
+        ใช้ float32 แบบ I/Q interleaved เพื่อให้ BLAS ทำงานกับ strided window ได้โดยตรง
+        """
+        if start_phase in self.frame_matrices:
+            return self.frame_matrices[start_phase]
+
+        L, M, T, R = self.up, self.down, self.taps_per_phase, self.frame_outputs
+        times = start_phase + np.arange(R) * M
+        offsets = times // L  # input index ของแต่ละ output เทียบกับ output แรก
+        window = offsets[-1] + T
+
+        matrix = np.zeros((window, 2, 2 * R), dtype=np.float32)
+        for r in range(R):
+            taps = self.phases[times[r] % L].real
+            matrix[offsets[r]:offsets[r] + T, 0, 2 * r] = taps      # I -> I
+            matrix[offsets[r]:offsets[r] + T, 1, 2 * r + 1] = taps  # Q -> Q
+
+        result = (matrix.reshape(2 * window, 2 * R), window)
+        self.frame_matrices[start_phase] = result
+        return result
+
+    def process(self, block):
+        """Resample หนึ่ง block (complex64) คืน output ที่ output_rate"""
+        block = np.asarray(block, dtype=np.complex64)
+        buffer = np.concatenate((self.history, block))
+        L, M, T = self.up, self.down, self.taps_per_phase
+
+        # จำนวน output ที่ input index ยังไม่เกินท้าย buffer
+        end_time = len(buffer) * L
+        num_out = max(0, -(-(end_time - self.next_time) // M))
+        output = np.empty(num_out, dtype=np.complex64)
+
+        start_phase, first_index = self.next_time % L, self.next_time // L
+        matrix, window = self.frame_matrix(start_phase)
+        start = first_index - T + 1
+
+        # จำนวน frame ที่ input window อยู่ใน buffer ครบ
+        R, step = self.frame_outputs, self.frame_step
+        num_frames = min(num_out // R, max(0, (len(buffer) - start - window) // step + 1))
+        if num_frames:
+            samples = sliding_window_view(buffer.view(np.float32), 2 * window)
+            frames = samples[2 * start:2 * (start + (num_frames - 1) * step) + 1:2 * step]
+            output[:num_frames * R] = (frames @ matrix).view(np.complex64).reshape(-1)
+
+        # outputs ที่เหลือ (น้อยกว่าหนึ่ง frame) คำนวณทีละตัว
+        for k in range(num_frames * R, num_out):
+            t = self.next_time + k * M
+            index = t // L
+            output[k] = buffer[index - T + 1:index + 1] @ self.phases[t % L]
+
+        # เก็บ T-1 samples สุดท้ายไว้เป็น history ของ block ถัดไป
+        self.next_time += num_out * M - (len(buffer) - (T - 1)) * L
+        self.history = buffer[len(buffer) - (T - 1):].copy()
+        return output
+
+class DABChannelizer:
+    """
+    แยกหลาย DAB block จาก capture ที่กว้างกว่า ออกเป็น stream 2.048 Msps แยกกัน
+
+    ตัวอย่าง:
+        channelizer = DABChannelizer(3200000, center, [225648000, 227360000])
+        for block in rtl.stream_samples():
+            outputs = channelizer.process(block)  # {frequency: complex64 array}
+    """
+
+    def __init__(self, input_rate, center_frequency, channel_frequencies,
+                 output_rate=DAB_SAMPLE_RATE, attenuation_db=60):
+        self.input_rate = input_rate
+        self.center_frequency = center_frequency
+        self.output_rate = output_rate
+        self.channels = []
+
+        for frequency in channel_frequencies:
+            offset = frequency - center_frequency
+            if abs(offset) + DAB_BANDWIDTH / 2 > input_rate / 2:
+                print(f"Warning: block at {frequency/1e6:.3f} MHz extends beyond "
+                      f"the captured bandwidth (offset {offset/1e3:+.0f} kHz)")
+            self.channels.append({
+                'frequency': frequency,
+                'offset': offset,
+                # NCO: phase ต่อ sample (รอบ) และ phase ปัจจุบันที่ต่อเนื่องข้าม block
+                'step': -offset / input_rate,
+                'phase': 0.0,
+                'resampler': PolyphaseResampler(input_rate, output_rate,
+                                                attenuation_db=attenuation_db)
+            })
+
+        self.nco_cache = {}
+
+    def reset(self):
+        """ล้าง state ของ NCO และ filter ทุก channel"""
+        for channel in self.channels:
+            channel['phase'] = 0.0
+            channel['resampler'].reset()
+
+    def mix(self, block, channel):
+        """เลื่อน block ลง baseband ด้วย NCO ของ channel นี้"""
+        if channel['offset'] == 0:
+            return block
+
+        # NCO ของ block ความยาวนี้ที่ phase 0 (คำนวณครั้งเดียว) คูณด้วย phase เริ่มต้นของ block
+        key = (channel['frequency'], len(block))
+        if key not in self.nco_cache:
+            cycles = channel['step'] * np.arange(len(block), dtype=np.float64)
+            self.nco_cache[key] = np.exp(2j * np.pi * cycles).astype(np.complex64)
+
+        mixed = block * self.nco_cache[key]
+        mixed *= np.complex64(np.exp(2j * np.pi * channel['phase']))
+        channel['phase'] = (channel['phase'] + channel['step'] * len(block)) % 1.0
+        return mixed
+
+    def process(self, block):
+        """ประมวลผลหนึ่ง block คืน {center frequency ของ block: complex64 ที่ 2.048 Msps}"""
+        block = np.asarray(block, dtype=np.complex64)
+        return {channel['frequency']: channel['resampler'].process(self.mix(block, channel))
+                for channel in self.channels}
+
+def channelize_file(filename, channels, block_size=262144, base_filename="channel"):
+    """แยก block จากไฟล์ wideband เป็นไฟล์ cf32 (พร้อม sidecar) ของแต่ละ block"""
+    with IQFileReader(filename) as reader:
+        if not reader.center_frequency:
+            raise ValueError("Center frequency unknown - record with a .sigmf-meta sidecar")
+
+        frequencies = [channel_frequency(channel) for channel in channels]
+        channelizer = DABChannelizer(reader.sample_rate, reader.center_frequency, frequencies)
+
+        outputs = {}
+        for frequency in frequencies:
+            output_name = f"{base_filename}_{frequency/1e6:.3f}MHz.cf32"
+            outputs[frequency] = open(output_name, 'wb')
+            write_metadata(output_name, channelizer.output_rate, frequency, 'cf32',
+                           gain=reader.gain)
+            print(f"{frequency/1e6:.3f} MHz (offset {(frequency - reader.center_frequency)/1e3:+.0f} kHz)"
+                  f" -> {output_name}")
+
+        start_time = time.perf_counter()
+        try:
+            for block in reader.iter_blocks(block_size):
+                for frequency, samples in channelizer.process(block).items():
+                    samples.tofile(outputs[frequency])
+        finally:
+            for output in outputs.values():
+                output.close()
+
+        elapsed = time.perf_counter() - start_time
+        print(f"Processed {reader.duration:.1f} s of signal in {elapsed:.2f} s "
+              f"({reader.duration / elapsed:.1f}x real-time)" if elapsed > 0 else "")
+
+def benchmark(input_rate=3200000, num_channels=2, seconds=2.0, block_size=262144):
+    """วัดความเร็ว channelizer เทียบกับ real-time"""
+    center = 226504000
+    frequencies = [center + (i - (num_channels - 1) / 2) * DAB_CHANNEL_SPACING
+                   for i in range(num_channels)]
+    channelizer = DABChannelizer(input_rate, center, frequencies)
+    resampler = channelizer.channels[0]['resampler']
+
+    block = (np.random.standard_normal(block_size) +
+             1j * np.random.standard_normal(block_size)).astype(np.complex64)
+    num_blocks = max(1, int(seconds * input_rate / block_size))
+
+    start_time = time.perf_counter()
+    for _ in range(num_blocks):
+        channelizer.process(block)
+    elapsed = time.perf_counter() - start_time
+
+    realtime = num_blocks * block_size / input_rate / elapsed
+    print(f"Input {input_rate/1e6:.3f} Msps -> {num_channels} x {DAB_SAMPLE_RATE/1e6:.3f} Msps "
+          f"(L/M = {resampler.up}/{resampler.down}, {resampler.taps_per_phase} taps/phase)")
+    print(f"Throughput: {realtime:.1f}x real-time "
+          f"({100 / realtime:.1f}% of one core)")
+    return realtime
+
+def main():
+    """ฟังก์ชันหลัก"""
+    print("=== Lab 3: DAB Channelizer ===")
+
+    args = sys.argv[1:]
+    if args and args[0] == '--benchmark':
+        input_rate = int(float(args[1])) if len(args) > 1 else 3200000
+        benchmark(input_rate)
+        return
+
+    if len(args) < 2:
+        print("Usage: python3 channelizer.py <wideband file> <block> [block ...]")
+        print("Example: python3 channelizer.py wideband_000.cu8 12B 12C")
+        print("         python3 channelizer.py --benchmark 3200000")
+        return
+
+    try:
+        channelize_file(args[0], args[1:])
+    except Exception as e:
+        print(f"Error: {e}")
+
+if __name__ == "__main__":
+    main()
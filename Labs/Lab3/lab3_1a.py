@@ -12,23 +12,44 @@ import numpy as np
 from rtlsdr import RtlSdr
 import time
 import sys
-import matplotlib.pyplot as plt
+import queue
+import threading
+from iq_file import iq_bytes_to_complex64, write_metadata
+from iq_recorder import IQRecorder
+from capture_stats import CaptureStats
+from channelizer import DABChannelizer
+import fft_backend
+from spectrum import power_db, welch_psd
+from plot_worker import get_renderer
 
 class RTLSDRDataAcquisition:
-    def __init__(self):
+    def __init__(self, device_index=0):
         self.sdr = None
+        self.device_index = device_index  # ลำดับ dongle เมื่อต่อหลายตัว
         # ความถี่ DAB+ Thailand (185.360 MHz - Khon Kane/Mhasarakam Testing)
         self.frequency = 185360000  # Hz
         self.sample_rate = 2048000  # 2.048 MHz สำหรับ DAB+
         self.gain = 'auto'  # ใช้ auto gain แล้วปรับหากจำเป็น
 
+        # ค่าเริ่มต้นสำหรับ streaming mode
+        self.block_size = 262144  # samples ต่อ block (~128 ms ที่ 2.048 Msps)
+        self.queue_depth = 8      # จำนวน block สูงสุดที่รอใน queue
+        self.dropped_blocks = 0
+
+        # Fast retune
+        self.settle_time = 0.005  # วินาทีที่ทิ้งหลังเปลี่ยนความถี่ (PLL settling)
+        self.retune_latencies = []
+
+        # สถิติ samples ที่ได้รับ/หาย, read latency (หรือ callback interval), queue high-water
+        self.stats = CaptureStats(self.sample_rate, name=f"rtlsdr {device_index}")
+
     def setup_rtlsdr(self):
         """
         ติดตั้งและตั้งค่า RTL-SDR
         """
         try:
             # สร้าง RtlSdr object
-            self.sdr = RtlSdr()
+            self.sdr = RtlSdr(self.device_index)
 
             # ตั้งค่า sample rate
             self.sdr.sample_rate = self.sample_rate
@@ -52,7 +73,7 @@ class RTLSDRDataAcquisition:
             print(f"Gain: {self.gain}")
 
             # แสดงข้อมูล device
-            print(f"Device: {self.sdr.get_tuner_type()}")
+            print(f"Device {self.device_index}: {self.sdr.get_tuner_type()}")
 
         except Exception as e:
             print(f"Error setting up RTL-SDR: {e}")
@@ -77,12 +98,15 @@ class RTLSDRDataAcquisition:
             print(f"Number of samples: {num_samples:,}")
 
             # รับ samples จาก RTL-SDR
+            self.stats.reset(self.sample_rate)
             start_time = time.time()
             samples = self.sdr.read_samples(num_samples)
             capture_time = time.time() - start_time
+            self.stats.record_block(len(samples), capture_time)
 
             print(f"Capture completed in {capture_time:.2f} seconds")
             print(f"Actual samples received: {len(samples):,}")
+            print(self.stats.format_summary())
 
             # คำนวณ signal strength (RMS)
             signal_strength = np.sqrt(np.mean(np.abs(samples)**2))
@@ -93,7 +117,9 @@ class RTLSDRDataAcquisition:
 
             # บันทึกเป็นไฟล์ binary
             filename = "raw_iq_data.bin"
-            samples.tofile(filename)
+            samples.astype(np.complex64).tofile(filename)
+            write_metadata(filename, self.sample_rate, self.frequency, 'cf32',
+                           gain=self.gain, start_time=start_time)
 
             print(f"Saved {len(samples)} samples to {filename}")
             print(f"File size: {len(samples) * 8} bytes")  # complex64 = 8 bytes per sample
@@ -104,6 +130,206 @@ class RTLSDRDataAcquisition:
             print(f"Error capturing samples: {e}")
             return None
 
+    def read_block(self, num_samples):
+        """อ่าน num_samples samples แบบ sync เป็น complex64 (ปัดขึ้นเป็นพหุคูณของ 256)"""
+        num_bytes = ((num_samples * 2 + 511) // 512) * 512  # USB transfer ต้องเป็นพหุคูณของ 512 bytes
+        raw = np.frombuffer(self.sdr.read_bytes(num_bytes), dtype=np.uint8)
+        return iq_bytes_to_complex64(raw)[:num_samples]
+
+    def retune(self, frequency, num_samples=65536, settle_time=None):
+        """
+        เปลี่ยนความถี่บน device ที่เปิดอยู่ แล้วคืน block แรกที่ "สะอาด"
+
+        ล้าง USB buffer และทิ้ง samples ช่วง PLL settling เท่านั้น
+        ไม่ต้องปิด/เปิด device ใหม่ทุกความถี่
+        num_samples: ความยาวที่ต้องการ - ส่งความยาว capture ทั้งหมดแล้วใช้ค่าที่คืนได้เลย
+        """
+        if not self.sdr:
+            print("RTL-SDR not initialized")
+            return None
+
+        settle_time = self.settle_time if settle_time is None else settle_time
+        settle_samples = int(settle_time * self.sample_rate)
+
+        try:
+            start_time = time.perf_counter()
+
+            self.sdr.center_freq = frequency
+            self.frequency = frequency
+
+            # ทิ้งข้อมูลความถี่เก่าที่ค้างใน USB buffer
+            self.sdr.reset_buffer()
+            if settle_samples > 0:
+                self.read_block(settle_samples)
+
+            samples = self.read_block(num_samples)
+            latency = time.perf_counter() - start_time
+            self.retune_latencies.append(latency)
+
+            print(f"Retuned to {frequency/1e6:.3f} MHz in {latency*1000:.1f} ms "
+                  f"(discarded {settle_samples:,} settling samples)")
+            return samples
+
+        except Exception as e:
+            print(f"Error retuning: {e}")
+            return None
+
+    def stream_samples(self, num_blocks=None, block_size=None, queue_depth=None):
+        """
+        รับ I/Q samples แบบ streaming เป็น complex64 blocks ขนาดคงที่ (generator)
+
+        ใช้ read_bytes_async ของ pyrtlsdr ใน background thread แล้วส่ง block
+        ผ่าน queue ที่จำกัดขนาด หน่วยความจำจึงคงที่ไม่ว่าจะรับนานเท่าไร
+        ถ้า consumer ช้ากว่าสัญญาณ block ที่เก่าที่สุดใน queue จะถูกทิ้ง (นับใน dropped_blocks)
+        ข้อมูลที่ได้จึงไม่ล้าหลังเกิน queue_depth block
+
+        ตัวอย่าง:
+            for block in rtl.stream_samples(num_blocks=40):
+                process(block)
+        """
+        if not self.sdr:
+            print("RTL-SDR not initialized")
+            return
+
+        block_size = block_size or self.block_size
+        queue_depth = queue_depth or self.queue_depth
+        block_queue = queue.Queue(maxsize=queue_depth)
+        self.dropped_blocks = 0
+        # async API ไม่บอกเวลาอ่าน USB จริง - บันทึกช่วงห่างระหว่าง callback แทน
+        self.stats.reset(self.sample_rate, latency_label="callback interval")
+        self.stats.set_queue_capacity(queue_depth)
+        last_callback = time.perf_counter()
+
+        def on_bytes(buffer, context):
+            nonlocal last_callback
+            now = time.perf_counter()
+            callback_interval = now - last_callback
+            last_callback = now
+
+            # buffer ใช้ได้เฉพาะใน callback - แปลงเป็น complex64 array ใหม่ทันที
+            block = iq_bytes_to_complex64(np.frombuffer(buffer, dtype=np.uint8))
+            while True:
+                try:
+                    block_queue.put_nowait(block)
+                    break
+                except queue.Full:
+                    # queue เต็ม: ทิ้ง block ที่เก่าที่สุด consumer จึงได้ข้อมูลล่าสุดเสมอ
+                    try:
+                        stale = block_queue.get_nowait()
+                        self.dropped_blocks += 1
+                        self.stats.record_drop(len(stale))
+                    except queue.Empty:
+                        pass
+            self.stats.record_block(len(block), callback_interval, block_queue.qsize())
+
+        def reader():
+            try:
+                self.sdr.read_bytes_async(on_bytes, block_size * 2)
+            except Exception as e:
+                print(f"Async reader error: {e}")
+            finally:
+                block_queue.put(None)  # แจ้ง consumer ว่า stream จบแล้ว
+
+        reader_thread = threading.Thread(target=reader, daemon=True)
+        reader_thread.start()
+
+        blocks_yielded = 0
+        try:
+            while num_blocks is None or blocks_yielded < num_blocks:
+                block = block_queue.get()
+                if block is None:
+                    break
+                yield block
+                blocks_yielded += 1
+        finally:
+            # หยุด async reader เมื่อครบหรือ consumer เลิกใช้ generator
+            try:
+                self.sdr.cancel_read_async()
+            except Exception:
+                pass
+
+            # ระบาย queue เพื่อไม่ให้ reader ค้างที่ put(None)
+            while reader_thread.is_alive():
+                try:
+                    block_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+            if self.dropped_blocks:
+                print(f"Stream dropped {self.dropped_blocks} blocks (consumer too slow)")
+            print(self.stats.format_summary())
+
+    def stream_channels(self, channel_frequencies, num_blocks=None, block_size=None):
+        """
+        รับหลาย DAB block พร้อมกันจาก tuning เดียว (generator)
+
+        ตั้ง sample_rate ให้กว้างกว่า 2.048 Msps (เช่น 3.2 Msps) และ frequency ให้อยู่กลาง
+        block ที่ต้องการก่อนเรียก setup_rtlsdr() - แต่ละรอบคืน {ความถี่: complex64 ที่ 2.048 Msps}
+        """
+        channelizer = DABChannelizer(self.sample_rate, self.frequency, channel_frequencies)
+        for block in self.stream_samples(num_blocks, block_size):
+            yield channelizer.process(block)
+
+    def record_to_disk(self, duration_seconds=60, base_filename="raw_iq",
+                       max_file_size=1073741824):
+        """
+        บันทึก I/Q ลงดิสก์โดยตรงในรูปแบบ cu8 (uint8 I/Q, 2 bytes/sample)
+
+        ข้อมูลไม่ถูกเก็บใน RAM ทั้งหมด จึงบันทึกได้นานเป็นชั่วโมงบน Raspberry Pi
+        คืนค่าสถิติจาก IQRecorder (ไฟล์ที่เขียน, overruns, queue high-water)
+        """
+        if not self.sdr:
+            print("RTL-SDR not initialized")
+            return None
+
+        target_bytes = int(duration_seconds * self.sample_rate) * 2
+        received_bytes = 0
+
+        recorder = IQRecorder(base_filename, max_file_size=max_file_size,
+                              metadata={'sample_rate': self.sample_rate,
+                                        'center_frequency': self.frequency,
+                                        'gain': self.gain})
+        if not recorder.start():
+            return None
+
+        self.stats.reset(self.sample_rate, latency_label="callback interval")
+        last_callback = time.perf_counter()
+
+        def on_bytes(buffer, context):
+            nonlocal received_bytes, last_callback
+            now = time.perf_counter()
+            self.stats.record_block(len(buffer) // 2, now - last_callback,
+                                    recorder.filled_buffers.qsize())
+            last_callback = now
+
+            raw = np.frombuffer(buffer, dtype=np.uint8)[:target_bytes - received_bytes]
+            recorder.write(raw)
+            received_bytes += len(raw)
+
+            if received_bytes >= target_bytes:
+                self.sdr.cancel_read_async()
+
+        print(f"Recording {duration_seconds} seconds of cu8 data to disk...")
+
+        try:
+            self.sdr.read_bytes_async(on_bytes, self.block_size * 2)
+        except KeyboardInterrupt:
+            print("\nRecording interrupted")
+        except Exception as e:
+            print(f"Error recording samples: {e}")
+        finally:
+            stats = recorder.stop()
+            print(self.stats.format_summary())
+
+        return stats
+
+    def get_capture_stats(self):
+        """
+        สถิติการรับข้อมูลล่าสุด: samples ที่ได้รับเทียบกับที่ควรได้, gaps,
+        latency histogram (read latency หรือ callback interval) และ queue high-water mark
+        """
+        return self.stats.snapshot()
+
     def analyze_spectrum(self, samples):
         """
         วิเคราะห์สเปกตรัมของสัญญาณ
@@ -122,21 +348,10 @@ class RTLSDRDataAcquisition:
                 print("Not enough samples for FFT analysis")
                 return
 
-            # คำนวณ average spectrum
-            spectrum = np.zeros(fft_size)
-            for i in range(num_ffts):
-                start_idx = i * fft_size
-                end_idx = start_idx + fft_size
-                window = np.hanning(fft_size)
-                fft_data = np.fft.fft(samples[start_idx:end_idx] * window)
-                spectrum += np.abs(fft_data)**2
-
-            spectrum = spectrum / num_ffts
-            spectrum_db = 10 * np.log10(spectrum + 1e-12)
-
-            # คำนวณ frequency bins
-            freqs = np.fft.fftfreq(fft_size, 1/self.sample_rate)
-            freqs = freqs + self.frequency  # แปลงเป็น absolute frequency
+            # คำนวณ average spectrum จากทุก frame (Welch แบบ batched, frequency เรียงจากต่ำไปสูง)
+            freqs, spectrum = welch_psd(samples, fft_size, self.sample_rate, self.frequency,
+                                        overlap=0)
+            spectrum_db = power_db(spectrum)
 
             # หาจุดที่มี signal แรงที่สุด
             max_idx = np.argmax(spectrum)
@@ -150,17 +365,11 @@ class RTLSDRDataAcquisition:
             print(f"Frequency range: {freqs[0]/1e6:.3f} - {freqs[-1]/1e6:.3f} MHz")
             print(f"Resolution: {(freqs[1] - freqs[0])/1e3:.1f} kHz")
 
-            # สร้างกราฟ (optional)
+            # สร้างกราฟใน worker process - ไม่หยุด capture ระหว่าง render PNG (optional)
             try:
-                plt.figure(figsize=(12, 6))
-                plt.plot(freqs/1e6, spectrum_db)
-                plt.xlabel('Frequency (MHz)')
-                plt.ylabel('Power (dB)')
-                plt.title(f'Spectrum Analysis - Center: {self.frequency/1e6:.3f} MHz')
-                plt.grid(True)
-                plt.savefig('spectrum_analysis.png', dpi=150, bbox_inches='tight')
-                print("Spectrum plot saved as 'spectrum_analysis.png'")
-                plt.close()
+                get_renderer().submit('spectrum_analysis.png', freqs/1e6, spectrum_db,
+                                      title=f'Spectrum Analysis - Center: {self.frequency/1e6:.3f} MHz')
+                print("Spectrum plot queued: 'spectrum_analysis.png'")
             except Exception as plot_error:
                 print(f"Could not create plot: {plot_error}")
 
@@ -175,33 +384,46 @@ class RTLSDRDataAcquisition:
             self.sdr.close()
             print("RTL-SDR connection closed")
 
-def test_different_frequencies():
-    """ทดสอบความถี่ DAB+ ต่างๆ ในประเทศไทย"""
+def test_different_frequencies(rtl_capture=None):
+    """ทดสอบความถี่ DAB+ ต่างๆ ในประเทศไทย (เปิด device ครั้งเดียว แล้ว retune)"""
     frequencies = {
         'Bangkok/Phuket': 185360000,  # Block 7A
         'Chiang Mai': 195936000,     # Block 8C
     }
 
-    for location, freq in frequencies.items():
-        print(f"\n=== Testing {location} - {freq/1e6:.3f} MHz ===")
-
+    # ใช้ device ที่เปิดอยู่แล้วถ้ามี ไม่ต้องปิด/เปิดใหม่
+    own_device = rtl_capture is None
+    if own_device:
         rtl_capture = RTLSDRDataAcquisition()
-        rtl_capture.frequency = freq
 
-        try:
-            if rtl_capture.setup_rtlsdr():
-                samples = rtl_capture.capture_samples(5)  # 5 seconds test
+    try:
+        if own_device and not rtl_capture.setup_rtlsdr():
+            return
+
+        for location, freq in frequencies.items():
+            print(f"\n=== Testing {location} - {freq/1e6:.3f} MHz ===")
+
+            try:
+                # 5 seconds test - block แรกหลัง retune คือข้อมูลที่ใช้วิเคราะห์
+                samples = rtl_capture.retune(freq, num_samples=5 * rtl_capture.sample_rate)
                 if samples is not None:
                     rtl_capture.analyze_spectrum(samples)
-        except Exception as e:
-            print(f"Error testing {location}: {e}")
-        finally:
+            except Exception as e:
+                print(f"Error testing {location}: {e}")
+
+        if rtl_capture.retune_latencies:
+            latencies = np.array(rtl_capture.retune_latencies) * 1000
+            print(f"\nRetune latency: mean {latencies.mean():.1f} ms, max {latencies.max():.1f} ms")
+    finally:
+        if own_device:
             rtl_capture.cleanup()
 
 def main():
     """ฟังก์ชันหลักสำหรับทดสอบ"""
     print("=== Lab 3 Phase 1a: RTL-SDR Data Acquisition ===")
 
+    fft_backend.load_benchmark()
+
     # สร้าง instance ของ RTLSDRDataAcquisition
     rtl_capture = RTLSDRDataAcquisition()
 
@@ -211,6 +433,12 @@ def main():
             print("Failed to setup RTL-SDR. Exiting.")
             return
 
+        # บันทึกลงดิสก์โดยตรง (cu8) เช่น: python3 lab3_1a.py --record 3600
+        if len(sys.argv) > 1 and sys.argv[1] == "--record":
+            duration = float(sys.argv[2]) if len(sys.argv) > 2 else 60
+            rtl_capture.record_to_disk(duration)
+            return
+
         # รับ samples
         samples = rtl_capture.capture_samples(10)
 
@@ -226,7 +454,7 @@ def main():
 
         # ทดสอบความถี่อื่นๆ หากต้องการ
         if len(sys.argv) > 1 and sys.argv[1] == "--test-all":
-            test_different_frequencies()
+            test_different_frequencies(rtl_capture)
 
     except KeyboardInterrupt:
         print("\nUser interrupted")
@@ -14,6 +14,9 @@ import sys
 import re
 from datetime import datetime
 
+# Parser ของ ETI frame ดิบ (Lab 4/6 import จาก module นี้)
+from eti import ETIFrameParser, print_summary
+
 def load_ensemble_json(channel="6C"):
     """
     โหลดข้อมูล ensemble จาก JSON file ที่ eti-cmdline สร้าง
@@ -66,7 +69,7 @@ def create_service_list(ensemble_data):
                 'ensemble_name': ensemble_name,
                 'ensemble_id': ensemble_id
             },
-            'frame_count': 0,  # ไม่มีข้อมูลจาก JSON
+            'frame_count': 0,  # ไม่มีข้อมูลจาก JSON - main() ใส่จากไฟล์ ETI ถ้ามี
             'services': []
         }
 
@@ -149,6 +152,23 @@ def create_subchannel_info(ensemble_data):
         print(f"Error creating subchannel info: {e}")
         return None
 
+def load_eti_summary(eti_filename="dab_ensemble.eti"):
+    """
+    สรุป header ของทุก frame ในไฟล์ ETI (ถ้ามี) - จำนวน frame, sync/CRC errors, sub-channels
+    """
+    if not os.path.exists(eti_filename):
+        return None
+
+    try:
+        parser = ETIFrameParser()
+        parser.parse_file(eti_filename)
+        print(f"\n=== ETI Frames ({eti_filename}) ===")
+        print_summary(parser.ensemble_info)
+        return parser.ensemble_info
+    except Exception as e:
+        print(f"Error parsing ETI file: {e}")
+        return None
+
 def save_json(data, filename):
     """
     บันทึกข้อมูลเป็น JSON file
@@ -191,7 +211,10 @@ def main():
 
         # สร้าง service list
         service_list = create_service_list(ensemble_data)
+        eti_summary = load_eti_summary()
         if service_list:
+            if eti_summary:
+                service_list['frame_count'] = eti_summary['frames']
             save_json(service_list, "service_list.json")
 
         # สร้าง subchannel info
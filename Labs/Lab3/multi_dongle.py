@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lab 3: Multi-dongle Acquisition Manager (shared-memory ring buffers)
+เป้าหมาย: เปิด RTL-SDR หลายตัว ตัวละ process แล้วส่ง I/Q ผ่าน shared memory
+
+- แต่ละ dongle มี process ของตัวเอง (ไม่ติด GIL ใช้ได้ครบ 4 cores ของ Pi 4)
+- ข้อมูลอยู่ใน multiprocessing.shared_memory ring buffer พร้อม sequence number
+- Process วิเคราะห์ attach เข้า ring แล้วอ่าน block เป็น numpy view ได้โดยไม่ copy
+- Reader ตรวจ sequence number ได้ว่า block ถูกเขียนทับระหว่างอ่านหรือไม่
+
+Usage:
+python3 multi_dongle.py 185.360 195.936            # dongle 0 และ 1
+python3 multi_dongle.py --rtl-tcp 127.0.0.1:1234 127.0.0.1:1235   # ผ่าน rtl_tcp
+
+Dependencies:
+pip install pyrtlsdr numpy
+"""
+
+import multiprocessing as mp
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Header ของ ring (int64 ทั้งหมด)
+HEADER_FIELDS = ['write_seq', 'block_size', 'num_slots', 'sample_rate',
+                 'center_frequency', 'dropped_blocks', 'closed']
+HEADER_SIZE = len(HEADER_FIELDS) * 8
+
+class SharedIQRing:
+    """
+    Ring buffer ของ complex64 blocks ใน shared memory (writer 1 ตัว, reader หลายตัว)
+
+    Layout: [header][slot_seq x num_slots (int64)][data: num_slots x block_size complex64]
+    slot_seq[i] = sequence number ของ block ที่อยู่ใน slot i (-1 ระหว่างเขียน)
+    """
+
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.owner = owner
+        self.name = shm.name
+
+        self.header = np.ndarray(len(HEADER_FIELDS), dtype=np.int64, buffer=shm.buf)
+        self.block_size = int(self.header[HEADER_FIELDS.index('block_size')])
+        self.num_slots = int(self.header[HEADER_FIELDS.index('num_slots')])
+
+        self.slot_seq = np.ndarray(self.num_slots, dtype=np.int64, buffer=shm.buf,
+                                   offset=HEADER_SIZE)
+        self.data = np.ndarray((self.num_slots, self.block_size), dtype=np.complex64,
+                               buffer=shm.buf, offset=HEADER_SIZE + self.num_slots * 8)
+
+    @classmethod
+    def create(cls, block_size=262144, num_slots=16, sample_rate=2048000,
+               center_frequency=0, name=None):
+        """สร้าง ring ใหม่ (ฝั่ง writer/manager)"""
+        size = HEADER_SIZE + num_slots * 8 + num_slots * block_size * 8
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        header = np.ndarray(len(HEADER_FIELDS), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[HEADER_FIELDS.index('block_size')] = block_size
+        header[HEADER_FIELDS.index('num_slots')] = num_slots
+        header[HEADER_FIELDS.index('sample_rate')] = sample_rate
+        header[HEADER_FIELDS.index('center_frequency')] = center_frequency
+        del header
+
+        ring = cls(shm, owner=True)
+        ring.slot_seq[:] = -1
+        return ring
+
+    @classmethod
+    def attach(cls, name):
+        """เชื่อมต่อกับ ring ที่มีอยู่แล้ว (ฝั่ง reader)"""
+        return cls(shared_memory.SharedMemory(name=name))
+
+    def get(self, field):
+        """อ่านค่าใน header"""
+        return int(self.header[HEADER_FIELDS.index(field)])
+
+    def set(self, field, value):
+        """เขียนค่าใน header"""
+        self.header[HEADER_FIELDS.index(field)] = value
+
+    @property
+    def write_seq(self):
+        """จำนวน block ที่เขียนไปแล้วทั้งหมด (block ล่าสุดคือ write_seq - 1)"""
+        return self.get('write_seq')
+
+    def write_block(self, samples):
+        """เขียน block ถัดไป (writer เท่านั้น)"""
+        seq = self.write_seq
+        slot = seq % self.num_slots
+        count = min(len(samples), self.block_size)
+
+        self.slot_seq[slot] = -1  # กำลังเขียน
+        self.data[slot, :count] = samples[:count]
+        if count < self.block_size:
+            self.data[slot, count:] = 0
+        self.slot_seq[slot] = seq
+        self.set('write_seq', seq + 1)
+        return seq
+
+    def view_block(self, seq):
+        """
+        คืน numpy view ของ block หมายเลข seq (ไม่ copy) หรือ None ถ้าถูกเขียนทับแล้ว
+
+        view ใช้ได้จนกว่า writer จะวนกลับมาเขียน slot เดิม - ตรวจด้วย is_valid(seq)
+        หลังประมวลผลเสร็จ
+        """
+        slot = seq % self.num_slots
+        if self.slot_seq[slot] != seq:
+            return None
+        return self.data[slot]
+
+    def is_valid(self, seq):
+        """block หมายเลข seq ยังไม่ถูกเขียนทับ"""
+        return self.slot_seq[seq % self.num_slots] == seq
+
+    def close(self):
+        """ปิด ring (owner จะลบ shared memory ด้วย)"""
+        del self.header, self.slot_seq, self.data
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+class SharedIQReader:
+    """อ่าน ring ตามลำดับ sequence - ข้ามไป block ล่าสุดเมื่ออ่านไม่ทัน"""
+
+    def __init__(self, ring_name, start_at_latest=True):
+        self.ring = SharedIQRing.attach(ring_name)
+        self.next_seq = self.ring.write_seq if start_at_latest else 0
+        self.blocks_read = 0
+        self.blocks_lost = 0
+
+    @property
+    def sample_rate(self):
+        return self.ring.get('sample_rate')
+
+    @property
+    def center_frequency(self):
+        return self.ring.get('center_frequency')
+
+    def next_block(self, timeout=1.0):
+        """
+        รอ block ถัดไป คืน (seq, view) หรือ (None, None) เมื่อหมดเวลาหรือ ring ปิด
+        """
+        deadline = time.perf_counter() + timeout
+
+        while True:
+            write_seq = self.ring.write_seq
+
+            # ถูกเขียนทับไปแล้ว - ข้ามไป block เก่าสุดที่ยังอยู่ใน ring
+            oldest = write_seq - self.ring.num_slots + 1
+            if self.next_seq < oldest:
+                self.blocks_lost += oldest - self.next_seq
+                self.next_seq = oldest
+
+            if self.next_seq < write_seq:
+                seq = self.next_seq
+                view = self.ring.view_block(seq)
+                self.next_seq += 1
+                if view is None:
+                    self.blocks_lost += 1
+                    continue
+                self.blocks_read += 1
+                return seq, view
+
+            if self.ring.get('closed') or time.perf_counter() > deadline:
+                return None, None
+
+            # รอ block ใหม่ (block ละ ~128 ms ที่ 2.048 Msps)
+            time.sleep(0.002)
+
+    def close(self):
+        self.ring.close()
+
+def dongle_worker(config, ring_name, stop_event):
+    """
+    Process สำหรับ dongle หนึ่งตัว: รับ I/Q แล้วเขียนลง shared ring
+
+    config: dict ที่มี device_index, frequency, sample_rate, gain
+            หรือ rtl_tcp=(host, port) เพื่อรับจาก rtl_tcp server แทน USB
+    """
+    ring = SharedIQRing.attach(ring_name)
+    name = config.get('name', ring_name)
+
+    try:
+        if config.get('rtl_tcp'):
+            from lab3_1b import RTLTCPClient
+
+            host, port = config['rtl_tcp']
+            client = RTLTCPClient(host, port)
+            client.frequency = config['frequency']
+            client.sample_rate = config['sample_rate']
+            if config.get('gain') not in (None, 'auto'):
+                client.gain = config['gain']
+
+            if not client.connect_to_server():
+                return
+            try:
+                while not stop_event.is_set():
+                    ring.write_block(client.read_block(ring.block_size))
+            finally:
+                client.disconnect()
+        else:
+            from lab3_1a import RTLSDRDataAcquisition
+
+            rtl = RTLSDRDataAcquisition(config.get('device_index', 0))
+            rtl.frequency = config['frequency']
+            rtl.sample_rate = config['sample_rate']
+            rtl.gain = config.get('gain', 'auto')
+
+            if not rtl.setup_rtlsdr():
+                return
+            try:
+                stream = rtl.stream_samples(block_size=ring.block_size)
+                for block in stream:
+                    ring.write_block(block)
+                    ring.set('dropped_blocks', rtl.dropped_blocks)
+                    if stop_event.is_set():
+                        stream.close()
+                        break
+            finally:
+                rtl.cleanup()
+
+    except Exception as e:
+        print(f"[{name}] Worker error: {e}")
+    finally:
+        ring.set('closed', 1)
+        ring.close()
+
+class MultiDongleManager:
+    """เปิด dongle หลายตัว ตัวละ process แต่ละตัวมี shared ring ของตัวเอง"""
+
+    def __init__(self, configs, block_size=262144, num_slots=16):
+        self.configs = []
+        for index, config in enumerate(configs):
+            config = dict(config)
+            config.setdefault('device_index', index)
+            config.setdefault('sample_rate', 2048000)
+            config.setdefault('name', f"dongle{config['device_index']}")
+            self.configs.append(config)
+
+        self.block_size = block_size
+        self.num_slots = num_slots
+        self.rings = []
+        self.processes = []
+        self.stop_event = mp.Event()
+
+    @property
+    def ring_names(self):
+        """ชื่อ shared memory ของแต่ละ dongle (ส่งให้ process วิเคราะห์ใช้ attach)"""
+        return [ring.name for ring in self.rings]
+
+    def start(self):
+        """สร้าง rings และเริ่ม worker process ของทุก dongle"""
+        self.stop_event.clear()
+
+        for config in self.configs:
+            ring = SharedIQRing.create(self.block_size, self.num_slots,
+                                       config['sample_rate'], config['frequency'])
+            self.rings.append(ring)
+
+            process = mp.Process(target=dongle_worker, name=config['name'],
+                                 args=(config, ring.name, self.stop_event), daemon=True)
+            process.start()
+            self.processes.append(process)
+
+            print(f"[{config['name']}] {config['frequency']/1e6:.3f} MHz -> ring {ring.name}")
+
+        return self.ring_names
+
+    def get_status(self):
+        """สถานะของแต่ละ dongle"""
+        status = []
+        for config, ring, process in zip(self.configs, self.rings, self.processes):
+            blocks = ring.write_seq
+            status.append({
+                'name': config['name'],
+                'frequency': config['frequency'],
+                'alive': process.is_alive(),
+                'blocks_written': blocks,
+                'samples_written': blocks * self.block_size,
+                'dropped_blocks': ring.get('dropped_blocks')
+            })
+        return status
+
+    def stop(self, timeout=5):
+        """หยุดทุก worker และลบ shared memory"""
+        self.stop_event.set()
+
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+        for ring in self.rings:
+            ring.close()
+
+        self.processes = []
+        self.rings = []
+
+def power_monitor(ring_name, duration_seconds, results):
+    """ตัวอย่าง analysis process: คำนวณ power ของทุก block จาก ring (zero-copy)"""
+    reader = SharedIQReader(ring_name)
+    powers = []
+    end_time = time.time() + duration_seconds
+
+    while time.time() < end_time:
+        seq, block = reader.next_block()
+        if block is None:
+            if reader.ring.get('closed'):
+                break
+            continue
+        power = float(np.mean(block.real ** 2 + block.imag ** 2))
+        if reader.ring.is_valid(seq):
+            powers.append(power)
+        else:
+            reader.blocks_lost += 1
+
+    results[ring_name] = {
+        'blocks_read': reader.blocks_read,
+        'blocks_lost': reader.blocks_lost,
+        'mean_power_db': 10 * np.log10(np.mean(powers) + 1e-12) if powers else None
+    }
+    reader.close()
+
+def main():
+    """ฟังก์ชันหลักสำหรับทดสอบ"""
+    print("=== Lab 3: Multi-dongle Acquisition Manager ===")
+
+    args = sys.argv[1:]
+    duration = 10
+    if '--duration' in args:
+        index = args.index('--duration')
+        duration = float(args[index + 1])
+        del args[index:index + 2]
+
+    configs = []
+    if args and args[0] == '--rtl-tcp':
+        for index, endpoint in enumerate(args[1:]):
+            host, port = endpoint.rsplit(':', 1)
+            configs.append({'name': f"rtl_tcp{index}", 'rtl_tcp': (host, int(port)),
+                            'frequency': 185360000, 'gain': 20})
+    else:
+        frequencies = [float(arg) for arg in args] or [185.360]
+        for frequency in frequencies:
+            configs.append({'frequency': int(frequency * 1e6)})
+
+    if not configs:
+        print("Usage: python3 multi_dongle.py <freq_mhz> [<freq_mhz> ...]")
+        print("       python3 multi_dongle.py --rtl-tcp host:port [host:port ...]")
+        return
+
+    manager = MultiDongleManager(configs)
+    ring_names = manager.start()
+
+    # analysis process ต่อ dongle - attach กับ ring โดยไม่ copy ข้อมูลข้าม process
+    results = mp.Manager().dict()
+    analyzers = [mp.Process(target=power_monitor, args=(name, duration, results))
+                 for name in ring_names]
+
+    try:
+        for analyzer in analyzers:
+            analyzer.start()
+        for analyzer in analyzers:
+            analyzer.join()
+    except KeyboardInterrupt:
+        print("\nUser interrupted")
+    finally:
+        status = manager.get_status()
+        manager.stop()
+
+    print("\n=== Results ===")
+    for ring_name, dongle in zip(ring_names, status):
+        result = results.get(ring_name, {})
+        power = result.get('mean_power_db')
+        power_text = f"{power:.1f} dB" if power is not None else "n/a"
+        print(f"{dongle['name']}: {dongle['frequency']/1e6:.3f} MHz, "
+              f"{dongle['samples_written']/duration/1e6:.3f} Msps written, "
+              f"read {result.get('blocks_read', 0)} blocks, "
+              f"lost {result.get('blocks_lost', 0)}, power {power_text}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lab 3: Background Plot Renderer (Agg ใน worker process)
+เป้าหมาย: บันทึกกราฟ PNG โดยไม่หยุด loop รับ/วิเคราะห์สัญญาณ
+
+- Worker process แยก (spawn) ใช้ matplotlib backend Agg - ไม่แย่ง GIL กับ thread รับ I/Q
+- submit() แค่ copy array แล้วใส่ queue คืนค่าทันที (ไม่กี่ ms แม้บน Pi)
+  เทียบกับ plt.savefig(dpi=150) ที่ใช้เวลาหลายร้อย ms
+- Coalesce: worker ดึงทุก request ที่ค้างอยู่ แล้ว render เฉพาะอันล่าสุดของแต่ละไฟล์
+  (เช่น test_different_frequencies ที่เขียน spectrum_analysis.png ซ้ำ) - request เก่าถูกทิ้ง
+- ถ้าเปิด worker ไม่ได้ จะ render ใน process เดิมแทน (ช้าแต่ได้ไฟล์เหมือนกัน)
+- get_renderer() คืน renderer กลางที่ใช้ร่วมกัน - ตอนจบโปรแกรมรอให้ render ที่ค้างเสร็จก่อน
+
+ตัวอย่าง:
+    renderer = get_renderer()
+    renderer.submit('spectrum_analysis.png', freqs / 1e6, spectrum_db,
+                    title='Spectrum Analysis', xlabel='Frequency (MHz)', ylabel='Power (dB)')
+
+Usage:
+python3 plot_worker.py    # เวลาที่ loop ถูกบล็อก: savefig ตรงๆ เทียบกับ submit()
+
+Dependencies:
+pip install numpy matplotlib
+"""
+
+import atexit
+import multiprocessing as mp
+import os
+import queue
+import time
+
+import numpy as np
+
+# ค่าเริ่มต้นของกราฟ (เหมือนกราฟสเปกตรัมเดิมของ lab3_1a/lab3_1b)
+PLOT_DEFAULTS = {
+    'title': '',
+    'xlabel': 'Frequency (MHz)',
+    'ylabel': 'Power (dB)',
+    'figsize': (12, 6),
+    'dpi': 150,
+    'style': 'b-',
+    'linewidth': 1.0,
+    'alpha': 1.0,
+    'grid_alpha': 1.0,
+    'markers': (),      # [(x, label)] - เส้นแนวตั้งสีแดงพร้อมข้อความ เช่น DAB block
+    'legend': None,
+    'xlim': None,
+}
+
+_renderer = None
+
+def render_plot(request):
+    """วาดกราฟเส้นหนึ่งกราฟแล้วบันทึก PNG ด้วย Agg (ไม่ใช้ pyplot) - คืนเวลาที่ใช้ (วินาที)"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    start_time = time.perf_counter()
+    options = dict(PLOT_DEFAULTS, **request.get('options', {}))
+    x, y = request['x'], request['y']
+
+    figure = Figure(figsize=options['figsize'])
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot(1, 1, 1)
+    ax.plot(x, y, options['style'], linewidth=options['linewidth'], alpha=options['alpha'])
+
+    if len(options['markers']):
+        top = np.max(y) - 5
+        for position, label in options['markers']:
+            ax.axvline(x=position, color='red', linestyle='--', alpha=0.6)
+            ax.text(position, top, label, rotation=90, ha='center', va='top', fontsize=8)
+
+    ax.set_xlabel(options['xlabel'])
+    ax.set_ylabel(options['ylabel'])
+    ax.set_title(options['title'])
+    ax.grid(True, alpha=options['grid_alpha'])
+    if options['legend']:
+        ax.legend(options['legend'])
+    if options['xlim']:
+        ax.set_xlim(*options['xlim'])
+
+    figure.savefig(request['output'], dpi=options['dpi'], bbox_inches='tight')
+    return time.perf_counter() - start_time
+
+def render_loop(requests, results):
+    """
+    Loop ของ worker process: รอ request แล้ว render เฉพาะอันล่าสุดของแต่ละไฟล์
+
+    None ใน queue = render ที่ค้างให้เสร็จแล้วจบ
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+
+    running = True
+    while running:
+        pending = {}
+        dropped = 0
+        request = requests.get()
+
+        # ดึงทุกอันที่ค้างอยู่ - request ใหม่แทนที่อันเก่าของไฟล์เดียวกัน
+        while True:
+            if request is None:
+                running = False
+            else:
+                dropped += request['output'] in pending
+                pending[request['output']] = request
+            try:
+                request = requests.get_nowait()
+            except queue.Empty:
+                break
+
+        for output, request in pending.items():
+            try:
+                elapsed = render_plot(request)
+                results.put((output, elapsed, dropped, None))
+            except Exception as e:
+                results.put((output, 0.0, dropped, str(e)))
+            dropped = 0
+
+class PlotRenderer:
+    """
+    Renderer PNG ใน worker process แยก - submit() ไม่บล็อก caller
+
+    verbose: พิมพ์ผลการ render (ชื่อไฟล์, เวลา, จำนวน request ที่ถูกทิ้ง) เมื่อ poll()/close()
+    """
+
+    def __init__(self, verbose=True):
+        self.verbose = verbose
+        self.process = None
+        self.requests = None
+        self.results = None
+        self.inline = False       # เปิด worker ไม่ได้ - render ใน process นี้แทน
+        self.submitted = 0
+        self.rendered = 0
+        self.dropped = 0
+
+    def start(self):
+        """เริ่ม worker process (เรียกอัตโนมัติตอน submit, เริ่มใหม่ถ้า worker ตาย) - คืน False ถ้าเปิดไม่ได้"""
+        if self.process is not None and self.process.is_alive():
+            return True
+
+        try:
+            # spawn: ไม่ fork thread รับ I/Q ที่กำลังทำงานอยู่ติดไปด้วย
+            context = mp.get_context('spawn')
+            self.requests = context.Queue()
+            self.results = context.Queue()
+            self.process = context.Process(target=render_loop, args=(self.requests, self.results),
+                                           name='plot-renderer', daemon=True)
+            self.process.start()
+            # ลงทะเบียนหลัง start: atexit เรียกแบบ LIFO จึงส่ง None และรอ render ที่ค้าง
+            # ก่อนที่ multiprocessing จะ terminate daemon process ตอนจบโปรแกรม
+            atexit.register(self.close)
+            return True
+        except (OSError, RuntimeError) as e:
+            print(f"Warning: Cannot start plot renderer process ({e}) - rendering inline")
+            self.process = None
+            self.requests = None
+            self.inline = True
+            return False
+
+    def submit(self, output, x, y, **options):
+        """
+        ส่งกราฟเข้าคิว render แล้วคืนค่าทันที
+
+        x, y: ข้อมูลกราฟเส้น (copy ทันที - caller ใช้ buffer เดิมต่อได้)
+        options: title, xlabel, ylabel, figsize, dpi, style, linewidth, alpha,
+                 grid_alpha, markers, legend, xlim (ดู PLOT_DEFAULTS)
+        """
+        request = {
+            'output': os.path.abspath(output),
+            'x': np.array(x, dtype=np.float64),
+            'y': np.array(y, dtype=np.float32),
+            'options': options,
+        }
+        self.submitted += 1
+
+        if self.inline or not self.start():
+            render_plot(request)
+            self.rendered += 1
+            return
+
+        self.requests.put(request)
+        self.poll()
+
+    def poll(self):
+        """ผลการ render ที่เสร็จแล้ว [(output, seconds, dropped, error)] (ไม่บล็อก)"""
+        completed = []
+        while self.results is not None:
+            try:
+                output, elapsed, dropped, error = self.results.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                break
+            completed.append((output, elapsed, dropped, error))
+            self.rendered += error is None
+            self.dropped += dropped
+            if not self.verbose:
+                continue
+            if error:
+                print(f"Could not create plot {os.path.basename(output)}: {error}")
+            else:
+                skipped = f", {dropped} stale request(s) skipped" if dropped else ""
+                print(f"Plot saved as '{os.path.basename(output)}' "
+                      f"(rendered in background, {elapsed * 1000:.0f} ms{skipped})")
+        return completed
+
+    def close(self, timeout=30.0):
+        """Render ที่ค้างให้เสร็จ แล้วปิด worker"""
+        if self.process is None:
+            return
+        atexit.unregister(self.close)
+        try:
+            self.requests.put(None)
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+        except (OSError, ValueError):
+            pass
+        # worker จบแล้ว - request ที่ยังค้างใน pipe ไม่มีใครอ่าน อย่ารอ flush ตอนจบโปรแกรม
+        self.requests.cancel_join_thread()
+        self.poll()
+        self.process = None
+
+def get_renderer():
+    """Renderer กลางที่ใช้ร่วมกันทั้งโปรแกรม (ปิดและรอ render ที่ค้างอัตโนมัติตอนจบ)"""
+    global _renderer
+    if _renderer is None:
+        _renderer = PlotRenderer()
+    return _renderer
+
+def benchmark(num_plots=10, fft_size=1024):
+    """เวลาที่ loop ถูกบล็อกต่อกราฟ: savefig ใน thread เดียวกัน เทียบกับ submit()"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import tempfile
+
+    freqs = np.linspace(184.336, 186.384, fft_size)
+    spectra = np.random.standard_normal((num_plots, fft_size)) * 3 - 80
+
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, 'spectrum.png')
+
+        start_time = time.perf_counter()
+        for spectrum in spectra:
+            render_plot({'output': output, 'x': freqs, 'y': spectrum, 'options': {}})
+        inline_ms = (time.perf_counter() - start_time) / num_plots * 1000
+
+        renderer = PlotRenderer(verbose=False)
+        renderer.start()
+        start_time = time.perf_counter()
+        for spectrum in spectra:
+            renderer.submit(output, freqs, spectrum, title='Spectrum Analysis')
+        submit_ms = (time.perf_counter() - start_time) / num_plots * 1000
+        renderer.close()
+
+        print(f"{num_plots} spectrum plots ({fft_size} points, dpi 150):")
+        print(f"  savefig in the capture loop : {inline_ms:7.1f} ms blocked per plot")
+        print(f"  PlotRenderer.submit()       : {submit_ms:7.2f} ms blocked per plot")
+        print(f"  rendered {renderer.rendered}, stale requests skipped {renderer.dropped}")
+
+def main():
+    """Benchmark เวลาที่ loop ถูกบล็อก"""
+    print("=== Lab 3: Background Plot Renderer ===")
+    benchmark()
+
+if __name__ == "__main__":
+    main()
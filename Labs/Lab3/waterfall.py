@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lab 3: Waterfall Ring Buffer
+เป้าหมาย: เก็บประวัติสเปกตรัมสำหรับ waterfall ใน array ขนาดคงที่ ไม่จัดสรร memory ใหม่ทุก frame
+
+- Array 2 มิติ (rows x bins) จองครั้งเดียว เขียนแถวใหม่ที่ write index แล้วเลื่อนวนรอบ
+- เขียนแต่ละแถวสองตำแหน่ง (index และ index + rows) ทำให้ image() คืน view
+  ที่เรียงจากเก่าไปใหม่ต่อเนื่องกันได้เลย ไม่ต้อง np.roll / copy
+- แปลงสีด้วย lookup table ครั้งเดียวตอนเพิ่มแถว แล้วเก็บเป็น RGBA (uint8)
+  matplotlib ไม่ต้อง normalize + colormap ทั้งภาพใหม่ทุก frame
+- ใช้กับ imshow().set_data(buffer.rgba()) (matplotlib) หรือ ImageItem.setImage() (pyqtgraph)
+- WaterfallHistory: เก็บประวัติย้อนหลังหลายระดับเวลา (ทุก update, 10 วินาที, 1 นาที, 10 นาที)
+  เป็น ring แบบ float16 - ย้อนดูได้เป็นวันด้วยหน่วยความจำไม่กี่ MB
+  window(start, stop, rows) เลือกระดับที่พอดีกับช่วงเวลาแล้วลดเหลือขนาดจอ (max หรือ mean)
+
+Usage:
+python3 waterfall.py    # benchmark การอัปเดต waterfall ด้วย matplotlib (Agg) และประวัติย้อนหลัง
+
+Dependencies:
+pip install numpy matplotlib
+"""
+
+import time
+
+import numpy as np
+from matplotlib import colormaps
+
+class WaterfallBuffer:
+    """Ring buffer ของสเปกตรัม (dB) ขนาด num_rows x num_bins พร้อมภาพ RGBA"""
+
+    def __init__(self, num_rows=200, num_bins=None, cmap='viridis', levels=(-100.0, -40.0)):
+        self.num_rows = num_rows
+        self.num_bins = None
+        self.buffer = None
+        self.rgba_buffer = None
+        self.lut = (colormaps[cmap](np.linspace(0, 1, 256)) * 255).astype(np.uint8)
+        self.levels = levels
+        if num_bins:
+            self.reset(num_bins)
+
+    def reset(self, num_bins=None):
+        """ล้างข้อมูล (และเปลี่ยนจำนวน bins ถ้าระบุ) - แถวที่ยังไม่มีข้อมูลเป็น NaN / โปร่งใส"""
+        if num_bins and num_bins != self.num_bins:
+            self.num_bins = num_bins
+            self.buffer = np.empty((2 * self.num_rows, num_bins), dtype=np.float32)
+            self.rgba_buffer = np.empty((2 * self.num_rows, num_bins, 4), dtype=np.uint8)
+        if self.buffer is not None:
+            self.buffer.fill(np.nan)
+            self.rgba_buffer.fill(0)
+        self.write_index = 0
+        self.count = 0
+
+    def colorize(self, rows):
+        """แปลง dB เป็น RGBA ด้วย lookup table ตามช่วง levels (NaN = โปร่งใส)"""
+        low, high = self.levels
+        scaled = (rows - low) * (255.0 / max(high - low, 1e-6))
+        index = np.clip(np.nan_to_num(scaled, nan=0.0), 0, 255).astype(np.uint8)
+        rgba = self.lut[index]
+        rgba[..., 3] = np.where(np.isnan(rows), 0, 255)
+        return rgba
+
+    def set_levels(self, low, high):
+        """เปลี่ยนช่วงสี - แปลงสีทั้ง buffer ใหม่ครั้งเดียว"""
+        self.levels = (float(low), float(high))
+        if self.buffer is not None:
+            self.rgba_buffer[:] = self.colorize(self.buffer)
+
+    def push(self, row):
+        """เพิ่มสเปกตรัมใหม่หนึ่งแถว (จำนวน bins เปลี่ยน = เริ่ม buffer ใหม่)"""
+        row = np.asarray(row, dtype=np.float32)
+        if len(row) != self.num_bins:
+            self.reset(len(row))
+
+        rgba = self.colorize(row)
+        for index in (self.write_index, self.write_index + self.num_rows):
+            self.buffer[index] = row
+            self.rgba_buffer[index] = rgba
+        self.write_index = (self.write_index + 1) % self.num_rows
+        self.count = min(self.count + 1, self.num_rows)
+
+    def image(self):
+        """ค่า dB (num_rows x num_bins) เรียงจากเก่า (แถว 0) ไปใหม่ (แถวสุดท้าย) - view ไม่ copy"""
+        if self.buffer is None:
+            return None
+        return self.buffer[self.write_index:self.write_index + self.num_rows]
+
+    def rgba(self):
+        """ภาพ RGBA (num_rows x num_bins x 4) ลำดับเดียวกับ image() - view ไม่ copy"""
+        if self.rgba_buffer is None:
+            return None
+        return self.rgba_buffer[self.write_index:self.write_index + self.num_rows]
+
+    def latest(self):
+        """สเปกตรัมล่าสุด (หรือ None ถ้ายังว่าง)"""
+        if not self.count:
+            return None
+        return self.buffer[self.write_index + self.num_rows - 1]
+
+    def __len__(self):
+        return self.count
+
+def benchmark(num_frames=200, num_bins=2048, num_rows=200):
+    """วัด fps ของ waterfall แบบ imshow ใหม่ทุก frame เทียบกับ ring buffer + set_data + blit"""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    rows = (np.random.standard_normal((num_frames, num_bins)) * 3 - 80).astype(np.float32)
+
+    # แบบเดิม: list + pop(0) + np.array + clear + imshow
+    figure = Figure(figsize=(8, 4))
+    canvas = FigureCanvasAgg(figure)
+    axes = figure.add_subplot(1, 1, 1)
+    history = []
+    start_time = time.perf_counter()
+    for row in rows:
+        history.append(row.copy())
+        if len(history) > num_rows:
+            history.pop(0)
+        axes.clear()
+        axes.imshow(np.array(history), aspect='auto', origin='lower', cmap='viridis')
+        canvas.draw()
+    legacy_fps = num_frames / (time.perf_counter() - start_time)
+
+    # แบบใหม่: ring buffer (RGBA) + set_data + วาดเฉพาะ image บน background ที่เก็บไว้
+    figure = Figure(figsize=(8, 4))
+    canvas = FigureCanvasAgg(figure)
+    axes = figure.add_subplot(1, 1, 1)
+    waterfall = WaterfallBuffer(num_rows, num_bins, levels=(-95, -65))
+    image = axes.imshow(waterfall.rgba(), aspect='auto', origin='lower',
+                        interpolation='nearest', animated=True)
+    canvas.draw()
+    background = canvas.copy_from_bbox(figure.bbox)
+    start_time = time.perf_counter()
+    for row in rows:
+        waterfall.push(row)
+        image.set_data(waterfall.rgba())
+        canvas.restore_region(background)
+        axes.draw_artist(image)
+        canvas.blit(figure.bbox)
+    ring_fps = num_frames / (time.perf_counter() - start_time)
+
+    print(f"Waterfall {num_rows} x {num_bins}:")
+    print(f"  list + imshow every frame : {legacy_fps:6.1f} fps")
+    print(f"  ring buffer + set_data    : {ring_fps:6.1f} fps ({ring_fps / legacy_fps:.1f}x)")
+
+# (วินาทีต่อแถว, จำนวนแถว): ทุก update 600 แถว, 10 s x 1 ชม., 1 นาที x 1 วัน, 10 นาที x 1 สัปดาห์
+HISTORY_LEVELS = ((0, 600), (10, 360), (60, 1440), (600, 1008))
+
+class HistoryLevel:
+    """Ring (capacity x num_bins) แบบ float16 ของหนึ่งระดับเวลา พร้อมแถวที่กำลังสะสม"""
+
+    def __init__(self, interval, capacity, num_bins, reduce='max'):
+        self.interval = interval
+        self.capacity = capacity
+        self.reduce = reduce
+        self.rows = np.full((capacity, num_bins), np.nan, dtype=np.float16)
+        self.times = np.full(capacity, np.nan)
+        self.write_index = 0
+        self.count = 0
+
+        # แถวที่กำลังสะสมใน bucket ปัจจุบัน (เวลา = sample แรกของ bucket)
+        self.accumulator = np.empty(num_bins, dtype=np.float32)
+        self.pending_count = 0
+        self.pending_time = None
+        self.bucket = None
+
+    def append(self, row, timestamp):
+        self.rows[self.write_index] = row
+        self.times[self.write_index] = timestamp
+        self.write_index = (self.write_index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def pending(self):
+        """แถวที่ยังสะสมไม่ครบ bucket (หรือ None)"""
+        if not self.pending_count:
+            return None
+        if self.reduce == 'mean':
+            return self.accumulator / self.pending_count
+        return self.accumulator
+
+    def flush(self):
+        row = self.pending()
+        if row is not None:
+            self.append(row, self.pending_time)
+        self.pending_count = 0
+
+    def add(self, row, timestamp):
+        """เพิ่ม spectrum - ระดับ interval 0 เก็บทุกแถว ระดับอื่นรวมตาม bucket เวลา"""
+        if not self.interval:
+            self.append(row, timestamp)
+            return
+
+        bucket = int(timestamp // self.interval)
+        if bucket != self.bucket:
+            self.flush()
+            self.bucket = bucket
+
+        if not self.pending_count:
+            self.accumulator[:] = row
+            self.pending_time = timestamp
+        elif self.reduce == 'mean':
+            self.accumulator += row
+        else:
+            np.fmax(self.accumulator, row, out=self.accumulator)
+        self.pending_count += 1
+
+    def oldest(self):
+        """เวลาของแถวเก่าสุด (รวมแถวที่กำลังสะสม) หรือ inf ถ้าว่าง"""
+        if self.count:
+            return self.times[(self.write_index - self.count) % self.capacity]
+        return self.pending_time if self.pending_count else np.inf
+
+    def select(self, start, stop):
+        """(times, rows float32) ของแถวในช่วง [start, stop) เรียงตามเวลา"""
+        order = (self.write_index - self.count + np.arange(self.count)) % self.capacity
+        times = self.times[order]
+        first, last = np.searchsorted(times, (start, stop))
+        times = times[first:last]
+        rows = self.rows[order[first:last]].astype(np.float32)
+
+        pending = self.pending()
+        if pending is not None and start <= self.pending_time < stop:
+            times = np.append(times, self.pending_time)
+            rows = np.vstack((rows, pending))
+        return times, rows
+
+    @property
+    def nbytes(self):
+        return self.rows.nbytes + self.times.nbytes + self.accumulator.nbytes
+
+class WaterfallHistory:
+    """
+    ประวัติสเปกตรัมหลายระดับเวลา (pyramid) สำหรับย้อนดู waterfall เป็นชั่วโมง/วัน
+
+    levels: ลำดับ (วินาทีต่อแถว, จำนวนแถว) จากละเอียดไปหยาบ - interval 0 คือทุก update
+    reduce: 'max' (เห็น burst/interference สั้นๆ) หรือ 'mean' (เห็น fade ระยะยาว)
+    """
+
+    def __init__(self, levels=HISTORY_LEVELS, reduce='max'):
+        self.level_spec = levels
+        self.reduce = reduce
+        self.num_bins = None
+        self.levels = []
+
+    def reset(self, num_bins=None):
+        """ล้างประวัติ (และเปลี่ยนจำนวน bins ถ้าระบุ)"""
+        self.num_bins = num_bins or self.num_bins
+        self.levels = []
+        if self.num_bins:
+            self.levels = [HistoryLevel(interval, capacity, self.num_bins, self.reduce)
+                           for interval, capacity in self.level_spec]
+
+    def push(self, row, timestamp=None):
+        """เพิ่มสเปกตรัม (dB) หนึ่งแถว - timestamp เป็น epoch วินาที (ค่าเริ่มต้น: เวลาปัจจุบัน)"""
+        row = np.asarray(row, dtype=np.float32)
+        if len(row) != self.num_bins:
+            self.reset(len(row))
+        timestamp = time.time() if timestamp is None else float(timestamp)
+        for level in self.levels:
+            level.add(row, timestamp)
+
+    def span(self):
+        """(เวลาเก่าสุด, ใหม่สุด) ที่มีข้อมูล หรือ None"""
+        if not self.levels or not (self.levels[0].count or self.levels[0].pending_count):
+            return None
+        finest = self.levels[0]
+        newest = finest.times[(finest.write_index - 1) % finest.capacity]
+        return min(level.oldest() for level in self.levels), newest
+
+    def choose_level(self, start, stop, num_rows):
+        """ระดับละเอียดสุดที่ครอบคลุม start - ใช้ระดับหยาบกว่าถ้ายังละเอียดกว่าจอ"""
+        covering = [level for level in self.levels if level.oldest() <= start]
+        if not covering:
+            oldest = min(level.oldest() for level in self.levels)
+            covering = [level for level in self.levels if level.oldest() == oldest]
+
+        resolution = (stop - start) / num_rows
+        chosen = covering[0]
+        for level in covering[1:]:
+            if level.interval <= resolution:
+                chosen = level
+        return chosen
+
+    def window(self, start, stop, num_rows, num_columns=None):
+        """
+        ภาพ (num_rows x bins) ของช่วงเวลา [start, stop) เรียงจากเก่าไปใหม่ - แถวที่ไม่มีข้อมูลเป็น NaN
+
+        num_columns: ลดจำนวน bins ให้เท่าความกว้างจอ (ค่า max ของแต่ละกลุ่ม)
+        คืนค่า (row_times, image float32)
+        """
+        num_rows = max(1, int(num_rows))
+        row_times = start + (np.arange(num_rows) + 0.5) * (stop - start) / num_rows
+        if not self.levels:
+            return row_times, None
+
+        level = self.choose_level(start, stop, num_rows)
+        times, rows = level.select(start, stop)
+        image = np.full((num_rows, self.num_bins), np.nan, dtype=np.float32)
+
+        if len(times):
+            # เวลาเรียงแล้ว - แถวที่ตกจอแถวเดียวกันอยู่ติดกัน รวมทีละ "แถวที่ k ของทุกกลุ่ม"
+            target = np.minimum(((times - start) * num_rows / (stop - start)).astype(np.intp),
+                                num_rows - 1)
+            targets, first, counts = np.unique(target, return_index=True, return_counts=True)
+            image[targets] = rows[first]
+            for k in range(1, counts.max()):
+                groups = counts > k
+                if self.reduce == 'mean':
+                    image[targets[groups]] += rows[first[groups] + k]
+                else:
+                    image[targets[groups]] = np.fmax(image[targets[groups]], rows[first[groups] + k])
+            if self.reduce == 'mean':
+                image[targets] /= counts[:, np.newaxis]
+
+            # bucket หยาบกว่าจอ - แสดงค่าเดิมต่อจนถึงแถวถัดไป (ไม่เป็นแถบว่างสลับ)
+            interval = level.interval or (np.median(np.diff(times)) if len(times) > 1 else 0)
+            hold = int(np.ceil(interval * num_rows / (stop - start)))
+            if hold > 1:
+                filled = np.full(num_rows, -1, dtype=np.intp)
+                filled[targets] = targets
+                filled = np.maximum.accumulate(filled)
+                rows_held = (filled >= 0) & (np.arange(num_rows) - filled < hold)
+                image[rows_held] = image[filled[rows_held]]
+
+        if num_columns and self.num_bins > num_columns:
+            # กลุ่มละ bucket_size bins (เติม NaN ท้ายให้หารลงตัว) - ได้ไม่เกิน num_columns คอลัมน์
+            bucket_size = int(np.ceil(self.num_bins / num_columns))
+            padding = -self.num_bins % bucket_size
+            image = np.pad(image, ((0, 0), (0, padding)), constant_values=np.nan)
+            grouped = image.reshape(num_rows, -1, bucket_size)
+            image = grouped[:, :, 0].copy()
+            for k in range(1, bucket_size):
+                np.fmax(image, grouped[:, :, k], out=image)
+
+        return row_times, image
+
+    @property
+    def nbytes(self):
+        return sum(level.nbytes for level in self.levels)
+
+def benchmark_history(hours=2.0, rate=2.0, num_bins=2048):
+    """ป้อนสเปกตรัมจำลองหลายชั่วโมง แล้ววัดหน่วยความจำและเวลาดึง window ขนาดจอ"""
+    history = WaterfallHistory()
+    num_updates = int(hours * 3600 * rate)
+    noise = (np.random.standard_normal((64, num_bins)) * 3 - 80).astype(np.float32)
+    start_time = time.time() - hours * 3600
+
+    started = time.perf_counter()
+    for update in range(num_updates):
+        history.push(noise[update % 64], start_time + update / rate)
+    push_us = (time.perf_counter() - started) / num_updates * 1e6
+
+    full_mb = num_updates * num_bins * 4 / 1e6
+    print(f"History of {hours:.0f} h at {rate:.0f} updates/s, {num_bins} bins:")
+    print(f"  push        : {push_us:6.1f} us/update")
+    print(f"  memory      : {history.nbytes / 1e6:6.1f} MB (float32 list of every spectrum: {full_mb:.0f} MB)")
+
+    _, newest = history.span()
+    for label, seconds in (('1 min', 60), ('10 min', 600), ('1 h', 3600), ('24 h', 86400)):
+        started = time.perf_counter()
+        _, image = history.window(newest - seconds, newest + 1e-3, 200, 800)
+        elapsed = (time.perf_counter() - started) * 1000
+        filled = np.mean(np.isfinite(image[:, 0])) * 100
+        print(f"  window {label:>6s}: {elapsed:6.2f} ms -> {image.shape[0]} x {image.shape[1]} "
+              f"({filled:.0f}% rows with data)")
+
+def main():
+    """Benchmark การอัปเดต waterfall และประวัติย้อนหลัง"""
+    print("=== Lab 3: Waterfall Ring Buffer ===")
+    benchmark()
+    benchmark_history()
+
+if __name__ == "__main__":
+    main()
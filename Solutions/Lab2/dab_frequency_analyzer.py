@@ -2,16 +2,185 @@
 """
 DAB+ Frequency Planning and Analysis
 Solution for Lab 2 Trap 2.1: DAB+ Frequency Planning
+
+Band III spectrum scans run in-process on pyrtlsdr (BandSweeper from
+Lab 3's band_sweep.py) instead of spawning rtl_power: a full 174-240 MHz
+sweep takes a few seconds.
 """
 
+import itertools
 import json
-import subprocess
-import csv
+import os
+import sys
+import time
 import matplotlib.pyplot as plt
 import numpy as np
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 
+# Vectorized per-block occupancy detector from Lab 3
+try:
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Lab3'))
+    from block_occupancy import BlockIndex, BlockOccupancyDetector
+except ImportError:
+    BlockIndex = BlockOccupancyDetector = None
+
+# Shared Band III sweeper from Lab 3 (tiles, settle discard, DC spike removal)
+try:
+    import fft_backend
+    from band_sweep import BandSweeper
+except ImportError:
+    fft_backend = BandSweeper = None
+
+# Background PNG renderer from Lab 3 (plot_spectrum falls back to pyplot in-process)
+try:
+    from plot_worker import get_renderer
+except ImportError:
+    get_renderer = None
+
+class RTLPowerLog:
+    """
+    Chunked reader for rtl_power CSV logs (every bin of every hop)
+
+    Each row is one hop: date, time, hz_low, hz_high, hz_step, samples, dB...
+    Hops are stitched into sweeps (a sweep ends when hz_low wraps back),
+    giving a time x frequency float32 matrix. Only chunk_lines rows are held
+    in memory while reading, so multi-hour logs stream with bounded memory.
+    """
+
+    def __init__(self, csv_file: str, chunk_lines: int = 4096):
+        self.csv_file = csv_file
+        self.chunk_lines = chunk_lines
+        self.frequencies_hz = None      # set from the hop parameters of the first sweep
+        self.hop_layout = None          # [(hz_low, hz_step, num_bins), ...]
+        self.skipped_rows = 0
+        self.skipped_sweeps = 0
+
+    @staticmethod
+    def _parse_chunk(lines: List[str]):
+        """Parse a chunk of rows: (timestamps, hz_low, hz_step, list of dB arrays)"""
+        fields = [line.split(',', 6) for line in lines if line.count(',') >= 6]
+        if not fields:
+            return [], np.empty(0), np.empty(0), []
+
+        values = [f[6] for f in fields]
+        counts = np.array([v.count(',') + 1 for v in values])
+        try:
+            flat = np.fromstring(','.join(values), dtype=np.float32, sep=',')
+            rows = np.split(flat, np.cumsum(counts)[:-1])
+        except ValueError:
+            # Malformed row somewhere in the chunk - parse row by row and mark bad rows
+            rows = []
+            for value in values:
+                try:
+                    rows.append(np.fromstring(value, dtype=np.float32, sep=','))
+                except ValueError:
+                    rows.append(None)
+
+        timestamps, hz_low, hz_step, power = [], [], [], []
+        for f, row in zip(fields, rows):
+            try:
+                low, step = float(f[2]), float(f[4])
+            except ValueError:
+                row = None
+            if row is None:
+                continue
+            timestamps.append(f[0].strip() + 'T' + f[1].strip())
+            hz_low.append(low)
+            hz_step.append(step)
+            power.append(row)
+
+        return timestamps, np.array(hz_low), np.array(hz_step), power
+
+    def iter_sweeps(self):
+        """Yield (timestamp, power_db row) for each complete sweep"""
+        current_parts, current_layout, current_time = [], [], None
+        last_low = None
+
+        def finish():
+            layout = tuple(current_layout)
+            if self.hop_layout is None:
+                self.hop_layout = list(layout)
+                self.frequencies_hz = np.concatenate(
+                    [low + np.arange(n) * step for low, step, n in layout])
+            if list(layout) != self.hop_layout:
+                self.skipped_sweeps += 1    # interrupted sweep (e.g. end of log)
+                return None
+            return current_time, np.concatenate(current_parts)
+
+        with open(self.csv_file, 'r') as f:
+            while True:
+                lines = list(itertools.islice(f, self.chunk_lines))
+                if not lines:
+                    break
+
+                timestamps, hz_low, hz_step, power = self._parse_chunk(lines)
+                self.skipped_rows += len(lines) - len(power)
+
+                for timestamp, low, step, row in zip(timestamps, hz_low, hz_step, power):
+                    if last_low is not None and low <= last_low and current_parts:
+                        sweep = finish()
+                        if sweep is not None:
+                            yield sweep
+                        current_parts, current_layout = [], []
+
+                    if not current_parts:
+                        current_time = timestamp
+                    current_parts.append(row)
+                    current_layout.append((low, step, len(row)))
+                    last_low = low
+
+        if current_parts:
+            sweep = finish()
+            if sweep is not None:
+                yield sweep
+
+    def read_matrix(self, max_sweeps: Optional[int] = None,
+                    average_sweeps: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Read the log into (timestamps, frequencies_hz, power_db[time, frequency]).
+
+        average_sweeps > 1 averages consecutive sweeps (in linear power) to
+        bound memory for very long logs.
+        """
+        matrix = None
+        timestamps = []
+        accumulator, accumulated, first_time = None, 0, None
+
+        for timestamp, row in self.iter_sweeps():
+            if matrix is None:
+                # Estimate the number of output rows from the file size, grow if needed
+                row_bytes = max(1, len(row) * 7 * average_sweeps)
+                capacity = max(16, os.path.getsize(self.csv_file) // row_bytes + 1)
+                matrix = np.empty((capacity, len(row)), dtype=np.float32)
+                accumulator = np.zeros(len(row), dtype=np.float64)
+
+            if accumulated == 0:
+                first_time = timestamp
+            accumulator += 10 ** (row / 10.0)
+            accumulated += 1
+            if accumulated < average_sweeps:
+                continue
+
+            if len(timestamps) == len(matrix):
+                matrix = np.resize(matrix, (len(matrix) * 2, matrix.shape[1]))
+            matrix[len(timestamps)] = 10 * np.log10(accumulator / accumulated + 1e-20)
+            timestamps.append(first_time)
+            accumulator[:] = 0
+            accumulated = 0
+
+            if max_sweeps and len(timestamps) >= max_sweeps:
+                break
+
+        if matrix is None:
+            return np.empty(0, dtype='datetime64[s]'), np.empty(0), np.empty((0, 0), dtype=np.float32)
+
+        try:
+            times = np.array(timestamps, dtype='datetime64[s]')
+        except ValueError:
+            times = np.array(timestamps)
+        return times, self.frequencies_hz, matrix[:len(timestamps)].copy()
+
 class DABFrequencyAnalyzer:
     """DAB+ frequency planning and analysis for Thailand"""
 
@@ -42,6 +211,9 @@ class DABFrequencyAnalyzer:
         # DAB+ Band III frequency blocks (174-230 MHz)
         self.band_iii_blocks = self._generate_band_iii_blocks()
 
+        # Sorted frequency index shared with Lab 3 (bisect lookups)
+        self.block_index = BlockIndex(self.band_iii_blocks) if BlockIndex is not None else None
+
     def _generate_band_iii_blocks(self) -> Dict[str, float]:
         """Generate all possible DAB+ Band III frequency blocks"""
         blocks = {}
@@ -103,97 +275,131 @@ class DABFrequencyAnalyzer:
                 regions.append(region)
         return regions
 
-    def scan_band_iii_spectrum(self, output_file: str = 'dab_spectrum.csv') -> Dict:
-        """Scan entire Band III spectrum using RTL-SDR"""
+    def scan_band_iii_spectrum(self, start_mhz: float = 174.0, stop_mhz: float = 240.0,
+                               dwell_time: float = 0.05,
+                               output_file: Optional[str] = None) -> Dict:
+        """Scan Band III with an in-process pyrtlsdr sweep (optionally saved as .npz)"""
         try:
-            print("Scanning DAB+ Band III spectrum (174-230 MHz)...")
+            print(f"Scanning DAB+ Band III spectrum ({start_mhz:.0f}-{stop_mhz:.0f} MHz)...")
 
-            # Run rtl_power scan
-            cmd = [
-                'rtl_power',
-                '-f', '174M:230M:1M',  # 174-230 MHz, 1 MHz steps
-                '-i', '10',            # 10 second integration
-                '-1',                  # Single scan
-                output_file
-            ]
+            if BandSweeper is None:
+                raise RuntimeError("Lab 3 band_sweep.py not found")
 
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+            sweeper = BandSweeper(dwell_time=dwell_time)
+            start_time = time.perf_counter()
+            frequencies, power_db = sweeper.sweep(start_mhz * 1e6, stop_mhz * 1e6)
+            elapsed = time.perf_counter() - start_time
 
-            if result.returncode != 0:
-                return {'success': False, 'error': result.stderr}
-
-            # Parse scan results
-            scan_data = self._parse_spectrum_scan(output_file)
+            if output_file:
+                np.savez(output_file, frequencies_hz=frequencies, power_db=power_db)
 
             return {
                 'success': True,
                 'scan_file': output_file,
-                'data': scan_data,
-                'peak_frequencies': self._find_spectrum_peaks(scan_data)
+                'frequencies_hz': frequencies,
+                'power_db': power_db,
+                'elapsed': elapsed,
+                'tiles': len(sweeper.plan_tiles(start_mhz * 1e6, stop_mhz * 1e6)),
+                'peak_frequencies': self._find_spectrum_peaks(frequencies, power_db),
+                'occupancy': self.detect_block_occupancy(frequencies, power_db)
             }
 
-        except subprocess.TimeoutExpired:
-            return {'success': False, 'error': 'Spectrum scan timed out'}
         except Exception as e:
             return {'success': False, 'error': str(e)}
 
-    def _parse_spectrum_scan(self, csv_file: str) -> List[Dict]:
-        """Parse rtl_power CSV output"""
-        data = []
+    def _parse_spectrum_scan(self, csv_file: str, max_sweeps: Optional[int] = None,
+                             average_sweeps: int = 1) -> Dict:
+        """Parse rtl_power CSV output into a time x frequency matrix (all bins)"""
+        log = RTLPowerLog(csv_file)
 
         try:
-            with open(csv_file, 'r') as f:
-                reader = csv.reader(f)
-
-                for row in reader:
-                    if len(row) >= 7:  # Valid rtl_power output
-                        try:
-                            entry = {
-                                'timestamp': row[0] + ' ' + row[1],
-                                'frequency_hz': float(row[2]),
-                                'frequency_mhz': float(row[2]) / 1e6,
-                                'power_db': float(row[6]),
-                                'samples': int(row[5]) if row[5].isdigit() else 0
-                            }
-                            data.append(entry)
-                        except (ValueError, IndexError):
-                            continue  # Skip malformed rows
-
+            timestamps, frequencies, power_db = log.read_matrix(max_sweeps, average_sweeps)
         except Exception as e:
             print(f"Error parsing spectrum data: {e}")
+            timestamps, frequencies, power_db = np.empty(0), np.empty(0), np.empty((0, 0), np.float32)
 
-        return data
+        return {
+            'timestamps': timestamps,
+            'frequencies_hz': frequencies,
+            'power_db': power_db,
+            'skipped_rows': log.skipped_rows,
+            'skipped_sweeps': log.skipped_sweeps
+        }
 
-    def _find_spectrum_peaks(self, scan_data: List[Dict], threshold_db: float = -50) -> List[Dict]:
+    def analyze_spectrum_log(self, csv_file: str, average_sweeps: int = 1) -> Dict:
+        """Load an rtl_power log and find DAB+ peaks in its time-averaged spectrum"""
+        scan = self._parse_spectrum_scan(csv_file, average_sweeps=average_sweeps)
+        if scan['power_db'].size == 0:
+            return {'success': False, 'error': f'No complete sweeps in {csv_file}'}
+
+        mean_db = 10 * np.log10(np.mean(10 ** (scan['power_db'] / 10.0), axis=0))
+        scan.update({
+            'success': True,
+            'mean_power_db': mean_db.astype(np.float32),
+            'peak_frequencies': self._find_spectrum_peaks(scan['frequencies_hz'], mean_db),
+            'occupancy': self.detect_block_occupancy(scan['frequencies_hz'], scan['power_db'])
+        })
+        return scan
+
+    def _find_spectrum_peaks(self, frequencies_hz: np.ndarray, power_db: np.ndarray,
+                             threshold_db: Optional[float] = None,
+                             smoothing_hz: float = 200e3,
+                             min_separation_hz: float = 1.536e6) -> List[Dict]:
         """Find spectrum peaks that might indicate DAB+ signals"""
-        if not scan_data:
+        if len(power_db) < 3:
             return []
 
+        # Smooth over ~200 kHz so the flat-topped OFDM block gives one maximum
+        bin_width = frequencies_hz[1] - frequencies_hz[0]
+        width = max(1, int(smoothing_hz / bin_width))
+        smoothed = np.convolve(power_db, np.ones(width) / width, mode='same')
+
+        if threshold_db is None:
+            threshold_db = float(np.median(smoothed)) + 10  # 10 dB above the noise floor
+
+        is_peak = ((smoothed[1:-1] > threshold_db) &
+                   (smoothed[1:-1] > smoothed[:-2]) &
+                   (smoothed[1:-1] >= smoothed[2:]))
+        candidates = np.nonzero(is_peak)[0] + 1
+
+        # Strongest first, then drop weaker maxima within one block bandwidth
+        selected = []
+        for index in candidates[np.argsort(smoothed[candidates])[::-1]]:
+            if all(abs(frequencies_hz[index] - frequencies_hz[other]) >= min_separation_hz
+                   for other in selected):
+                selected.append(index)
+
         peaks = []
-        frequencies = [d['frequency_mhz'] for d in scan_data]
-        powers = [d['power_db'] for d in scan_data]
-
-        # Find local maxima above threshold
-        for i in range(1, len(powers) - 1):
-            if (powers[i] > threshold_db and
-                powers[i] > powers[i-1] and
-                powers[i] > powers[i+1]):
-
-                # Check if this frequency matches a DAB+ block
-                closest_block = self._find_closest_dab_block(frequencies[i])
-
-                peak_info = {
-                    'frequency_mhz': frequencies[i],
-                    'power_db': powers[i],
-                    'potential_block': closest_block['block'] if closest_block else None,
-                    'frequency_error_khz': closest_block['error_khz'] if closest_block else None
-                }
-                peaks.append(peak_info)
+        for i in selected:
+            # Centre of the -3 dB region around the maximum (middle of the OFDM block)
+            above = smoothed >= smoothed[i] - 3
+            low = i - np.argmin(above[i::-1]) + 1 if not above[i::-1].all() else 0
+            high = i + np.argmin(above[i:]) - 1 if not above[i:].all() else len(above) - 1
+            frequency_mhz = (frequencies_hz[low] + frequencies_hz[high]) / 2e6
+
+            # Check if this frequency matches a DAB+ block
+            closest_block = self._find_closest_dab_block(frequency_mhz)
+
+            peak_info = {
+                'frequency_mhz': float(frequency_mhz),
+                'power_db': float(smoothed[i]),
+                'potential_block': closest_block['block'] if closest_block else None,
+                'frequency_error_khz': closest_block['error_khz'] if closest_block else None
+            }
+            peaks.append(peak_info)
 
         return sorted(peaks, key=lambda x: x['power_db'], reverse=True)
 
     def _find_closest_dab_block(self, freq_mhz: float, tolerance_khz: float = 500) -> Optional[Dict]:
         """Find the closest DAB+ block to given frequency"""
+        if self.block_index is not None:
+            match = self.block_index.lookup(freq_mhz, tolerance_khz)
+            if match is None:
+                return None
+            block, block_freq, error_khz = match
+            return {'block': block, 'frequency_mhz': block_freq, 'error_khz': error_khz}
+
+        # Lab 3 unavailable - linear search over all blocks
         min_error = float('inf')
         closest_block = None
 
@@ -210,33 +416,56 @@ class DABFrequencyAnalyzer:
 
         return closest_block
 
-    def plot_spectrum(self, scan_data: List[Dict], output_file: str = 'dab_spectrum.png'):
+    def detect_block_occupancy(self, frequencies_hz: np.ndarray,
+                               power_db: np.ndarray) -> Optional[np.ndarray]:
+        """Per-block occupancy table for all of Band III (None if Lab 3 is unavailable)"""
+        if BlockOccupancyDetector is None:
+            return None
+        detector = BlockOccupancyDetector(channels=self.band_iii_blocks)
+        return detector.detect(frequencies_hz, power_db)
+
+    def plot_spectrum(self, frequencies_hz: np.ndarray, power_db: np.ndarray,
+                      output_file: str = 'dab_spectrum.png'):
         """Create spectrum plot with DAB+ block annotations"""
-        if not scan_data:
+        if len(power_db) == 0:
             print("No scan data to plot")
             return
 
-        frequencies = [d['frequency_mhz'] for d in scan_data]
-        powers = [d['power_db'] for d in scan_data]
+        frequencies = np.asarray(frequencies_hz) / 1e6
+        powers = np.asarray(power_db)
+
+        # Assigned DAB+ frequencies, marked as labelled vertical lines
+        markers = [(freq, f'{block_name}\n{region}')
+                   for region, blocks in self.thailand_dab_frequencies.items()
+                   for block_name, freq in blocks.items()]
+
+        if get_renderer is not None:
+            # A 300 dpi render takes seconds on a Pi - hand it to the worker process
+            get_renderer().submit(output_file, frequencies, powers,
+                                  title='DAB+ Band III Spectrum Scan (Thailand)',
+                                  ylabel='Power (dBFS)', figsize=(14, 8), dpi=300,
+                                  linewidth=0.8, alpha=0.7, grid_alpha=0.3, markers=markers,
+                                  legend=['Spectrum', 'Assigned DAB+ Blocks'],
+                                  xlim=(frequencies[0], frequencies[-1]))
+            print(f"Spectrum plot queued: {output_file}")
+            return
 
         plt.figure(figsize=(14, 8))
         plt.plot(frequencies, powers, 'b-', linewidth=0.8, alpha=0.7)
 
-        # Mark assigned DAB+ frequencies
-        for region, blocks in self.thailand_dab_frequencies.items():
-            for block_name, freq in blocks.items():
-                plt.axvline(x=freq, color='red', linestyle='--', alpha=0.6)
-                plt.text(freq, max(powers) - 5, f'{block_name}\n{region}',
-                        rotation=90, ha='center', va='top', fontsize=8)
+        for freq, label in markers:
+            plt.axvline(x=freq, color='red', linestyle='--', alpha=0.6)
+            plt.text(freq, max(powers) - 5, label,
+                     rotation=90, ha='center', va='top', fontsize=8)
 
         plt.xlabel('Frequency (MHz)')
-        plt.ylabel('Power (dB)')
+        plt.ylabel('Power (dBFS)')
         plt.title('DAB+ Band III Spectrum Scan (Thailand)')
         plt.grid(True, alpha=0.3)
         plt.legend(['Spectrum', 'Assigned DAB+ Blocks'])
 
-        # Set frequency range to Band III
-        plt.xlim(174, 230)
+        # Set frequency range to the swept part of Band III
+        plt.xlim(frequencies[0], frequencies[-1])
 
         plt.tight_layout()
         plt.savefig(output_file, dpi=300, bbox_inches='tight')
@@ -386,12 +615,15 @@ def main():
     if analyzer.export_frequency_plan(export_file):
         print(f"\n5. Frequency plan exported to: {export_file}")
 
-    # Optional: Run spectrum scan if rtl_power is available
+    # Optional: Run spectrum scan if an RTL-SDR is connected
     try:
         print("\n6. Running spectrum scan...")
+        if fft_backend is not None:
+            fft_backend.load_benchmark()
         scan_result = analyzer.scan_band_iii_spectrum()
         if scan_result['success']:
-            print(f"   Scan completed. Found {len(scan_result['peak_frequencies'])} potential signals")
+            print(f"   Scan completed in {scan_result['elapsed']:.1f} s ({scan_result['tiles']} tiles). "
+                  f"Found {len(scan_result['peak_frequencies'])} potential signals")
 
             # Show top peaks
             for i, peak in enumerate(scan_result['peak_frequencies'][:5]):
@@ -401,8 +633,13 @@ def main():
                     print(f"     -> Possible {peak['potential_block']} "
                           f"(±{peak['frequency_error_khz']:.0f} kHz)")
 
+            occupancy = scan_result['occupancy']
+            if occupancy is not None:
+                occupied = occupancy[occupancy['occupied']]
+                print(f"   Occupied blocks: {', '.join(occupied['block']) or 'none'}")
+
             # Create plot
-            analyzer.plot_spectrum(scan_result['data'])
+            analyzer.plot_spectrum(scan_result['frequencies_hz'], scan_result['power_db'])
         else:
             print(f"   Scan failed: {scan_result['error']}")
 
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lab 3: Band III Sweep (ใช้ร่วมกันใน Lab 2, Lab 3 และ Lab 4)
+เป้าหมาย: สเปกตรัม 174-240 MHz จาก RTL-SDR ตัวเดียวภายในไม่กี่วินาที โดยไม่ต้องใช้ rtl_power
+
+- แบ่งแบนด์เป็น tile ตาม sample rate ใช้เฉพาะ bins กลาง tile (ขอบมี anti-alias filter roll-off)
+  tile ถัดไปเลื่อนเท่ากับความกว้างที่ใช้ bins จึงต่อกันบน grid เดียว
+- หลังเปลี่ยนความถี่: ล้าง USB buffer แล้วทิ้ง settle_samples (PLL / AGC settling)
+- แทน DC spike ของ tuner ด้วยค่าเฉลี่ยของ bins ข้างเคียง (ไม่เกิด peak ปลอมทุก tile)
+- Normalize ให้ tone full-scale อ่านได้ 0 dBFS (+ calibration_db)
+- ไม่ print ระหว่าง sweep - ผู้เรียกแสดงสรุปเอง
+
+Usage:
+python3 band_sweep.py                  # sweep 174-240 MHz แล้วแสดง peak สูงสุด
+python3 band_sweep.py 200 230          # sweep เฉพาะช่วง (MHz)
+
+Dependencies:
+pip install numpy pyrtlsdr
+"""
+
+import math
+import sys
+import time
+
+import numpy as np
+
+import fft_backend
+from spectrum import welch_psd
+
+try:
+    from rtlsdr import RtlSdr
+except ImportError:
+    RtlSdr = None
+
+class BandSweeper:
+    """
+    Sweep ช่วงความถี่ด้วย RTL-SDR แล้วต่อ tile เป็นสเปกตรัมเดียว
+
+    sdr ที่ส่งให้ sweep() ต้องตั้ง sample_rate เท่ากับ sample_rate ของ sweeper แล้ว
+    (เช่น RTLSDRDataAcquisition.sdr ของ lab3_1a) ถ้าไม่ส่ง จะเปิด/ปิด device เอง
+    """
+
+    def __init__(self, sample_rate=2.4e6, fft_size=512, usable_fraction=0.75,
+                 dwell_time=0.05, gain='auto', settle_samples=16384,
+                 calibration_db=0.0, device_index=0):
+        self.sample_rate = sample_rate
+        self.fft_size = fft_size
+        self.dwell_time = dwell_time            # วินาทีของ I/Q ที่เฉลี่ยต่อ tile
+        self.gain = gain
+        self.settle_samples = settle_samples    # samples ที่ทิ้งหลังเปลี่ยนความถี่
+        self.calibration_db = calibration_db    # offset บวกกับ dBFS (เช่น วัดจาก signal generator)
+        self.device_index = device_index
+
+        self.keep_bins = int(fft_size * usable_fraction) // 2 * 2
+        self.bin_width = sample_rate / fft_size
+        self.tile_step = self.keep_bins * self.bin_width
+
+        # tone full-scale ใน Hann window ได้ |X|^2 = sum(window)^2
+        self.window_gain = float(np.sum(np.hanning(fft_size))) ** 2
+
+    @property
+    def frames_per_tile(self):
+        return max(1, int(self.dwell_time * self.sample_rate) // self.fft_size)
+
+    def plan_tiles(self, start_hz, stop_hz):
+        """ความถี่กลางของ tile ที่ครอบคลุม start_hz..stop_hz"""
+        num_tiles = max(1, math.ceil((stop_hz - start_hz) / self.tile_step))
+        return start_hz + self.tile_step / 2 + np.arange(num_tiles) * self.tile_step
+
+    def process_tile(self, samples):
+        """Power เฉลี่ย (dBFS + calibration) ของ bins ที่ใช้ใน tile หนึ่ง"""
+        _, power = welch_psd(np.asarray(samples, dtype=np.complex64), self.fft_size, overlap=0.0)
+        power /= self.window_gain
+
+        # แทน DC spike ของ tuner ด้วย bins ข้างเคียง
+        dc = self.fft_size // 2
+        power[dc] = 0.5 * (power[dc - 1] + power[dc + 1])
+
+        first = (self.fft_size - self.keep_bins) // 2
+        kept = power[first:first + self.keep_bins]
+        return (10 * np.log10(kept + 1e-20) + self.calibration_db).astype(np.float32)
+
+    def read_tile(self, sdr, center_hz, num_samples):
+        """เปลี่ยนความถี่ ทิ้งข้อมูลเก่าและช่วง settling แล้วคืน samples ของ tile"""
+        sdr.center_freq = center_hz
+        if hasattr(sdr, 'reset_buffer'):
+            sdr.reset_buffer()  # ข้อมูลความถี่เก่าที่ค้างใน USB buffer
+        return sdr.read_samples(self.settle_samples + num_samples)[self.settle_samples:]
+
+    def sweep(self, start_hz=174e6, stop_hz=240e6, sdr=None):
+        """
+        Sweep start_hz..stop_hz คืนค่า (frequencies_hz, power_db)
+
+        ส่ง RtlSdr ที่เปิดอยู่เป็น sdr เพื่อใช้ device เดิม (ความถี่เดิมไม่ถูกตั้งกลับ)
+        """
+        own_device = sdr is None
+        if own_device:
+            if RtlSdr is None:
+                raise RuntimeError("pyrtlsdr is not installed (pip install pyrtlsdr)")
+            sdr = RtlSdr(self.device_index)
+            sdr.sample_rate = self.sample_rate
+            sdr.gain = self.gain
+
+        centers = self.plan_tiles(start_hz, stop_hz)
+        num_samples = self.frames_per_tile * self.fft_size
+        power_db = np.empty(len(centers) * self.keep_bins, dtype=np.float32)
+
+        try:
+            for index, center in enumerate(centers):
+                samples = self.read_tile(sdr, int(center), num_samples)
+                power_db[index * self.keep_bins:(index + 1) * self.keep_bins] = \
+                    self.process_tile(samples)
+        finally:
+            if own_device:
+                sdr.close()
+
+        frequencies = (start_hz + np.arange(len(power_db)) * self.bin_width).astype(np.float64)
+        in_range = frequencies <= stop_hz
+        return frequencies[in_range], power_db[in_range]
+
+def main():
+    """Sweep Band III แล้วแสดงสรุป"""
+    print("=== Lab 3: Band III Sweep ===")
+
+    args = [float(arg) for arg in sys.argv[1:3]]
+    start_mhz, stop_mhz = (args + [174.0, 240.0][len(args):])[:2]
+
+    fft_backend.load_benchmark()
+    sweeper = BandSweeper()
+    start_time = time.perf_counter()
+    try:
+        frequencies, power_db = sweeper.sweep(start_mhz * 1e6, stop_mhz * 1e6)
+    except Exception as e:
+        print(f"Sweep error: {e}")
+        return
+    elapsed = time.perf_counter() - start_time
+
+    peak = int(np.argmax(power_db))
+    print(f"Swept {start_mhz:.0f}-{stop_mhz:.0f} MHz in {elapsed:.1f} s "
+          f"({len(sweeper.plan_tiles(start_mhz * 1e6, stop_mhz * 1e6))} tiles, {len(power_db):,} bins)")
+    print(f"Noise floor {np.median(power_db):.1f} dBFS, "
+          f"strongest {power_db[peak]:.1f} dBFS at {frequencies[peak]/1e6:.3f} MHz")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lab 3: Capture Statistics (sample drops และ throughput)
+เป้าหมาย: บอกได้ว่า capture path ทำ I/Q หายหรือไม่ ก่อนที่เสียงจะเริ่มสะดุด
+
+- นับ samples ที่ได้รับเทียบกับที่ควรได้ (elapsed time x sample rate)
+- นับ gaps: block ที่ถูกทิ้ง (queue เต็ม) และช่วงที่ไม่มีข้อมูลเข้านานผิดปกติ (stall)
+- Histogram ของ read latency (USB / socket) แบบ log scale
+  (callback-based capture วัดได้เพียงช่วงห่างระหว่าง callback - ใช้ชื่อ "callback interval")
+- Queue high-water mark
+- อ่านค่าได้ด้วย snapshot() และแสดงผลเป็นระยะด้วย maybe_log()
+
+Dependencies:
+pip install numpy
+"""
+
+import threading
+import time
+
+import numpy as np
+
+# ขอบของ latency histogram (ms) - log scale จาก 0.1 ms ถึง 1 s
+LATENCY_BINS_MS = np.array([0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000])
+
+class CaptureStats:
+    def __init__(self, sample_rate, name="capture", log_interval=10.0,
+                 stall_threshold=0.25, log_function=print):
+        self.sample_rate = sample_rate
+        self.name = name
+        self.log_interval = log_interval        # วินาที (0 = ไม่แสดงอัตโนมัติ)
+        self.stall_threshold = stall_threshold  # วินาทีที่ไม่มีข้อมูลเข้า ถือว่าเป็น gap
+        self.log_function = log_function
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, sample_rate=None, latency_label="read latency"):
+        """
+        เริ่มนับใหม่ (ระบุ sample_rate ใหม่ได้ถ้าเปลี่ยนหลังสร้าง object)
+
+        latency_label: ชื่อของค่าที่ส่งให้ record_block() ใช้ในข้อความสรุป/histogram
+        """
+        with self.lock:
+            if sample_rate:
+                self.sample_rate = sample_rate
+            self.latency_label = latency_label
+            self.start_time = time.perf_counter()
+            self.last_block_time = None
+            self.last_log_time = self.start_time
+
+            self.samples_received = 0
+            self.blocks_received = 0
+            self.samples_dropped = 0
+            self.blocks_dropped = 0
+            self.stalls = 0
+            self.longest_stall = 0.0
+
+            # bins: < 0.1 ms, 0.1-0.2 ms, ..., >= 1000 ms
+            self.latency_counts = np.zeros(len(LATENCY_BINS_MS) + 1, dtype=np.int64)
+            self.latency_max = 0.0
+            self.latency_sum = 0.0
+
+            self.queue_high_water = 0
+            self.queue_capacity = None
+
+    def record_block(self, num_samples, read_latency=None, queue_depth=None):
+        """
+        บันทึก block ที่ได้รับ
+
+        read_latency: เวลาที่รอ read/recv (วินาที) หรือค่าตาม latency_label
+        queue_depth: จำนวน block ที่รออยู่ใน queue หลังจากใส่ block นี้
+        """
+        now = time.perf_counter()
+
+        with self.lock:
+            if self.last_block_time is not None:
+                interval = now - self.last_block_time
+                if interval > self.stall_threshold:
+                    self.stalls += 1
+                    self.longest_stall = max(self.longest_stall, interval)
+            self.last_block_time = now
+
+            self.samples_received += num_samples
+            self.blocks_received += 1
+
+            if read_latency is not None:
+                latency_ms = read_latency * 1000
+                self.latency_counts[np.searchsorted(LATENCY_BINS_MS, latency_ms, side='right')] += 1
+                self.latency_sum += read_latency
+                self.latency_max = max(self.latency_max, read_latency)
+
+            if queue_depth is not None:
+                self.queue_high_water = max(self.queue_high_water, queue_depth)
+
+        if self.log_interval:
+            self.maybe_log(now)
+
+    def record_drop(self, num_samples, num_blocks=1):
+        """บันทึก block ที่ถูกทิ้ง (เช่น queue เต็ม, consumer ช้า)"""
+        with self.lock:
+            self.samples_dropped += num_samples
+            self.blocks_dropped += num_blocks
+
+    def set_queue_capacity(self, capacity):
+        """ขนาด queue สูงสุด (ใช้แสดงร่วมกับ high-water mark)"""
+        self.queue_capacity = capacity
+
+    def snapshot(self):
+        """ค่าสถิติปัจจุบันเป็น dict"""
+        with self.lock:
+            elapsed = time.perf_counter() - self.start_time
+            expected = int(elapsed * self.sample_rate)
+            latency_count = int(self.latency_counts.sum())
+
+            # samples ที่ขาดไป = ที่ควรได้ - ที่ได้ (ไม่ติดลบเมื่อ buffer ส่งมาเร็วกว่า real-time)
+            shortfall = max(0, expected - self.samples_received)
+
+            return {
+                'name': self.name,
+                'elapsed': elapsed,
+                'samples_expected': expected,
+                'samples_received': self.samples_received,
+                'samples_shortfall': shortfall,
+                'samples_dropped': self.samples_dropped,
+                'blocks_received': self.blocks_received,
+                'blocks_dropped': self.blocks_dropped,
+                'gaps': self.blocks_dropped + self.stalls,
+                'stalls': self.stalls,
+                'longest_stall_ms': self.longest_stall * 1000,
+                'throughput_sps': self.samples_received / elapsed if elapsed > 0 else 0,
+                'realtime_ratio': (self.samples_received / expected) if expected else 0,
+                'latency_label': self.latency_label,
+                'latency_bins_ms': LATENCY_BINS_MS.tolist(),
+                'latency_counts': self.latency_counts.tolist(),
+                'latency_avg_ms': self.latency_sum / latency_count * 1000 if latency_count else 0,
+                'latency_max_ms': self.latency_max * 1000,
+                'latency_p99_ms': self.latency_percentile(0.99),
+                'queue_high_water': self.queue_high_water,
+                'queue_capacity': self.queue_capacity
+            }
+
+    def latency_percentile(self, fraction):
+        """ประมาณ percentile จาก histogram (คืนขอบบนของ bin)"""
+        total = self.latency_counts.sum()
+        if total == 0:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self.latency_counts), fraction * total))
+        if index >= len(LATENCY_BINS_MS):
+            return self.latency_max * 1000
+        return float(LATENCY_BINS_MS[index])
+
+    def format_summary(self, stats=None):
+        """สรุปเป็นข้อความบรรทัดเดียว"""
+        stats = stats or self.snapshot()
+        queue = ""
+        if stats['queue_capacity']:
+            queue = f", queue peak {stats['queue_high_water']}/{stats['queue_capacity']}"
+        elif stats['queue_high_water']:
+            queue = f", queue peak {stats['queue_high_water']}"
+
+        return (f"[{stats['name']}] {stats['throughput_sps']/1e6:.3f} Msps "
+                f"({stats['realtime_ratio']*100:.1f}% of expected), "
+                f"dropped {stats['samples_dropped']:,} samples in {stats['blocks_dropped']} blocks, "
+                f"{stats['stalls']} stalls, {stats['latency_label']} avg {stats['latency_avg_ms']:.1f} ms "
+                f"/ p99 {stats['latency_p99_ms']:.1f} ms / max {stats['latency_max_ms']:.1f} ms{queue}")
+
+    def print_histogram(self):
+        """แสดง latency histogram"""
+        stats = self.snapshot()
+        counts = stats['latency_counts']
+        total = sum(counts) or 1
+        edges = ['0'] + [f"{edge:g}" for edge in LATENCY_BINS_MS] + ['inf']
+
+        print(f"[{self.name}] {stats['latency_label'].capitalize()} histogram (ms):")
+        for index, count in enumerate(counts):
+            if count:
+                bar = '#' * max(1, int(40 * count / total))
+                print(f"  {edges[index]:>5s} - {edges[index + 1]:<5s} {count:8d} {bar}")
+
+    def maybe_log(self, now=None):
+        """แสดงสรุปถ้าครบ log_interval แล้ว"""
+        now = now or time.perf_counter()
+        if now - self.last_log_time >= self.log_interval:
+            self.last_log_time = now
+            self.log_function(self.format_summary())
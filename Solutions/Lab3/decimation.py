@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lab 3: Display Decimation (min/max ตามจำนวน pixel)
+เป้าหมาย: วาดกราฟด้วยจำนวนจุดตามความกว้างของจอ ไม่ใช่ตามขนาดข้อมูล
+
+- แบ่งข้อมูลเป็นช่วงแล้วเก็บค่า min และ max ของแต่ละช่วง (ค่าเริ่มต้น 1 ช่วงต่อ pixel = ~2 จุดต่อ pixel)
+  peak แคบๆ (เช่น carrier หรือ spike) จึงไม่หายไปเหมือนการเลือกทุก N จุด
+- เรียงจุด min/max ตามลำดับที่เกิดจริงในช่วงนั้น - รูปคลื่นไม่กลับด้าน
+- ข้อมูลที่มีจุดน้อยกว่า points_per_pixel จุดต่อ pixel อยู่แล้วคืนค่าเดิม (ไม่ copy)
+- ใช้ได้ทั้ง matplotlib (Line2D.set_data) และ pyqtgraph (PlotDataItem.setData)
+
+Usage:
+python3 decimation.py    # เปรียบเทียบเวลาวาดสเปกตรัม 2048-65536 จุดด้วย matplotlib (Agg)
+
+Dependencies:
+pip install numpy matplotlib
+"""
+
+import time
+
+import numpy as np
+
+def minmax_decimate(x, y, num_pixels, points_per_pixel=2):
+    """
+    ลดข้อมูล (x, y) ให้เหลือประมาณ points_per_pixel จุดต่อ pixel ด้วย min/max envelope
+
+    num_pixels: ความกว้างของพื้นที่วาดเป็น pixel (เช่น ax.bbox.width หรือ widget.width())
+    points_per_pixel: แต่ละช่วงให้ 2 จุด (min, max) จึงใช้ num_pixels * points_per_pixel // 2 ช่วง
+    คืนค่า (x, y) ที่มีไม่เกิน num_pixels * points_per_pixel จุด (อย่างน้อย 2 จุด)
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    num_pixels = max(1, int(num_pixels))
+
+    if len(y) <= num_pixels * points_per_pixel:
+        return x, y
+
+    # ช่วงละเท่ากัน - เติมท้ายด้วยค่าสุดท้ายให้หารลงตัว
+    target_buckets = max(1, int(num_pixels * points_per_pixel) // 2)
+    bucket_size = int(np.ceil(len(y) / target_buckets))
+    num_buckets = int(np.ceil(len(y) / bucket_size))
+    padding = num_buckets * bucket_size - len(y)
+    buckets = np.pad(y, (0, padding), mode='edge').reshape(num_buckets, bucket_size)
+
+    low_index = np.argmin(buckets, axis=1)
+    high_index = np.argmax(buckets, axis=1)
+
+    # index จริงในข้อมูล เรียง min/max ตามตำแหน่งที่เกิดก่อน
+    offsets = np.arange(num_buckets) * bucket_size
+    first = offsets + np.minimum(low_index, high_index)
+    second = offsets + np.maximum(low_index, high_index)
+    index = np.minimum(np.column_stack((first, second)).ravel(), len(y) - 1)
+
+    return x[index], y[index]
+
+def axes_width_pixels(ax):
+    """ความกว้างของ matplotlib Axes เป็น pixel"""
+    return ax.bbox.width
+
+def benchmark(sizes=(2048, 8192, 65536), width=800, repeats=20):
+    """เวลาวาดเส้นสเปกตรัมเต็มความละเอียด เทียบกับหลัง minmax_decimate"""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    figure = Figure(figsize=(width / 100, 3), dpi=100)
+    canvas = FigureCanvasAgg(figure)
+    ax = figure.add_subplot(1, 1, 1)
+    line, = ax.plot([], [], 'b-', linewidth=1, animated=True)
+    ax.set_ylim(-100, -20)
+    canvas.draw()
+    background = canvas.copy_from_bbox(figure.bbox)
+
+    def draw_time(x, y):
+        line.set_data(x, y)
+        start_time = time.perf_counter()
+        for _ in range(repeats):
+            canvas.restore_region(background)
+            ax.draw_artist(line)
+        return (time.perf_counter() - start_time) / repeats * 1000
+
+    print(f"Line draw time on {int(axes_width_pixels(ax))} px wide axes:")
+    for size in sizes:
+        x = np.linspace(184.336, 186.384, size)
+        y = np.random.standard_normal(size) * 3 - 80
+        y[size // 3] = -30  # spike แคบ 1 จุด - ต้องยังเห็นหลัง decimate
+        ax.set_xlim(x[0], x[-1])
+
+        full = draw_time(x, y)
+        start_time = time.perf_counter()
+        x_display, y_display = minmax_decimate(x, y, axes_width_pixels(ax))
+        decimate_ms = (time.perf_counter() - start_time) * 1000
+        reduced = draw_time(x_display, y_display)
+
+        print(f"  {size:6d} points: full {full:6.2f} ms, "
+              f"decimated ({len(y_display)} points) {reduced:5.2f} ms + {decimate_ms:.2f} ms, "
+              f"peak kept: {y_display.max() == y.max()}")
+
+def main():
+    """Benchmark การวาดกราฟหลัง decimate"""
+    print("=== Lab 3: Display Decimation ===")
+    benchmark()
+
+if __name__ == "__main__":
+    main()
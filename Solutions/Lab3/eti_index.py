@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lab 3: ETI Frame Index (sidecar สำหรับ seek ในไฟล์ ETI ขนาดใหญ่)
+เป้าหมาย: หา frame ตามเวลา, ตัดช่วง, หา frame ที่เสีย โดยไม่ต้องอ่านไฟล์ ETI ซ้ำ
+
+- Index 16 bytes ต่อ frame (ไฟล์ ETI 6144 bytes ต่อ frame): byte offset, CIF count, FCT,
+  status (ERR/FSYNC/CRC/FCT gap/layout เปลี่ยน) และ layout signature (CRC ของ FC + STC)
+- บันทึกเป็นไฟล์ sidecar <ชื่อไฟล์>.eti.idx ต่อท้ายได้ - update() parse เฉพาะ frame ใหม่
+  จึงใช้ได้ขณะ eti-cmdline ยังเขียนไฟล์อยู่ (~2 MB/s ต่อ ensemble)
+- CIF count นับต่อเนื่องจาก FCT (0-249) - frame หายทำให้ CIF กระโดด เวลาจึงยังถูกต้อง
+- Seek ตามเวลา O(log n) (searchsorted บน CIF count), ตัดช่วง = slice ของ memmap,
+  frame ที่เสียถัดไป O(log n) จากรายการ error ที่เก็บไว้
+- ถ้าไฟล์ ETI ถูกเขียนทับ (frame แรกไม่ตรงหรือไฟล์สั้นลง) จะสร้าง index ใหม่อัตโนมัติ
+
+Usage:
+python3 eti_index.py dab_ensemble.eti                   # สร้าง/อัปเดต index แล้วสรุป
+python3 eti_index.py dab_ensemble.eti --follow          # อัปเดตทุกวินาทีขณะไฟล์ยังโตอยู่
+python3 eti_index.py dab_ensemble.eti --errors          # รายการ frame ที่เสีย
+python3 eti_index.py dab_ensemble.eti --extract 60 90 clip.eti   # ตัดวินาทีที่ 60-90
+
+Dependencies:
+pip install numpy
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from eti import (ETI_FRAME_DURATION, ETI_FRAME_SIZE, ERR_NO_ERROR, FCT_MODULO,
+                 ETIFile, crc16_rows, parse_frames)
+
+INDEX_EXTENSION = '.idx'
+INDEX_MAGIC = b'ETIINDEX'
+INDEX_VERSION = 1
+
+# Status bits ต่อ frame
+STATUS_ERR = 0x01            # ERR != 0xFF (eti-cmdline แจ้งว่า frame มีปัญหา)
+STATUS_SYNC = 0x02           # FSYNC ผิด
+STATUS_HEADER_CRC = 0x04     # CRC ของ FC + STC + MNSC ผิด
+STATUS_MST_CRC = 0x08        # CRC ของ FIC + sub-channels ผิด (ถ้าตรวจ)
+STATUS_FCT_GAP = 0x10        # FCT ไม่ต่อจาก frame ก่อนหน้า (frame หาย)
+STATUS_LAYOUT = 0x20         # layout (จำนวน/ขนาด sub-channel) เปลี่ยนที่ frame นี้
+STATUS_ERRORS = STATUS_ERR | STATUS_SYNC | STATUS_HEADER_CRC | STATUS_MST_CRC
+
+FLAG_MST_CHECKED = 0x1
+
+# Header ของไฟล์ sidecar (32 bytes) แล้วตามด้วย record ละ frame
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u2'),
+    ('record_size', '<u2'),
+    ('flags', '<u4'),
+    ('first_frame', 'V8'),   # 8 bytes แรกของ frame 0 - ตรวจว่าเป็นไฟล์ ETI เดิม (V8 เก็บ NUL ท้ายครบ)
+    ('reserved', 'S8'),
+])
+
+INDEX_DTYPE = np.dtype([
+    ('offset', '<u8'),       # byte offset ของ frame ในไฟล์ ETI
+    ('cif', '<u4'),          # CIF count ต่อเนื่อง (x 24 ms = เวลา)
+    ('fct', 'u1'),           # FCT (frame ที่เสีย = ค่าที่ควรเป็น)
+    ('status', 'u1'),        # STATUS_* bits
+    ('layout', '<u2'),       # layout signature (frame ที่เสีย = ของ frame ดีก่อนหน้า)
+])
+
+def index_path(eti_filename):
+    """ชื่อไฟล์ sidecar ของไฟล์ ETI"""
+    return eti_filename + INDEX_EXTENSION
+
+def layout_signatures(frames, headers):
+    """
+    CRC-16 ของ FC + STC โดยไม่รวม FCT และ FP (ค่าที่เปลี่ยนทุก frame)
+
+    ค่าเท่ากัน = จำนวน sub-channel, ตำแหน่ง, protection และ bitrate เหมือนกัน
+    """
+    signatures = np.zeros(len(headers), dtype=np.uint16)
+    nst = headers['nst']
+    for value in np.unique(nst):
+        rows = np.flatnonzero(nst == value)
+        fields = np.array(frames[rows, 4:8 + 4 * int(value)])
+        fields[:, 0] = 0         # FCT
+        fields[:, 2] &= 0x1F     # FP (3 bits บน)
+        signatures[rows] = crc16_rows(fields)
+    return signatures
+
+class ETIIndex:
+    """
+    Index ของไฟล์ ETI พร้อม sidecar บนดิสก์
+
+    update(): index frame ที่เพิ่มขึ้นตั้งแต่ครั้งก่อน (เรียกซ้ำได้ขณะไฟล์ยังโต)
+    records: INDEX_DTYPE array ของทุก frame ที่ index แล้ว
+    """
+
+    def __init__(self, eti_filename, verify_mst=True, block_frames=4096):
+        self.eti = ETIFile(eti_filename)
+        self.filename = index_path(eti_filename)
+        self.verify_mst = verify_mst
+        self.block_frames = block_frames
+        self._records = np.zeros(0, dtype=INDEX_DTYPE)
+        self._count = 0
+        self.error_frames = np.zeros(0, dtype=np.int64)
+        self.first_frame = b''
+        self._load()
+
+    @property
+    def records(self):
+        return self._records[:self._count]
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def duration(self):
+        """ระยะเวลาตาม CIF count (รวมช่วงที่ frame หาย)"""
+        if self._count == 0:
+            return 0.0
+        cif = self.records['cif']
+        return (int(cif[-1]) - int(cif[0]) + 1) * ETI_FRAME_DURATION
+
+    def _flags(self):
+        return FLAG_MST_CHECKED if self.verify_mst else 0
+
+    def _first_frame(self):
+        return bytes(self.eti.frames[0, :8]) if len(self.eti) else b''
+
+    def _load(self):
+        """อ่าน sidecar เดิม - สร้างใหม่ถ้าไม่ตรงกับไฟล์ ETI หรือ option"""
+        self.eti.refresh()
+        if not os.path.exists(self.filename):
+            return
+
+        header = np.fromfile(self.filename, dtype=HEADER_DTYPE, count=1)
+        if (len(header) == 0 or header['magic'][0] != INDEX_MAGIC or
+                header['version'][0] != INDEX_VERSION or
+                header['record_size'][0] != INDEX_DTYPE.itemsize or
+                header['flags'][0] != self._flags() or
+                bytes(header['first_frame'][0]) != self._first_frame()):
+            self.reset()
+            return
+        self.first_frame = bytes(header['first_frame'][0])
+
+        records = np.fromfile(self.filename, dtype=INDEX_DTYPE, offset=HEADER_DTYPE.itemsize)
+        if len(records) > len(self.eti):
+            self.reset()
+            return
+
+        # record ท้ายที่เขียนไม่ครบ (โปรแกรมถูกหยุดกลางคัน) - ตัดทิ้ง
+        expected_size = HEADER_DTYPE.itemsize + len(records) * INDEX_DTYPE.itemsize
+        if os.path.getsize(self.filename) != expected_size:
+            os.truncate(self.filename, expected_size)
+
+        self._append(records)
+
+    def reset(self):
+        """ลบ index เดิม (ทั้งในหน่วยความจำและ sidecar)"""
+        self._records = np.zeros(0, dtype=INDEX_DTYPE)
+        self._count = 0
+        self.error_frames = np.zeros(0, dtype=np.int64)
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def _append(self, records):
+        """เพิ่ม records ต่อท้ายในหน่วยความจำ (ขยาย buffer ทีละ 2 เท่า)"""
+        needed = self._count + len(records)
+        if needed > len(self._records):
+            grown = np.zeros(max(needed, 2 * len(self._records), 1024), dtype=INDEX_DTYPE)
+            grown[:self._count] = self.records
+            self._records = grown
+        self._records[self._count:needed] = records
+
+        errors = np.flatnonzero(records['status'] & STATUS_ERRORS) + self._count
+        self.error_frames = np.concatenate((self.error_frames, errors))
+        self._count = needed
+
+    def _index_block(self, start, stop):
+        """สร้าง records ของ frames [start, stop) ต่อจาก record ก่อนหน้า"""
+        frames = self.eti.frames[start:stop]
+        headers, _ = parse_frames(frames, self.verify_mst)
+        num_frames = len(headers)
+
+        status = np.zeros(num_frames, dtype=np.uint8)
+        status[headers['err'] != ERR_NO_ERROR] |= STATUS_ERR
+        status[~headers['fsync_ok']] |= STATUS_SYNC
+        status[headers['fsync_ok'] & ~headers['header_crc_ok']] |= STATUS_HEADER_CRC
+        status[headers['mst_crc_ok'] == 0] |= STATUS_MST_CRC
+        good = headers['fsync_ok'] & headers['header_crc_ok']
+
+        # Frame ที่เสียใช้ FCT/layout ของ frame ดีก่อนหน้า (นับต่อไปทีละ 1)
+        position = np.arange(1, num_frames + 1)
+        anchor = np.maximum.accumulate(np.where(good, position, 0))
+        layout = layout_signatures(frames, headers)
+
+        if self._count:
+            last = self.records[-1]
+            last_fct, last_cif, last_layout = int(last['fct']), int(last['cif']), int(last['layout'])
+        else:
+            # frame แรกของไฟล์ได้ CIF count 0
+            first_good = np.flatnonzero(good)
+            first_fct = int(headers['fct'][first_good[0]]) - int(first_good[0]) if len(first_good) else 0
+            last_fct, last_cif = (first_fct - 1) % FCT_MODULO, -1
+            last_layout = int(layout[first_good[0]]) if len(first_good) else 0
+
+        anchor_fct = np.where(anchor > 0, headers['fct'][anchor - 1], last_fct).astype(np.int64)
+        fct = (anchor_fct + position - np.where(anchor > 0, anchor, 0)) % FCT_MODULO
+        layout = np.where(anchor > 0, layout[anchor - 1], last_layout)
+
+        step = np.diff(fct, prepend=last_fct) % FCT_MODULO
+        status[step != 1] |= STATUS_FCT_GAP
+        status[np.diff(layout.astype(np.int32), prepend=last_layout) != 0] |= STATUS_LAYOUT
+
+        records = np.zeros(num_frames, dtype=INDEX_DTYPE)
+        records['offset'] = np.arange(start, stop, dtype=np.uint64) * ETI_FRAME_SIZE
+        records['cif'] = last_cif + np.cumsum(step)
+        records['fct'] = fct
+        records['status'] = status
+        records['layout'] = layout
+        return records
+
+    def update(self):
+        """Index frame ที่เพิ่มขึ้นในไฟล์ ETI แล้วต่อท้าย sidecar - คืนจำนวน frame ใหม่"""
+        num_frames = self.eti.refresh()
+        if num_frames < self._count or (self._count and self._first_frame() != self.first_frame):
+            # ไฟล์ ETI ถูกเขียนทับ - index ใหม่ทั้งหมด
+            self.reset()
+
+        start = self._count
+        if start >= num_frames:
+            return 0
+
+        if start == 0:
+            header = np.zeros(1, dtype=HEADER_DTYPE)
+            header['magic'] = INDEX_MAGIC
+            header['version'] = INDEX_VERSION
+            header['record_size'] = INDEX_DTYPE.itemsize
+            header['flags'] = self._flags()
+            header['first_frame'] = self.first_frame = self._first_frame()
+            with open(self.filename, 'wb') as f:
+                f.write(header.tobytes())
+
+        with open(self.filename, 'ab') as f:
+            for block_start in range(start, num_frames, self.block_frames):
+                records = self._index_block(block_start, min(block_start + self.block_frames, num_frames))
+                f.write(records.tobytes())
+                self._append(records)
+        return num_frames - start
+
+    def frame_at(self, seconds):
+        """Index ของ frame ที่เวลา seconds นับจาก frame แรก (O(log n))"""
+        if self._count == 0:
+            raise IndexError("ETI index is empty")
+        cif = self.records['cif']
+        target = int(cif[0]) + int(round(seconds / ETI_FRAME_DURATION))
+        return min(int(np.searchsorted(cif, target)), self._count - 1)
+
+    def time_of(self, index):
+        """เวลา (วินาที) ของ frame index นับจาก frame แรก"""
+        cif = self.records['cif']
+        return (int(cif[index]) - int(cif[0])) * ETI_FRAME_DURATION
+
+    def frames(self, start_seconds, stop_seconds=None):
+        """Frames ในช่วงเวลา (memmap slice, N x 6144) - ไม่อ่านส่วนอื่นของไฟล์"""
+        start = self.frame_at(start_seconds)
+        stop = self._count if stop_seconds is None else self.frame_at(stop_seconds)
+        return self.eti.frames[start:stop]
+
+    def extract(self, start_seconds, stop_seconds, output_file):
+        """บันทึกช่วงเวลาเป็นไฟล์ ETI ใหม่ - คืนจำนวน frame"""
+        frames = self.frames(start_seconds, stop_seconds)
+        with open(output_file, 'wb') as f:
+            for block_start in range(0, len(frames), self.block_frames):
+                f.write(frames[block_start:block_start + self.block_frames].tobytes())
+        return len(frames)
+
+    def errors(self, start=0, stop=None):
+        """Index ของ frame ที่เสีย (ERR/FSYNC/CRC) ในช่วง frame [start, stop)"""
+        stop = self._count if stop is None else stop
+        first, last = np.searchsorted(self.error_frames, (start, stop))
+        return self.error_frames[first:last]
+
+    def next_error(self, index):
+        """Frame ที่เสียถัดไปตั้งแต่ index (None ถ้าไม่มี) - O(log n)"""
+        position = np.searchsorted(self.error_frames, index)
+        return int(self.error_frames[position]) if position < len(self.error_frames) else None
+
+    def gaps(self):
+        """Index ของ frame ที่ต่อจากช่วงที่ frame หาย"""
+        return np.flatnonzero(self.records['status'] & STATUS_FCT_GAP)
+
+    def layout_changes(self):
+        """Index ของ frame ที่ layout ของ sub-channels เปลี่ยน (ไม่รวม frame แรก)"""
+        return np.flatnonzero(self.records['status'] & STATUS_LAYOUT)
+
+    def summary(self):
+        """สรุปสถิติจาก index"""
+        status = self.records['status']
+        missing = 0
+        if self._count:
+            missing = int(self.records['cif'][-1]) - int(self.records['cif'][0]) + 1 - self._count
+        return {
+            'frames': self._count,
+            'duration_seconds': self.duration,
+            'error_frames': len(self.error_frames),
+            'err_frames': int(np.count_nonzero(status & STATUS_ERR)),
+            'sync_errors': int(np.count_nonzero(status & STATUS_SYNC)),
+            'header_crc_errors': int(np.count_nonzero(status & STATUS_HEADER_CRC)),
+            'mst_crc_errors': int(np.count_nonzero(status & STATUS_MST_CRC)),
+            'fct_gaps': len(self.gaps()),
+            'missing_frames': max(0, missing),
+            'layout_changes': len(self.layout_changes()),
+            'index_bytes': os.path.getsize(self.filename) if os.path.exists(self.filename) else 0,
+        }
+
+def print_index_summary(summary):
+    """แสดงผลสรุปของ index"""
+    print(f"Frames: {summary['frames']} ({summary['duration_seconds']:.1f} seconds)")
+    print(f"Error frames: {summary['error_frames']} (ERR {summary['err_frames']}, "
+          f"sync {summary['sync_errors']}, header CRC {summary['header_crc_errors']}, "
+          f"MST CRC {summary['mst_crc_errors']})")
+    print(f"FCT gaps: {summary['fct_gaps']} ({summary['missing_frames']} frames missing), "
+          f"layout changes: {summary['layout_changes']}")
+    print(f"Index size: {summary['index_bytes']:,} bytes")
+
+def main():
+    """ฟังก์ชันหลัก"""
+    parser = argparse.ArgumentParser(description='Lab 3: ETI frame index (sidecar) for fast seek')
+    parser.add_argument('file', help='ETI file')
+    parser.add_argument('--follow', action='store_true', help='Keep updating while the file grows (Ctrl+C to stop)')
+    parser.add_argument('--errors', action='store_true', help='List error frames with their time')
+    parser.add_argument('--extract', nargs=3, metavar=('START', 'STOP', 'OUTPUT'),
+                        help='Write seconds START-STOP to a new ETI file')
+    parser.add_argument('--no-mst', action='store_true', help='Skip MST CRC check (faster)')
+    args = parser.parse_args()
+
+    print("=== Lab 3: ETI Frame Index ===")
+    start_time = time.perf_counter()
+    index = ETIIndex(args.file, verify_mst=not args.no_mst)
+    loaded = len(index)
+    added = index.update()
+    print(f"{args.file}: {loaded} frames from {index.filename}, {added} new frames indexed "
+          f"in {time.perf_counter() - start_time:.2f} s")
+    print_index_summary(index.summary())
+
+    if args.errors:
+        for frame in index.errors():
+            record = index.records[frame]
+            print(f"  frame {frame:7d} at {index.time_of(frame):8.2f} s: status 0x{record['status']:02X}")
+
+    if args.extract:
+        start_seconds, stop_seconds, output = float(args.extract[0]), float(args.extract[1]), args.extract[2]
+        count = index.extract(start_seconds, stop_seconds, output)
+        print(f"Extracted {count} frames ({start_seconds}-{stop_seconds} s) to {output}")
+
+    if args.follow:
+        try:
+            while True:
+                time.sleep(1.0)
+                added = index.update()
+                if added:
+                    summary = index.summary()
+                    print(f"  +{added} frames: {summary['frames']} frames, "
+                          f"{summary['duration_seconds']:.1f} s, {summary['error_frames']} errors")
+        except KeyboardInterrupt:
+            print("\nStopped following")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lab 3: FFT Backend (numpy.fft / scipy.fft แบบหลาย thread)
+เป้าหมาย: ให้ทุกส่วนที่ใช้ FFT (Lab 3, Lab 4, Lab 6) เลือก backend ที่เร็วที่สุดบนเครื่องนั้นๆ
+
+- รองรับ numpy.fft (มีเสมอ) และ scipy.fft พร้อม workers= (ใช้ได้ทุก core ของ Pi 4)
+- Benchmark สั้นๆ ตอนเริ่มโปรแกรม (เรียก load_benchmark() จาก main() ก่อนเริ่ม capture)
+  แล้วเก็บผลไว้ในไฟล์ (~/.cache/dab_plus_labs/) ครั้งต่อไปโหลดผลเดิม
+  ทำใหม่เมื่อเปลี่ยนเครื่อง/เวอร์ชันของ numpy หรือ scipy
+- ก่อน load_benchmark() ใช้ numpy.fft ไปก่อน - FFT ใน capture thread ไม่ต้องรอ benchmark
+- เลือก backend แยกตามขนาด FFT และแบบ single / batched (หลาย frame พร้อมกัน)
+- Cache window และตัวเลือก backend ต่อขนาด (scipy.fft / pocketfft cache twiddle เอง)
+- บังคับ backend ได้ด้วย environment variable DAB_FFT_BACKEND=numpy หรือ scipy
+
+Usage:
+python3 fft_backend.py            # แสดงผล benchmark (ทำใหม่ถ้ายังไม่มี)
+python3 fft_backend.py --force    # benchmark ใหม่
+
+Dependencies:
+pip install numpy
+pip install scipy   # (optional) สำหรับ multi-threaded FFT
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+try:
+    import scipy
+    import scipy.fft
+    HAVE_SCIPY = True
+except ImportError:
+    HAVE_SCIPY = False
+
+BENCHMARK_SIZES = [1024, 4096, 16384, 65536]
+BENCHMARK_BATCH_SAMPLES = 262144  # จำนวน samples ต่อการทดสอบแบบ batched
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+                         'dab_plus_labs')
+BENCHMARK_FILE = os.path.join(CACHE_DIR, 'fft_benchmark.json')
+
+WINDOW_FUNCTIONS = {
+    'hann': np.hanning,
+    'hamming': np.hamming,
+    'blackman': np.blackman,
+    'rectangular': np.ones,
+}
+
+_window_cache = {}
+_plan_cache = {}     # (size, batched) -> FFTBackend
+_benchmark = None
+
+def get_window(name, size):
+    """คืน window (float32) ที่ cache ไว้ตามชนิดและขนาด"""
+    key = (name, size)
+    if key not in _window_cache:
+        if name not in WINDOW_FUNCTIONS:
+            raise ValueError(f"Unknown window: {name}")
+        _window_cache[key] = WINDOW_FUNCTIONS[name](size).astype(np.float32)
+    return _window_cache[key]
+
+class FFTBackend:
+    """FFT หนึ่งชุด (numpy หรือ scipy + จำนวน workers) ที่มี interface เดียวกัน"""
+
+    def __init__(self, name='numpy', workers=1):
+        if name == 'scipy' and not HAVE_SCIPY:
+            raise ValueError("scipy is not installed")
+        if name not in ('numpy', 'scipy'):
+            raise ValueError(f"Unknown FFT backend: {name}")
+        self.name = name
+        self.workers = workers if name == 'scipy' else 1
+
+    def __repr__(self):
+        return f"FFTBackend({self.name!r}, workers={self.workers})"
+
+    def fft(self, x, n=None, axis=-1):
+        if self.name == 'scipy':
+            return scipy.fft.fft(x, n, axis=axis, workers=self.workers)
+        return np.fft.fft(x, n, axis=axis)
+
+    def ifft(self, x, n=None, axis=-1):
+        if self.name == 'scipy':
+            return scipy.fft.ifft(x, n, axis=axis, workers=self.workers)
+        return np.fft.ifft(x, n, axis=axis)
+
+    def rfft(self, x, n=None, axis=-1):
+        if self.name == 'scipy':
+            return scipy.fft.rfft(x, n, axis=axis, workers=self.workers)
+        return np.fft.rfft(x, n, axis=axis)
+
+    def irfft(self, x, n=None, axis=-1):
+        if self.name == 'scipy':
+            return scipy.fft.irfft(x, n, axis=axis, workers=self.workers)
+        return np.fft.irfft(x, n, axis=axis)
+
+def candidate_backends():
+    """Backend ทั้งหมดที่ใช้ได้บนเครื่องนี้"""
+    candidates = [FFTBackend('numpy')]
+    if HAVE_SCIPY:
+        candidates.append(FFTBackend('scipy', 1))
+        cores = os.cpu_count() or 1
+        if cores > 1:
+            candidates.append(FFTBackend('scipy', cores))
+    return candidates
+
+def environment_key():
+    """ข้อมูลเครื่องและเวอร์ชัน - ผล benchmark ใช้ได้เฉพาะเมื่อค่านี้ตรงกัน"""
+    return {
+        'machine': platform.machine(),
+        'node': platform.node(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__ if HAVE_SCIPY else None,
+    }
+
+def time_backend(backend, size, rows, repeats=3):
+    """เวลาที่ดีที่สุด (วินาที) ของ FFT complex64 ขนาด rows x size"""
+    data = (np.random.standard_normal((rows, size)) +
+            1j * np.random.standard_normal((rows, size))).astype(np.complex64)
+    backend.fft(data, axis=1)  # warm-up (สร้าง twiddle / thread pool)
+
+    best = float('inf')
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        backend.fft(data, axis=1)
+        best = min(best, time.perf_counter() - start_time)
+    return best
+
+def run_benchmark(save=True):
+    """Benchmark ทุก backend ทุกขนาด แล้วเลือกตัวที่เร็วที่สุดของแต่ละกรณี"""
+    results = {'environment': environment_key(), 'timings': {}, 'choices': {}}
+    candidates = candidate_backends()
+
+    for size in BENCHMARK_SIZES:
+        for mode, rows in (('single', 1), ('batched', max(2, BENCHMARK_BATCH_SAMPLES // size))):
+            key = f"{size}:{mode}"
+            timings = {f"{b.name}:{b.workers}": time_backend(b, size, rows) for b in candidates}
+            best = min(timings, key=timings.get)
+            results['timings'][key] = timings
+            results['choices'][key] = best
+
+    if save:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(BENCHMARK_FILE, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+        except OSError as e:
+            print(f"Warning: cannot save FFT benchmark: {e}")
+
+    return results
+
+def load_benchmark(force=False):
+    """
+    โหลดผล benchmark จากไฟล์ (ทำใหม่ถ้าไม่มี หรือเครื่อง/เวอร์ชันเปลี่ยน)
+
+    เรียกครั้งเดียวจาก main() ของแต่ละ lab ก่อนเริ่ม streaming
+    (benchmark ใหม่ใช้เวลาหลายวินาทีบน Pi)
+    """
+    global _benchmark
+
+    if _benchmark is not None and not force:
+        return _benchmark
+
+    results = None
+    if not force and os.path.exists(BENCHMARK_FILE):
+        try:
+            with open(BENCHMARK_FILE, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get('environment') == environment_key():
+                results = saved
+        except (OSError, ValueError):
+            pass
+
+    _benchmark = results or run_benchmark()
+    _plan_cache.clear()
+    return _benchmark
+
+def select_backend(size, batched=False):
+    """
+    เลือก backend ที่เร็วที่สุดสำหรับ FFT ขนาดนี้ (ผลลัพธ์ cache ไว้ต่อขนาด)
+
+    ถ้ายังไม่ได้เรียก load_benchmark() จะใช้ numpy ไปก่อน (ไม่ benchmark ใน thread ของผู้เรียก)
+    """
+    key = (size, batched)
+    if key in _plan_cache:
+        return _plan_cache[key]
+
+    forced = os.environ.get('DAB_FFT_BACKEND')
+    candidates = candidate_backends()
+
+    if forced:
+        backend = max((b for b in candidates if b.name == forced),
+                      key=lambda b: b.workers, default=candidates[0])
+    elif len(candidates) == 1:
+        backend = candidates[0]
+    elif _benchmark is None:
+        # ยังไม่มีผล benchmark - ไม่ cache เพื่อให้เลือกใหม่หลัง load_benchmark()
+        return candidates[0]
+    else:
+        # ใช้ผลของขนาดที่ benchmark ไว้ซึ่งใกล้ที่สุด (เทียบแบบ log scale)
+        nearest = min(BENCHMARK_SIZES, key=lambda s: abs(np.log2(s) - np.log2(max(size, 1))))
+        choice = _benchmark['choices'].get(f"{nearest}:{'batched' if batched else 'single'}",
+                                                 'numpy:1')
+        name, workers = choice.split(':')
+        backend = FFTBackend(name, int(workers)) if name != 'scipy' or HAVE_SCIPY else candidates[0]
+
+    _plan_cache[key] = backend
+    return backend
+
+def _backend_for(x, n, axis):
+    x = np.asarray(x)
+    size = n or (x.shape[axis] if x.ndim else 1)
+    return select_backend(size, batched=x.ndim > 1 and x.size // max(x.shape[axis], 1) > 1)
+
+def fft(x, n=None, axis=-1):
+    """FFT ด้วย backend ที่เร็วที่สุดสำหรับขนาดนี้"""
+    return _backend_for(x, n, axis).fft(x, n, axis)
+
+def ifft(x, n=None, axis=-1):
+    """Inverse FFT ด้วย backend ที่เร็วที่สุดสำหรับขนาดนี้"""
+    return _backend_for(x, n, axis).ifft(x, n, axis)
+
+def rfft(x, n=None, axis=-1):
+    """FFT ของสัญญาณจริง ด้วย backend ที่เร็วที่สุดสำหรับขนาดนี้"""
+    return _backend_for(x, n, axis).rfft(x, n, axis)
+
+def irfft(x, n=None, axis=-1):
+    """Inverse ของ rfft ด้วย backend ที่เร็วที่สุดสำหรับขนาดนี้"""
+    return _backend_for(x, n, axis).irfft(x, n, axis)
+
+def main():
+    """แสดงผล benchmark และ backend ที่เลือกสำหรับแต่ละขนาด"""
+    print("=== Lab 3: FFT Backend Benchmark ===")
+
+    force = '--force' in sys.argv
+    results = load_benchmark(force=force)
+    environment = results['environment']
+
+    print(f"Machine: {environment['machine']}, {environment['cpu_count']} cores, "
+          f"numpy {environment['numpy']}, scipy {environment['scipy'] or 'not installed'}")
+    print(f"Results file: {BENCHMARK_FILE}\n")
+
+    for key, timings in results['timings'].items():
+        line = "  ".join(f"{name} {seconds*1000:8.3f} ms" for name, seconds in timings.items())
+        print(f"{key:>14s}: {line}  -> {results['choices'][key]}")
+
+if __name__ == "__main__":
+    main()
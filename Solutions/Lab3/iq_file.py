@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lab 3: I/Q File Format (SigMF-style metadata + memory-mapped reader)
+เป้าหมาย: อ่านไฟล์ I/Q ขนาดใหญ่ (หลาย GB) โดยไม่ต้องโหลดทั้งไฟล์เข้า RAM
+
+- Sidecar JSON (<ชื่อไฟล์>.sigmf-meta) เก็บ sample rate, ความถี่กลาง, gain และ format
+- รองรับ format: cu8 (uint8 จาก RTL-SDR), cs16 (int16), cf32 (complex64)
+- IQFileReader ใช้ np.memmap แปลงเป็น complex64 เฉพาะช่วงที่อ่าน
+- Seek ได้ทั้งตาม sample index และตามเวลา (วินาที)
+
+Dependencies:
+pip install numpy
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+
+# format -> (SigMF datatype, numpy dtype ของข้อมูลดิบ)
+IQ_FORMATS = {
+    'cu8': ('cu8', np.uint8),
+    'cs16': ('ci16_le', np.int16),
+    'cf32': ('cf32_le', np.float32),
+}
+
+# นามสกุลไฟล์ -> format (ไฟล์ .bin เดิมของ lab3_1a/lab3_1b เป็น complex64)
+EXTENSION_FORMATS = {
+    '.cu8': 'cu8',
+    '.cs16': 'cs16',
+    '.cf32': 'cf32',
+    '.bin': 'cf32',
+}
+
+METADATA_EXTENSION = '.sigmf-meta'
+
+# Lookup table แปลง uint8 (0-255) เป็น float32 (-1 to 1)
+# ใช้กับ np.take เพื่อแปลงทั้ง chunk ในครั้งเดียว แทนการแปลงทีละ sample
+IQ_LUT = (np.arange(256, dtype=np.float32) - 127.5) / 127.5
+
+def iq_bytes_to_complex64(raw, out=None):
+    """
+    แปลง uint8 I/Q bytes (I,Q,I,Q,...) เป็น complex64 ด้วย lookup table
+
+    raw: bytes/bytearray/memoryview หรือ np.uint8 array (ความยาวเป็นเลขคู่)
+    out: complex64 array ที่จองไว้แล้ว (ถ้ามี) - เขียนผลลงไปโดยตรงไม่ต้อง allocate ใหม่
+    """
+    raw = np.frombuffer(raw, dtype=np.uint8) if not isinstance(raw, np.ndarray) else raw
+    num_samples = raw.size // 2
+
+    if out is None:
+        out = np.empty(num_samples, dtype=np.complex64)
+
+    # complex64 = float32 คู่ (I,Q) เรียงติดกันในหน่วยความจำ จึง view เป็น float32 ได้
+    np.take(IQ_LUT, raw[:num_samples * 2], out=out[:num_samples].view(np.float32))
+    return out[:num_samples]
+
+def complex64_to_cu8(samples):
+    """แปลง complex samples (-1 to 1) กลับเป็น uint8 I/Q bytes แบบ RTL-SDR"""
+    interleaved = np.asarray(samples, dtype=np.complex64).view(np.float32)
+    scaled = np.rint(interleaved * 127.5 + 127.5)
+    return np.clip(scaled, 0, 255).astype(np.uint8)
+
+def raw_to_complex64(raw, data_format):
+    """แปลงข้อมูลดิบ (I,Q interleaved) ตาม format เป็น complex64"""
+    if data_format == 'cu8':
+        return iq_bytes_to_complex64(raw)
+
+    if data_format == 'cs16':
+        out = np.empty(raw.size // 2, dtype=np.complex64)
+        np.multiply(raw[:out.size * 2], np.float32(1 / 32768), out=out.view(np.float32))
+        return out
+
+    if data_format == 'cf32':
+        return np.array(raw[:raw.size // 2 * 2]).view(np.complex64)
+
+    raise ValueError(f"Unsupported I/Q format: {data_format}")
+
+def metadata_filename(data_filename):
+    """ชื่อไฟล์ sidecar ของไฟล์ข้อมูล"""
+    return os.path.splitext(data_filename)[0] + METADATA_EXTENSION
+
+def guess_format(data_filename):
+    """เดา format จากนามสกุลไฟล์"""
+    extension = os.path.splitext(data_filename)[1].lower()
+    return EXTENSION_FORMATS.get(extension, 'cf32')
+
+def write_metadata(data_filename, sample_rate, center_frequency, data_format=None,
+                   gain=None, start_time=None, description=None, extra=None):
+    """
+    เขียน sidecar JSON แบบ SigMF ข้างไฟล์ I/Q
+    """
+    data_format = data_format or guess_format(data_filename)
+    if data_format not in IQ_FORMATS:
+        raise ValueError(f"Unsupported I/Q format: {data_format}")
+
+    if start_time is None:
+        start_time = datetime.now(timezone.utc)
+    if isinstance(start_time, (int, float)):
+        start_time = datetime.fromtimestamp(start_time, timezone.utc)
+
+    metadata = {
+        'global': {
+            'core:datatype': IQ_FORMATS[data_format][0],
+            'core:sample_rate': sample_rate,
+            'core:version': '1.0.0',
+            'core:description': description or 'DAB+ Labs I/Q recording',
+            'core:recorder': 'DAB_Plus_Labs',
+            'core:dataset': os.path.basename(data_filename),
+            'rtlsdr:gain': gain,
+        },
+        'captures': [
+            {
+                'core:sample_start': 0,
+                'core:frequency': center_frequency,
+                'core:datetime': start_time.isoformat().replace('+00:00', 'Z'),
+            }
+        ],
+        'annotations': []
+    }
+
+    if extra:
+        metadata['global'].update(extra)
+
+    filename = metadata_filename(data_filename)
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+
+    return filename
+
+def read_metadata(data_filename):
+    """
+    อ่าน sidecar JSON ของไฟล์ I/Q
+
+    คืนค่า dict แบบง่าย (format, sample_rate, center_frequency, gain, start_time)
+    ถ้าไม่มี sidecar จะคืนค่าเฉพาะ format ที่เดาจากนามสกุลไฟล์
+    """
+    info = {
+        'format': guess_format(data_filename),
+        'sample_rate': None,
+        'center_frequency': None,
+        'gain': None,
+        'start_time': None,
+    }
+
+    filename = metadata_filename(data_filename)
+    if not os.path.exists(filename):
+        return info
+
+    with open(filename, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+
+    global_info = metadata.get('global', {})
+    datatype = global_info.get('core:datatype')
+    for data_format, (sigmf_type, _) in IQ_FORMATS.items():
+        if datatype == sigmf_type:
+            info['format'] = data_format
+
+    info['sample_rate'] = global_info.get('core:sample_rate')
+    info['gain'] = global_info.get('rtlsdr:gain')
+
+    captures = metadata.get('captures', [])
+    if captures:
+        info['center_frequency'] = captures[0].get('core:frequency')
+        info['start_time'] = captures[0].get('core:datetime')
+
+    return info
+
+class IQFileReader:
+    """
+    อ่านไฟล์ I/Q แบบ memory-mapped - แปลงเป็น complex64 เฉพาะ chunk ที่ขอ
+    """
+
+    def __init__(self, filename, data_format=None, sample_rate=None, center_frequency=None):
+        self.filename = filename
+        metadata = read_metadata(filename)
+
+        self.data_format = data_format or metadata['format']
+        self.sample_rate = sample_rate or metadata['sample_rate'] or 2048000
+        self.center_frequency = center_frequency or metadata['center_frequency']
+        self.gain = metadata['gain']
+        self.start_time = metadata['start_time']
+
+        if self.data_format not in IQ_FORMATS:
+            raise ValueError(f"Unsupported I/Q format: {self.data_format}")
+
+        raw_dtype = IQ_FORMATS[self.data_format][1]
+        itemsize = np.dtype(raw_dtype).itemsize
+        file_size = os.path.getsize(filename)
+
+        # ตัดเศษท้ายไฟล์ที่ไม่ครบ I/Q pair (เช่นไฟล์ที่ยังบันทึกไม่เสร็จ)
+        self.num_samples = file_size // (2 * itemsize)
+        if self.num_samples > 0:
+            self.raw = np.memmap(filename, dtype=raw_dtype, mode='r',
+                                 shape=(self.num_samples * 2,))
+        else:
+            self.raw = np.zeros(0, dtype=raw_dtype)
+
+        self.position = 0
+
+    @property
+    def duration(self):
+        """ความยาวของ recording (วินาที)"""
+        return self.num_samples / self.sample_rate
+
+    def __len__(self):
+        return self.num_samples
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def time_to_sample(self, seconds):
+        """แปลงเวลา (วินาทีจากต้นไฟล์) เป็น sample index"""
+        return int(round(seconds * self.sample_rate))
+
+    def sample_to_time(self, index):
+        """แปลง sample index เป็นเวลา (วินาทีจากต้นไฟล์)"""
+        return index / self.sample_rate
+
+    def seek(self, index):
+        """เลื่อนตำแหน่งอ่านไปที่ sample index"""
+        self.position = min(max(0, int(index)), self.num_samples)
+        return self.position
+
+    def seek_time(self, seconds):
+        """เลื่อนตำแหน่งอ่านไปที่เวลา (วินาที)"""
+        return self.seek(self.time_to_sample(seconds))
+
+    def read(self, start, count):
+        """อ่าน count samples เริ่มที่ start เป็น complex64 (ไม่เปลี่ยนตำแหน่งอ่าน)"""
+        start = min(max(0, int(start)), self.num_samples)
+        stop = min(start + int(count), self.num_samples)
+        return raw_to_complex64(self.raw[start * 2:stop * 2], self.data_format)
+
+    def read_time(self, start_seconds, duration_seconds):
+        """อ่านช่วงเวลา [start_seconds, start_seconds + duration_seconds)"""
+        return self.read(self.time_to_sample(start_seconds),
+                         self.time_to_sample(duration_seconds))
+
+    def read_next(self, count):
+        """อ่านต่อจากตำแหน่งปัจจุบัน แล้วเลื่อนตำแหน่งไป"""
+        samples = self.read(self.position, count)
+        self.position += len(samples)
+        return samples
+
+    def iter_blocks(self, block_size=262144, start=0, stop=None):
+        """Generator คืน complex64 blocks ตั้งแต่ start ถึง stop (sample index)"""
+        stop = self.num_samples if stop is None else min(stop, self.num_samples)
+        for block_start in range(int(start), stop, block_size):
+            yield self.read(block_start, min(block_size, stop - block_start))
+
+    def close(self):
+        """ปล่อย memory map"""
+        self.raw = np.zeros(0, dtype=IQ_FORMATS[self.data_format][1])
+        self.num_samples = 0
+
+def main():
+    """แสดงข้อมูลไฟล์ I/Q และสถิติของช่วงเวลาที่เลือก"""
+    if len(sys.argv) < 2:
+        print("Usage: python3 iq_file.py <file> [start_seconds] [duration_seconds]")
+        print("Example: python3 iq_file.py raw_iq_000.cu8 60 1")
+        return
+
+    filename = sys.argv[1]
+    start_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 0
+    duration_seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 1
+
+    try:
+        with IQFileReader(filename) as reader:
+            print(f"File: {filename}")
+            print(f"Format: {reader.data_format}")
+            print(f"Sample rate: {reader.sample_rate/1e6:.3f} Msps")
+            if reader.center_frequency:
+                print(f"Center frequency: {reader.center_frequency/1e6:.3f} MHz")
+            print(f"Samples: {reader.num_samples:,} ({reader.duration:.1f} seconds)")
+
+            samples = reader.read_time(start_seconds, duration_seconds)
+            if len(samples) == 0:
+                print("No samples in selected range")
+                return
+
+            print(f"\nRange {start_seconds:.1f}s + {duration_seconds:.1f}s: {len(samples):,} samples")
+            print(f"Signal strength (RMS): {np.sqrt(np.mean(np.abs(samples)**2)):.6f}")
+            print(f"Max amplitude: {np.max(np.abs(samples)):.6f}")
+
+    except Exception as e:
+        print(f"Error reading I/Q file: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lab 3: Direct-to-disk I/Q Recorder (native cu8)
+เป้าหมาย: บันทึก I/Q จาก RTL-SDR ลงดิสก์โดยตรงในรูปแบบ uint8 (2 bytes/sample)
+
+- เก็บข้อมูลเป็น cu8 (I,Q,I,Q,... แบบ uint8) เหมือนที่ dongle ส่งมา
+  เล็กกว่า complex64 (8 bytes/sample) 4 เท่า ลดการเขียน SD card
+- เขียนเป็น chunk ขนาดใหญ่ (ขนาดเป็นพหุคูณของ 4096 bytes) จาก writer thread
+- ใช้ buffer pool ขนาดคงที่ หน่วยความจำจึงไม่โตตามระยะเวลาบันทึก
+- หมุนไฟล์ (rotate) เมื่อไฟล์ถึงขนาดที่กำหนด
+- นับ overrun เมื่อดิสก์เขียนไม่ทัน
+- เขียน sidecar (.sigmf-meta) ให้ทุกไฟล์ เพื่อให้ iq_file.IQFileReader อ่านได้ทันที
+
+Dependencies:
+pip install numpy
+"""
+
+import os
+import queue
+import threading
+import time
+
+from iq_file import write_metadata
+
+ALIGNMENT = 4096  # ขนาด block ของ filesystem / flash page
+
+class IQRecorder:
+    def __init__(self, base_filename="raw_iq", chunk_size=1048576,
+                 max_file_size=1073741824, num_buffers=32, metadata=None):
+        self.base_filename = base_filename
+        # metadata: dict ที่มี sample_rate, center_frequency, gain (สำหรับ sidecar)
+        self.metadata = metadata
+        # ปัดขนาด chunk ให้เป็นพหุคูณของ ALIGNMENT
+        self.chunk_size = max(ALIGNMENT, (chunk_size // ALIGNMENT) * ALIGNMENT)
+        # ไฟล์ต้องมีขนาดเป็นพหุคูณของ chunk เพื่อไม่ให้ I/Q pair ถูกตัดข้ามไฟล์
+        self.max_file_size = max(self.chunk_size,
+                                 (max_file_size // self.chunk_size) * self.chunk_size)
+        self.num_buffers = num_buffers
+
+        # Buffer pool: free -> (producer เติมข้อมูล) -> filled -> (writer เขียน) -> free
+        self.free_buffers = queue.Queue()
+        self.filled_buffers = queue.Queue()
+        for _ in range(num_buffers):
+            self.free_buffers.put(bytearray(self.chunk_size))
+
+        self.current_buffer = None
+        self.current_fill = 0
+
+        self.file = None
+        self.file_index = 0
+        self.file_bytes = 0
+        self.files_written = []
+
+        self.writer_thread = None
+        self.recording = False
+
+        # สถิติ
+        self.bytes_received = 0
+        self.bytes_written = 0
+        self.chunks_written = 0
+        self.overruns = 0          # จำนวนครั้งที่ไม่มี buffer ว่าง (ดิสก์ไม่ทัน)
+        self.overrun_bytes = 0     # จำนวน bytes ที่ทิ้งไป
+        self.queue_high_water = 0  # จำนวน chunk ที่รอเขียนสูงสุด
+        self.max_write_time = 0.0  # เวลาเขียน chunk ที่นานที่สุด (วินาที)
+        self.start_time = None
+
+    def current_filename(self):
+        """ชื่อไฟล์ปัจจุบัน (เลขลำดับต่อท้ายเมื่อ rotate)"""
+        return f"{self.base_filename}_{self.file_index:03d}.cu8"
+
+    def open_next_file(self):
+        """ปิดไฟล์ปัจจุบันแล้วเปิดไฟล์ใหม่"""
+        if self.file:
+            self.file.close()
+            self.file_index += 1
+
+        filename = self.current_filename()
+        # buffering=0: เขียนจาก buffer ของเราตรงไปที่ OS ไม่ copy ซ้ำ
+        self.file = open(filename, 'wb', buffering=0)
+        self.file_bytes = 0
+        self.files_written.append(filename)
+
+        if self.metadata:
+            # เวลาเริ่มของไฟล์ = เวลาเริ่มบันทึก + จำนวน samples ที่เขียนไปแล้ว
+            start_time = self.start_time or time.time()
+            sample_rate = self.metadata.get('sample_rate')
+            if sample_rate:
+                start_time += self.bytes_written / 2 / sample_rate
+            write_metadata(filename, sample_rate, self.metadata.get('center_frequency'),
+                           'cu8', gain=self.metadata.get('gain'), start_time=start_time)
+
+        print(f"Recording to {filename}")
+
+    def start(self):
+        """เริ่มบันทึก - เปิดไฟล์แรกและเริ่ม writer thread"""
+        if self.recording:
+            return True
+
+        self.start_time = time.time()
+        try:
+            self.open_next_file()
+        except Exception as e:
+            print(f"Error opening recording file: {e}")
+            return False
+
+        self.recording = True
+        self.writer_thread = threading.Thread(target=self.writer_loop, daemon=True)
+        self.writer_thread.start()
+        return True
+
+    def write(self, data):
+        """
+        รับ raw uint8 I/Q bytes จาก capture thread (ไม่ block)
+
+        data: bytes/bytearray/memoryview หรือ np.uint8 array ที่มีความยาวเป็นเลขคู่
+        ถ้าไม่มี buffer ว่าง ข้อมูลส่วนที่เหลือจะถูกทิ้งและนับเป็น overrun
+        """
+        if not self.recording:
+            return
+
+        view = memoryview(data).cast('B')
+        total = len(view)
+        self.bytes_received += total
+        pos = 0
+
+        while pos < total:
+            if self.current_buffer is None:
+                try:
+                    self.current_buffer = self.free_buffers.get_nowait()
+                    self.current_fill = 0
+                except queue.Empty:
+                    self.overruns += 1
+                    self.overrun_bytes += total - pos
+                    return
+
+            count = min(self.chunk_size - self.current_fill, total - pos)
+            self.current_buffer[self.current_fill:self.current_fill + count] = view[pos:pos + count]
+            self.current_fill += count
+            pos += count
+
+            if self.current_fill == self.chunk_size:
+                self.submit_current_buffer()
+
+    def submit_current_buffer(self):
+        """ส่ง buffer ที่เต็มแล้ว (หรือเศษสุดท้าย) ให้ writer thread"""
+        if self.current_buffer is None or self.current_fill == 0:
+            return
+
+        self.filled_buffers.put((self.current_buffer, self.current_fill))
+        self.current_buffer = None
+        self.current_fill = 0
+
+        pending = self.filled_buffers.qsize()
+        if pending > self.queue_high_water:
+            self.queue_high_water = pending
+
+    def writer_loop(self):
+        """Writer thread - เขียน chunk ลงดิสก์และ rotate ไฟล์"""
+        while True:
+            item = self.filled_buffers.get()
+            if item is None:
+                break
+
+            buffer, length = item
+            try:
+                if self.file_bytes + length > self.max_file_size:
+                    self.open_next_file()
+
+                write_start = time.perf_counter()
+                self.file.write(memoryview(buffer)[:length])
+                write_time = time.perf_counter() - write_start
+
+                self.max_write_time = max(self.max_write_time, write_time)
+                self.file_bytes += length
+                self.bytes_written += length
+                self.chunks_written += 1
+
+            except Exception as e:
+                print(f"Error writing I/Q chunk: {e}")
+            finally:
+                self.free_buffers.put(buffer)
+
+    def stop(self):
+        """หยุดบันทึก - เขียนเศษที่เหลือ รอ writer thread และปิดไฟล์"""
+        if not self.recording:
+            return self.get_statistics()
+
+        self.recording = False
+        self.submit_current_buffer()
+        self.filled_buffers.put(None)
+
+        if self.writer_thread:
+            self.writer_thread.join()
+            self.writer_thread = None
+
+        if self.file:
+            self.file.close()
+            self.file = None
+
+        stats = self.get_statistics()
+        self.print_statistics(stats)
+        return stats
+
+    def get_statistics(self):
+        """สถิติการบันทึก"""
+        elapsed = time.time() - self.start_time if self.start_time else 0
+        return {
+            'files': list(self.files_written),
+            'bytes_received': self.bytes_received,
+            'bytes_written': self.bytes_written,
+            'samples_written': self.bytes_written // 2,
+            'chunks_written': self.chunks_written,
+            'overruns': self.overruns,
+            'overrun_bytes': self.overrun_bytes,
+            'queue_high_water': self.queue_high_water,
+            'num_buffers': self.num_buffers,
+            'max_write_time_ms': self.max_write_time * 1000,
+            'write_rate_mbps': self.bytes_written / elapsed / 1e6 if elapsed > 0 else 0
+        }
+
+    def print_statistics(self, stats=None):
+        """แสดงสถิติการบันทึก"""
+        stats = stats or self.get_statistics()
+        print(f"Recorded {stats['samples_written']:,} samples "
+              f"({stats['bytes_written']/1e6:.1f} MB) to {len(stats['files'])} file(s)")
+        print(f"Write rate: {stats['write_rate_mbps']:.2f} MB/s, "
+              f"slowest chunk write: {stats['max_write_time_ms']:.1f} ms")
+        print(f"Queue high-water: {stats['queue_high_water']}/{stats['num_buffers']} buffers")
+
+        if stats['overruns']:
+            print(f"WARNING: {stats['overruns']} overruns, "
+                  f"{stats['overrun_bytes']:,} bytes dropped - storage too slow")
+        else:
+            print("No overruns - storage kept up")
+
+def main():
+    """ทดสอบความเร็วการเขียนดิสก์ด้วยข้อมูลจำลอง (ไม่ต้องใช้ RTL-SDR)"""
+    import sys
+    import numpy as np
+
+    print("=== Lab 3: I/Q Recorder storage test ===")
+
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    sample_rate = 2048000
+    block = np.random.randint(0, 256, 2 * 16384, dtype=np.uint8)
+    blocks_per_second = sample_rate // 16384
+
+    recorder = IQRecorder(base_filename="recorder_test")
+    if not recorder.start():
+        return
+
+    try:
+        # ป้อนข้อมูลที่อัตราเดียวกับ dongle (2.048 Msps = 4.096 MB/s)
+        start_time = time.time()
+        sent = 0
+        while time.time() - start_time < duration:
+            recorder.write(block)
+            sent += 1
+            target = start_time + sent / blocks_per_second
+            delay = target - time.time()
+            if delay > 0:
+                time.sleep(delay)
+    except KeyboardInterrupt:
+        print("\nUser interrupted")
+    finally:
+        stats = recorder.stop()
+
+    for filename in stats['files']:
+        os.remove(filename)
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,43 @@ import numpy as np
 import time
 import sys
 import threading
-import matplotlib.pyplot as plt
+from capture_stats import CaptureStats
+from channelizer import DABChannelizer
+import fft_backend
+from spectrum import power_db, welch_psd
+from plot_worker import get_renderer
+from iq_recorder import IQRecorder
+from iq_file import iq_bytes_to_complex64, write_metadata
+from rtl_tcp_async import DONGLE_INFO_SIZE, parse_dongle_info
+
+def benchmark_decoder(sample_rate=2048000, seconds=2.0, chunk_samples=65536):
+    """
+    วัดความเร็วการแปลง uint8 I/Q -> complex64 เทียบกับ sample rate จริงของ dongle
+    """
+    chunk = np.random.randint(0, 256, chunk_samples * 2, dtype=np.uint8)
+    out = np.empty(chunk_samples, dtype=np.complex64)
+
+    total_samples = int(sample_rate * seconds)
+    num_chunks = max(1, total_samples // chunk_samples)
+
+    start_time = time.perf_counter()
+    for _ in range(num_chunks):
+        iq_bytes_to_complex64(chunk, out)
+    elapsed = time.perf_counter() - start_time
+
+    throughput = num_chunks * chunk_samples / elapsed
+    core_load = sample_rate / throughput * 100
+
+    print(f"Decoder throughput: {throughput/1e6:.1f} Msps "
+          f"({throughput/sample_rate:.1f}x real-time)")
+    print(f"CPU load at {sample_rate/1e6:.3f} Msps: {core_load:.1f}% of one core "
+          f"(headroom {100 - core_load:.1f}%)")
+
+    return {
+        'throughput_sps': throughput,
+        'realtime_factor': throughput / sample_rate,
+        'core_load_percent': core_load
+    }
 
 class RTLTCPClient:
     def __init__(self, host='localhost', port=1234):
@@ -29,11 +65,32 @@ class RTLTCPClient:
         self.sample_rate = 2048000  # 2.048 MHz สำหรับ DAB+
         self.gain = 20  # dB, ปรับตามความเหมาะสม
 
-        # Buffer สำหรับเก็บข้อมูล
-        self.receive_buffer = bytearray()
-        self.samples_buffer = []
+        # Ring buffer สำหรับรับ bytes จาก socket (จองไว้ครั้งเดียว ใช้ recv_into)
+        self.recv_size = 262144  # bytes ต่อการเรียก recv_into หนึ่งครั้ง
+        self.receive_buffer = bytearray(self.recv_size * 4)
+        self.receive_view = memoryview(self.receive_buffer)
+
+        # Buffer สำหรับเก็บ samples (complex64 จองตามจำนวนที่ต้องการ)
+        self.samples_buffer = np.empty(0, dtype=np.complex64)
+        self.samples_count = 0
         self.capture_active = False
 
+        # สถิติ CPU ของ receive thread (ใช้คำนวณ headroom)
+        self.receive_cpu_time = 0.0
+        self.receive_wall_time = 0.0
+
+        # ข้อมูล dongle จาก header และสถิติการเปลี่ยนความถี่
+        self.dongle_info = None
+        self.settle_time = 0.005  # วินาทีที่ทิ้งหลังเปลี่ยนความถี่ (PLL settling)
+        self.retune_latencies = []
+        # ข้อมูลความถี่เก่าที่ยังค้างระหว่างทางหลังสั่งเปลี่ยนความถี่:
+        # USB buffer ของ rtl_tcp ที่กำลังเติม (ค่าเริ่มต้น 16 x 16384 bytes) + เวลาไป-กลับของ network
+        self.server_buffer_bytes = 262144
+        self.network_rtt = 0.0  # วัดตอน connect (วินาที)
+
+        # สถิติ samples ที่ได้รับ/หาย, recv latency (แสดงทุก 10 วินาทีระหว่างรับข้อมูล)
+        self.stats = CaptureStats(self.sample_rate, name=f"rtl_tcp {host}:{port}")
+
     def connect_to_server(self):
         """
         เชื่อมต่อไปยัง rtl_tcp server
@@ -43,11 +100,19 @@ class RTLTCPClient:
 
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.settimeout(10)  # 10 second timeout
+            connect_start = time.perf_counter()
             self.socket.connect((self.host, self.port))
+            self.network_rtt = time.perf_counter() - connect_start  # TCP handshake = 1 RTT
 
             print("Connected to rtl_tcp server successfully")
             self.connected = True
 
+            # อ่าน dongle-info header 12 bytes ก่อน เพื่อให้ข้อมูลที่ตามมาเป็น I/Q pairs
+            self.receive_exact(self.receive_view[:DONGLE_INFO_SIZE])
+            self.dongle_info = parse_dongle_info(bytes(self.receive_view[:DONGLE_INFO_SIZE]))
+            print(f"Tuner: {self.dongle_info['tuner_name']} "
+                  f"({self.dongle_info['gain_count']} gain steps)")
+
             # ตั้งค่าเริ่มต้น
             self.configure_rtlsdr()
 
@@ -74,7 +139,7 @@ class RTLTCPClient:
         try:
             # rtl_tcp command format: [cmd:1byte][value:4bytes big-endian]
             command = struct.pack('>BI', cmd, value)
-            self.socket.send(command)
+            self.socket.sendall(command)
             print(f"Sent command {cmd} with value {value}")
             return True
         except Exception as e:
@@ -93,31 +158,28 @@ class RTLTCPClient:
         # 0x03: gain mode (0=auto, 1=manual)
         # 0x04: gain
         # 0x05: frequency correction
+        # rtl_tcp ประมวลผลคำสั่งตามลำดับ จึงไม่ต้อง sleep ระหว่างคำสั่ง
 
         try:
             # ตั้งค่า sample rate
             success = self.send_command(0x02, self.sample_rate)
             if success:
                 print(f"Sample rate set to: {self.sample_rate/1e6:.3f} Msps")
-            time.sleep(0.1)
 
             # ตั้งค่าความถี่
             success = self.send_command(0x01, self.frequency)
             if success:
                 print(f"Center frequency set to: {self.frequency/1e6:.3f} MHz")
-            time.sleep(0.1)
 
             # ตั้งค่า gain mode เป็น manual
             success = self.send_command(0x03, 1)
             if success:
                 print("Gain mode set to: manual")
-            time.sleep(0.1)
 
             # ตั้งค่า gain
             success = self.send_command(0x04, self.gain * 10)  # gain in 0.1 dB
             if success:
                 print(f"Gain set to: {self.gain} dB")
-            time.sleep(0.1)
 
             print("RTL-SDR configuration completed")
             return True
@@ -126,51 +188,237 @@ class RTLTCPClient:
             print(f"Error configuring RTL-SDR: {e}")
             return False
 
-    def receive_data_thread(self):
+    def receive_exact(self, view):
+        """รับข้อมูลจาก socket จนเต็ม memoryview ที่กำหนด"""
+        received = 0
+        while received < len(view):
+            count = self.socket.recv_into(view[received:])
+            if count == 0:
+                raise ConnectionError("Server disconnected")
+            received += count
+        return received
+
+    def drain_socket(self, min_time=0.0, max_time=2.0):
         """
-        Thread สำหรับรับข้อมูลจาก rtl_tcp server
+        ทิ้งข้อมูลความถี่เก่าที่ยังค้างอยู่ระหว่างทาง (socket buffers, คิวของ rtl_tcp, tunnel)
+
+        อ่านทิ้งอย่างน้อย min_time วินาที แล้วอ่านต่อจนกว่าข้อมูลจะเข้ามาด้วยอัตรา real-time
+        (backlog หมดแล้ว) - ระหว่างที่ยังมี backlog ข้อมูลจะเข้ามาเร็วกว่า sample rate มาก
+        คืนจำนวน bytes ที่ทิ้ง
         """
-        print("Starting data reception thread...")
+        realtime_rate = 2 * self.sample_rate  # bytes/s ที่ server สร้างได้จริง
+        interval = max(min_time, 0.02)         # ช่วงที่ใช้วัดอัตราข้อมูลเข้า
+        start_time = window_start = time.perf_counter()
+        drained = window_bytes = 0
 
+        self.socket.settimeout(interval)
         try:
-            while self.capture_active and self.connected:
-                # รับข้อมูลแบบ chunks
-                try:
-                    data = self.socket.recv(8192)  # 8KB buffer
-                    if not data:
-                        print("No data received - server disconnected")
+            while True:
+                now = time.perf_counter()
+                if now - window_start >= interval:
+                    # real-time = ไม่เกินที่ server สร้างได้ในช่วงนี้ + 1 buffer (ส่งเป็นก้อน)
+                    caught_up = (window_bytes <= realtime_rate * (now - window_start) +
+                                 self.server_buffer_bytes)
+                    if (caught_up and now - start_time >= min_time) or now - start_time >= max_time:
                         break
+                    window_start, window_bytes = now, 0
+
+                try:
+                    count = self.socket.recv_into(self.receive_view[:self.recv_size])
+                except socket.timeout:
+                    continue
+                if count == 0:
+                    raise ConnectionError("Server disconnected")
+                drained += count
+                window_bytes += count
+        finally:
+            self.socket.settimeout(10)
 
-                    self.receive_buffer.extend(data)
+        # รักษา I/Q alignment - ถ้าทิ้งไปเป็นเลขคี่ ให้ทิ้งอีก 1 byte
+        if drained % 2:
+            self.receive_exact(self.receive_view[:1])
+            drained += 1
 
-                    # แปลงข้อมูลเป็น I/Q samples เมื่อมีข้อมูลเพียงพอ
-                    while len(self.receive_buffer) >= 2:
-                        # rtl_tcp ส่งข้อมูลเป็น uint8 I,Q pairs
-                        i_raw = self.receive_buffer[0]
-                        q_raw = self.receive_buffer[1]
+        return drained
+
+    def retune_drain_time(self):
+        """
+        เวลาขั้นต่ำที่ต้องอ่านทิ้งหลังส่งคำสั่งความถี่: 1 RTT (คำสั่งไปถึง + ข้อมูลใหม่กลับมา)
+        + เวลาเติม USB buffer ของ rtl_tcp ที่กำลังเติมอยู่ตอนเปลี่ยนความถี่
+        """
+        return self.network_rtt + self.server_buffer_bytes / (2 * self.sample_rate)
+
+    def read_block(self, num_samples):
+        """รับ num_samples samples จาก socket แบบ blocking คืนค่าเป็น complex64"""
+        num_bytes = num_samples * 2
+        if len(self.receive_buffer) < num_bytes:
+            self.receive_buffer = bytearray(num_bytes)
+            self.receive_view = memoryview(self.receive_buffer)
+
+        self.receive_exact(self.receive_view[:num_bytes])
+        return iq_bytes_to_complex64(self.receive_view[:num_bytes])
+
+    def retune(self, frequency, num_samples=65536, settle_time=None):
+        """
+        เปลี่ยนความถี่บน connection เดิม แล้วคืน block แรกที่ "สะอาด"
+
+        ทิ้งข้อมูลความถี่เก่าที่ยังค้างระหว่างทาง (อย่างน้อย retune_drain_time() และจนกว่า
+        backlog หมด) แล้วจึงทิ้ง samples ช่วง PLL settling - ใช้ได้เมื่อไม่มี receive thread ทำงานอยู่
+        """
+        if not self.connected or self.capture_active:
+            print("Cannot retune: not connected or capture in progress")
+            return None
+
+        settle_time = self.settle_time if settle_time is None else settle_time
+        settle_samples = int(settle_time * self.sample_rate)
+
+        try:
+            start_time = time.perf_counter()
+
+            self.send_command(0x01, frequency)
+            self.frequency = frequency
+
+            drained = self.drain_socket(min_time=self.retune_drain_time())
+            if settle_samples > 0:
+                self.read_block(settle_samples)
+
+            samples = self.read_block(num_samples)
+            latency = time.perf_counter() - start_time
+            self.retune_latencies.append(latency)
+
+            print(f"Retuned to {frequency/1e6:.3f} MHz in {latency*1000:.1f} ms "
+                  f"(drained {drained // 2:,} in-flight + {settle_samples:,} settling samples)")
+            return samples
+
+        except Exception as e:
+            print(f"Error retuning: {e}")
+            return None
+
+    def stream_channels(self, channel_frequencies, num_blocks=None, block_size=65536):
+        """
+        รับหลาย DAB block พร้อมกันจาก tuning เดียว (generator)
+
+        ตั้ง sample_rate ให้กว้างกว่า 2.048 Msps (เช่น 3.2 Msps) และ frequency ให้อยู่กลาง
+        block ที่ต้องการก่อน connect_to_server() - แต่ละรอบคืน {ความถี่: complex64 ที่ 2.048 Msps}
+        """
+        if not self.connected or self.capture_active:
+            print("Cannot stream: not connected or capture in progress")
+            return
+
+        channelizer = DABChannelizer(self.sample_rate, self.frequency, channel_frequencies)
+        blocks = 0
+        while num_blocks is None or blocks < num_blocks:
+            try:
+                block = self.read_block(block_size)
+            except Exception as e:
+                print(f"Error receiving block: {e}")
+                break
+            yield channelizer.process(block)
+            blocks += 1
+
+    def receive_data_thread(self):
+        """
+        Thread สำหรับรับข้อมูลจาก rtl_tcp server
+
+        รับ bytes ด้วย recv_into ลงใน ring buffer ที่จองไว้แล้ว
+        จากนั้นแปลงทั้ง chunk เป็น complex64 ลงใน samples_buffer โดยตรง
+        """
+        print("Starting data reception thread...")
 
-                        # แปลงจาก uint8 (0-255) เป็น float (-1 to 1)
-                        i = (i_raw - 127.5) / 127.5
-                        q = (q_raw - 127.5) / 127.5
+        ring = self.receive_buffer
+        ring_view = self.receive_view
+        ring_size = len(ring)
+        write_pos = 0    # ตำแหน่งที่ recv_into จะเขียนต่อ
+        decode_pos = 0   # ตำแหน่งแรกที่ยังไม่ได้แปลง (เหลือได้มากสุด 1 byte)
 
-                        # สร้าง complex sample
-                        sample = complex(i, q)
-                        self.samples_buffer.append(sample)
+        cpu_start = time.thread_time()
+        wall_start = time.perf_counter()
+        self.stats.reset(self.sample_rate)
 
-                        # ลบข้อมูลที่ใช้แล้วออกจาก buffer
-                        del self.receive_buffer[:2]
+        try:
+            while self.capture_active and self.connected:
+                # วน ring กลับไปต้น buffer เมื่อเหลือที่ไม่พอสำหรับ recv ครั้งถัดไป
+                if ring_size - write_pos < self.recv_size:
+                    leftover = write_pos - decode_pos
+                    ring[:leftover] = ring[decode_pos:write_pos]
+                    decode_pos = 0
+                    write_pos = leftover
 
+                try:
+                    recv_start = time.perf_counter()
+                    received = self.socket.recv_into(ring_view[write_pos:], self.recv_size)
                 except socket.timeout:
                     continue
                 except Exception as e:
                     print(f"Error in receive thread: {e}")
                     break
 
+                if received == 0:
+                    print("No data received - server disconnected")
+                    break
+
+                self.stats.record_block(received // 2, time.perf_counter() - recv_start)
+                write_pos += received
+
+                # แปลงเฉพาะ I/Q pairs ที่ครบคู่
+                num_pairs = (write_pos - decode_pos) // 2
+                space = len(self.samples_buffer) - self.samples_count
+                num_pairs = min(num_pairs, space)
+
+                if num_pairs > 0:
+                    raw = np.frombuffer(ring, dtype=np.uint8,
+                                        count=num_pairs * 2, offset=decode_pos)
+                    out = self.samples_buffer[self.samples_count:self.samples_count + num_pairs]
+                    iq_bytes_to_complex64(raw, out)
+                    self.samples_count += num_pairs
+                    decode_pos += num_pairs * 2
+
+                if self.samples_count >= len(self.samples_buffer):
+                    # buffer เต็มแล้ว - capture เสร็จ
+                    break
+
         except Exception as e:
             print(f"Fatal error in receive thread: {e}")
 
+        self.receive_cpu_time = time.thread_time() - cpu_start
+        self.receive_wall_time = time.perf_counter() - wall_start
+
         print("Data reception thread stopped")
 
+    def get_samples(self):
+        """
+        คืนค่า samples ที่ได้รับแล้วเป็น numpy view (ไม่ copy)
+        """
+        return self.samples_buffer[:self.samples_count]
+
+    def get_capture_stats(self):
+        """
+        สถิติการรับข้อมูลล่าสุด: samples ที่ได้รับเทียบกับที่ควรได้, stalls และ recv latency
+        """
+        return self.stats.snapshot()
+
+    def report_headroom(self):
+        """
+        แสดง CPU load ของ receive thread และ headroom ที่เหลือ
+        """
+        if self.receive_wall_time <= 0 or self.samples_count == 0:
+            return None
+
+        cpu_percent = self.receive_cpu_time / self.receive_wall_time * 100
+        # CPU ที่ต้องใช้ต่อวินาทีของสัญญาณจริง (ไม่ขึ้นกับว่า server ส่งเร็วแค่ไหน)
+        signal_seconds = self.samples_count / self.sample_rate
+        realtime_load = self.receive_cpu_time / signal_seconds * 100
+
+        print(f"Receive thread CPU: {cpu_percent:.1f}% of one core "
+              f"({realtime_load:.1f}% per second of signal at {self.sample_rate/1e6:.3f} Msps)")
+        print(f"Headroom: {100 - realtime_load:.1f}% of one core")
+
+        return {
+            'cpu_percent': cpu_percent,
+            'realtime_load_percent': realtime_load,
+            'headroom_percent': 100 - realtime_load
+        }
+
     def capture_samples(self, duration_seconds=10):
         """
         รับ I/Q samples และบันทึกเป็นไฟล์
@@ -186,8 +434,9 @@ class RTLTCPClient:
             print(f"Capturing {duration_seconds} seconds of data...")
             print(f"Expected samples: {expected_samples:,}")
 
-            # เริ่มการรับข้อมูล
-            self.samples_buffer = []
+            # เริ่มการรับข้อมูล - จอง buffer ครั้งเดียวตามจำนวน samples ที่ต้องการ
+            self.samples_buffer = np.empty(expected_samples, dtype=np.complex64)
+            self.samples_count = 0
             self.capture_active = True
 
             # เริ่ม thread สำหรับรับข้อมูล
@@ -198,10 +447,10 @@ class RTLTCPClient:
             start_time = time.time()
             last_count = 0
 
-            while len(self.samples_buffer) < expected_samples:
+            while self.samples_count < expected_samples and receive_thread.is_alive():
                 current_time = time.time()
                 elapsed = current_time - start_time
-                current_count = len(self.samples_buffer)
+                current_count = self.samples_count
 
                 # แสดงความคืบหน้าทุก 1 วินาที
                 if int(elapsed) > int(elapsed - 0.1):
@@ -223,7 +472,7 @@ class RTLTCPClient:
             receive_thread.join(timeout=2)
 
             capture_time = time.time() - start_time
-            actual_samples = len(self.samples_buffer)
+            actual_samples = self.samples_count
 
             print(f"Capture completed in {capture_time:.2f} seconds")
             print(f"Actual samples received: {actual_samples:,}")
@@ -232,8 +481,12 @@ class RTLTCPClient:
                 print("No samples received!")
                 return None
 
-            # แปลงเป็น numpy array
-            samples = np.array(self.samples_buffer[:expected_samples], dtype=np.complex64)
+            self.report_headroom()
+            print(self.stats.format_summary())
+            self.stats.print_histogram()
+
+            # samples เป็น view ของ buffer ที่จองไว้ (ไม่ copy)
+            samples = self.get_samples()
 
             # คำนวณ signal strength (RMS)
             signal_strength = np.sqrt(np.mean(np.abs(samples)**2))
@@ -245,6 +498,8 @@ class RTLTCPClient:
             # บันทึกเป็นไฟล์ binary
             filename = "networked_iq_data.bin"
             samples.tofile(filename)
+            write_metadata(filename, self.sample_rate, self.frequency, 'cf32',
+                           gain=self.gain, start_time=start_time)
 
             print(f"Saved {len(samples)} samples to {filename}")
             print(f"File size: {len(samples) * 8} bytes")  # complex64 = 8 bytes per sample
@@ -256,6 +511,63 @@ class RTLTCPClient:
             self.capture_active = False
             return None
 
+    def record_to_disk(self, duration_seconds=60, base_filename="networked_iq",
+                       max_file_size=1073741824):
+        """
+        บันทึก I/Q จาก rtl_tcp ลงดิสก์โดยตรงในรูปแบบ cu8 (2 bytes/sample)
+        """
+        if not self.connected:
+            print("Not connected to rtl_tcp server")
+            return None
+
+        target_bytes = int(duration_seconds * self.sample_rate) * 2
+        received_bytes = 0
+        leftover = 0  # byte ที่ยังไม่ครบคู่ I/Q จากการ recv ครั้งก่อน
+
+        recorder = IQRecorder(base_filename, max_file_size=max_file_size,
+                              metadata={'sample_rate': self.sample_rate,
+                                        'center_frequency': self.frequency,
+                                        'gain': self.gain})
+        if not recorder.start():
+            return None
+
+        print(f"Recording {duration_seconds} seconds of cu8 data to disk...")
+        self.stats.reset(self.sample_rate)
+
+        try:
+            while received_bytes < target_bytes:
+                try:
+                    recv_start = time.perf_counter()
+                    count = self.socket.recv_into(self.receive_view[leftover:self.recv_size])
+                except socket.timeout:
+                    continue
+
+                if count == 0:
+                    print("No data received - server disconnected")
+                    break
+
+                self.stats.record_block(count // 2, time.perf_counter() - recv_start)
+
+                # เขียนเฉพาะ I/Q pairs ที่ครบคู่ เก็บ byte ที่เหลือไว้รอบถัดไป
+                available = leftover + count
+                usable = min(available & ~1, target_bytes - received_bytes)
+                recorder.write(self.receive_view[:usable])
+                received_bytes += usable
+
+                leftover = available - usable if available & 1 else 0
+                if leftover:
+                    self.receive_buffer[0] = self.receive_buffer[available - 1]
+
+        except KeyboardInterrupt:
+            print("\nRecording interrupted")
+        except Exception as e:
+            print(f"Error recording samples: {e}")
+        finally:
+            stats = recorder.stop()
+            print(self.stats.format_summary())
+
+        return stats
+
     def analyze_spectrum(self, samples):
         """
         วิเคราะห์สเปกตรัมของสัญญาณ
@@ -274,21 +586,10 @@ class RTLTCPClient:
                 print("Not enough samples for FFT analysis")
                 return
 
-            # คำนวณ average spectrum
-            spectrum = np.zeros(fft_size)
-            for i in range(num_ffts):
-                start_idx = i * fft_size
-                end_idx = start_idx + fft_size
-                window = np.hanning(fft_size)
-                fft_data = np.fft.fft(samples[start_idx:end_idx] * window)
-                spectrum += np.abs(fft_data)**2
-
-            spectrum = spectrum / num_ffts
-            spectrum_db = 10 * np.log10(spectrum + 1e-12)
-
-            # คำนวณ frequency bins
-            freqs = np.fft.fftfreq(fft_size, 1/self.sample_rate)
-            freqs = freqs + self.frequency  # แปลงเป็น absolute frequency
+            # คำนวณ average spectrum จากทุก frame (Welch แบบ batched, frequency เรียงจากต่ำไปสูง)
+            freqs, spectrum = welch_psd(samples, fft_size, self.sample_rate, self.frequency,
+                                        overlap=0)
+            spectrum_db = power_db(spectrum)
 
             # หาจุดที่มี signal แรงที่สุด
             max_idx = np.argmax(spectrum)
@@ -302,17 +603,11 @@ class RTLTCPClient:
             print(f"Frequency range: {freqs[0]/1e6:.3f} - {freqs[-1]/1e6:.3f} MHz")
             print(f"Resolution: {(freqs[1] - freqs[0])/1e3:.1f} kHz")
 
-            # สร้างกราฟ (optional)
+            # สร้างกราฟใน worker process - ไม่หยุด capture ระหว่าง render PNG (optional)
             try:
-                plt.figure(figsize=(12, 6))
-                plt.plot(freqs/1e6, spectrum_db)
-                plt.xlabel('Frequency (MHz)')
-                plt.ylabel('Power (dB)')
-                plt.title(f'Spectrum Analysis (rtl_tcp) - Center: {self.frequency/1e6:.3f} MHz')
-                plt.grid(True)
-                plt.savefig('spectrum_analysis_rtltcp.png', dpi=150, bbox_inches='tight')
-                print("Spectrum plot saved as 'spectrum_analysis_rtltcp.png'")
-                plt.close()
+                get_renderer().submit('spectrum_analysis_rtltcp.png', freqs/1e6, spectrum_db,
+                                      title=f'Spectrum Analysis (rtl_tcp) - Center: {self.frequency/1e6:.3f} MHz')
+                print("Spectrum plot queued: 'spectrum_analysis_rtltcp.png'")
             except Exception as plot_error:
                 print(f"Could not create plot: {plot_error}")
 
@@ -400,6 +695,8 @@ def main():
     """ฟังก์ชันหลักสำหรับทดสอบ"""
     print("=== Lab 3 Phase 1b: RTL-SDR Data Acquisition (rtl_tcp client) ===")
 
+    fft_backend.load_benchmark()
+
     # ตรวจสอบ arguments
     if len(sys.argv) > 1:
         if sys.argv[1] == "--start-server":
@@ -419,6 +716,22 @@ def main():
             test_connection()
             return
 
+        elif sys.argv[1] == "--record":
+            # บันทึกลงดิสก์โดยตรง (cu8) เช่น: python3 lab3_1b.py --record 3600
+            duration = float(sys.argv[2]) if len(sys.argv) > 2 else 60
+            client = RTLTCPClient()
+            try:
+                if client.connect_to_server():
+                    client.record_to_disk(duration)
+            finally:
+                client.disconnect()
+            return
+
+        elif sys.argv[1] == "--benchmark":
+            # วัดความเร็วการแปลง I/Q (ไม่ต้องใช้ server)
+            benchmark_decoder()
+            return
+
     # การใช้งานปกติ
     client = RTLTCPClient()
 
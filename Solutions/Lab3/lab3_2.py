@@ -17,6 +17,9 @@ import numpy as np
 import threading
 import signal
 
+from eti import ETI_FRAME_SIZE, frame_errors, parse_frames
+from eti_index import ETIIndex, print_index_summary
+
 class ETICmdlineWrapper:
     def __init__(self):
         self.eti_cmdline_path = "/home/pi/DAB_Plus_Labs/eti/eti-cmdline"  # Full path to eti-cmdline
@@ -26,6 +29,7 @@ class ETICmdlineWrapper:
         self.process = None
         self.gain = 50
         self.band = "BAND_III"
+        self.index = None  # ETIIndex ของ output_file (sidecar .idx)
 
     def check_eti_cmdline(self):
         """
@@ -137,8 +141,11 @@ class ETICmdlineWrapper:
             monitor_thread.daemon = True
             monitor_thread.start()
 
-            # รอให้ process ทำงานตามเวลาที่กำหนด
-            time.sleep(runtime_seconds)
+            # รอให้ process ทำงานตามเวลาที่กำหนด - index frame ใหม่ทุกวินาทีระหว่างรอ
+            deadline = time.time() + runtime_seconds
+            while time.time() < deadline:
+                time.sleep(min(1.0, max(0.0, deadline - time.time())))
+                self.update_index()
 
             # หยุด process
             print("\nStopping eti-cmdline...")
@@ -164,6 +171,21 @@ class ETICmdlineWrapper:
                     pass
             return False
 
+    def update_index(self):
+        """
+        อัปเดต frame index ของไฟล์ ETI (parse เฉพาะ frame ที่เพิ่มขึ้น) - คืน ETIIndex หรือ None
+        """
+        if not self.output_file or not os.path.exists(self.output_file):
+            return None
+
+        try:
+            if self.index is None or self.index.eti.filename != self.output_file:
+                self.index = ETIIndex(self.output_file)
+            self.index.update()
+        except Exception as e:
+            print(f"Error updating ETI index: {e}")
+        return self.index
+
     def monitor_process(self):
         """
         ติดตาม output ของ eti-cmdline
@@ -265,17 +287,15 @@ class ETICmdlineWrapper:
 
             print(f"Audio duration: {duration_seconds:.1f} seconds ({duration_ms} ms)")
 
-            # อ่านและวิเคราะห์ frame headers
-            valid_frames = 0
-            with open(self.output_file, 'rb') as f:
-                for i in range(min(num_frames, 10)):  # ตรวจสอบ 10 frames แรก
-                    frame_data = f.read(frame_size)
-                    if len(frame_data) == frame_size:
-                        # ตรวจสอบ sync pattern (simplified)
-                        if self.validate_eti_frame(frame_data):
-                            valid_frames += 1
-
-            print(f"Valid frames (from sample): {valid_frames}/10")
+            # ตรวจทุก frame จาก index (update เฉพาะ frame ที่ยังไม่ได้ index)
+            index = self.update_index()
+            if index is not None:
+                summary = index.summary()
+                print(f"Valid frames: {summary['frames'] - summary['error_frames']}/{summary['frames']}")
+                print_index_summary(summary)
+                for frame in index.errors()[:10]:
+                    print(f"  Error frame {frame} at {index.time_of(frame):.2f} s "
+                          f"(status 0x{index.records['status'][frame]:02X})")
 
             # แสดงสถิติ
             bitrate = (file_size * 8) / duration_seconds if duration_seconds > 0 else 0
@@ -314,18 +334,15 @@ class ETICmdlineWrapper:
             print(f"Could not display station info: {e}")
 
     def validate_eti_frame(self, frame_data):
-        """ตรวจสอบความถูกต้องของ ETI frame อย่างง่าย"""
+        """ตรวจสอบความถูกต้องของ ETI frame: ERR, FSYNC และ header CRC"""
         try:
-            # ตรวจสอบ sync pattern อย่างง่าย
-            # ETI frame ควรมี specific pattern ใน header
-            if len(frame_data) != 6144:
+            if len(frame_data) != ETI_FRAME_SIZE:
                 return False
 
-            # Check for reasonable values in header
-            # (การตรวจสอบแบบพื้นฐาน)
-            return True
+            headers, _ = parse_frames(frame_data)
+            return not frame_errors(headers)[0]
 
-        except:
+        except Exception:
             return False
 
     def cleanup(self):
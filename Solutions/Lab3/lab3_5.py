@@ -34,6 +34,10 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 
+import fft_backend
+from spectrum import SpectrumAverager
+from decimation import minmax_decimate
+
 # Import DABServicePlayer from lab3_4.py for real audio/MOT extraction
 try:
     from lab3_4 import DABServicePlayer
@@ -42,6 +46,51 @@ except ImportError:
     print("Warning: Could not import lab3_4.py - audio extraction will be limited")
     HAVE_LAB3_4 = False
 
+# RTL-SDR streaming from lab3_1a.py for the live spectrum (falls back to simulated data)
+try:
+    from lab3_1a import RTLSDRDataAcquisition
+    HAVE_LAB3_1A = True
+except ImportError:
+    print("Warning: Could not import lab3_1a.py - spectrum will show simulated data")
+    HAVE_LAB3_1A = False
+
+class SpectrumStreamThread(QThread):
+    """Feeds every RTL-SDR block from stream_samples() into a SpectrumAnalyzer"""
+
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, analyzer, frequency=185360000, parent=None):
+        super().__init__(parent)
+        self.analyzer = analyzer
+        self.frequency = frequency
+        self.rtl_sdr = None
+        self._stop_flag = False
+
+    def run(self):
+        self._stop_flag = False
+        self.rtl_sdr = RTLSDRDataAcquisition()
+        self.rtl_sdr.frequency = self.frequency
+        if not self.rtl_sdr.setup_rtlsdr():
+            self.rtl_sdr = None
+            self.error_occurred.emit("RTL-SDR not available - showing simulated spectrum")
+            return
+
+        self.analyzer.set_source(self.rtl_sdr.sample_rate, self.rtl_sdr.frequency)
+        stream = self.rtl_sdr.stream_samples()
+        try:
+            for block in stream:
+                if self._stop_flag:
+                    break
+                self.analyzer.add_samples(block)
+        finally:
+            # Close the generator on this thread - it cannot be closed while another thread is in next()
+            stream.close()
+            self.rtl_sdr.cleanup()
+            self.rtl_sdr = None
+
+    def stop(self):
+        self._stop_flag = True
+
 class SpectrumAnalyzer(QWidget):
     """Real-time spectrum analyzer widget"""
 
@@ -71,12 +120,33 @@ class SpectrumAnalyzer(QWidget):
         self.frequencies = np.linspace(184, 187, 1024)  # DAB Band III
         self.spectrum_data = np.random.normal(-80, 10, 1024)
 
+        # สเปกตรัมเฉลี่ยจาก I/Q จริง (เมื่อมีการเรียก add_samples)
+        self.averager = None
+
         # Timer for updates
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_spectrum)
         self.timer.start(100)  # 100ms updates
 
+    def set_source(self, sample_rate=2048000, center_frequency=185360000, mode='exponential'):
+        """ตั้งค่าแหล่ง I/Q (SpectrumStreamThread) - หลังจากนี้กราฟแสดงสเปกตรัมเฉลี่ยแทนข้อมูลจำลอง"""
+        self.averager = SpectrumAverager(1024, sample_rate, center_frequency, mode=mode,
+                                         time_constant=0.5, display_rate=10.0)
+
+    def add_samples(self, samples):
+        """ป้อน I/Q block (เช่นจาก RTLSDRDataAcquisition.stream_samples) - เรียกจาก thread ใดก็ได้"""
+        if self.averager is None:
+            self.set_source()
+        self.averager.process(samples)
+
     def update_spectrum(self):
+        if self.averager is not None:
+            # แสดงเฉพาะสเปกตรัมเฉลี่ยล่าสุด (averager ส่งออกไม่เกิน 10 ครั้ง/วินาที)
+            frequencies, power = self.averager.get_spectrum()
+            if frequencies is not None:
+                self.show_curve(frequencies / 1e6, power)
+            return
+
         # Simulate changing spectrum
         self.spectrum_data += np.random.normal(0, 1, 1024)
         self.spectrum_data = np.clip(self.spectrum_data, -120, -20)
@@ -85,7 +155,12 @@ class SpectrumAnalyzer(QWidget):
         center_idx = len(self.spectrum_data) // 2
         self.spectrum_data[center_idx-10:center_idx+10] = -30 + np.random.normal(0, 2, 20)
 
-        self.curve.setData(self.frequencies, self.spectrum_data)
+        self.show_curve(self.frequencies, self.spectrum_data)
+
+    def show_curve(self, frequencies, power):
+        """วาดเส้นสเปกตรัมด้วยจำนวนจุดตามความกว้าง plot (min/max ~2 จุดต่อ pixel)"""
+        width = self.plot_widget.getViewBox().width() or self.plot_widget.width()
+        self.curve.setData(*minmax_decimate(frequencies, power, width))
 
 class SignalQualityWidget(QWidget):
     """Signal quality indicators"""
@@ -703,6 +778,20 @@ class DABPlusGUI(QMainWindow):
         # Status bar
         self.statusBar().showMessage("Ready - Select a service to begin")
 
+        # Live spectrum from RTL-SDR (simulated spectrum stays if no dongle is found)
+        self.spectrum_thread = None
+        if HAVE_LAB3_1A:
+            self.spectrum_thread = SpectrumStreamThread(self.spectrum_analyzer)
+            self.spectrum_thread.error_occurred.connect(self.statusBar().showMessage)
+            self.spectrum_thread.start()
+
+    def closeEvent(self, event):
+        """Stop the spectrum stream before closing"""
+        if self.spectrum_thread is not None and self.spectrum_thread.isRunning():
+            self.spectrum_thread.stop()
+            self.spectrum_thread.wait(3000)
+        event.accept()
+
     def service_selected(self, service_info):
         """Handle service selection"""
         self.current_service = service_info
@@ -739,6 +828,8 @@ def main():
     print("\nThis lab creates a complete DAB+ receiver GUI application")
     print("It integrates all previous labs into a graphical interface\n")
 
+    fft_backend.load_benchmark()
+
     app = QApplication(sys.argv)
 
     # Set application properties
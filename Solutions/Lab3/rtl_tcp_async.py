@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lab 3: asyncio rtl_tcp Client (หลาย server พร้อมกัน)
+เป้าหมาย: รับ I/Q จาก rtl_tcp หลายเครื่อง (เช่น Raspberry Pi หลายตัวผ่าน FRP tunnel)
+ใน process เดียว โดยไม่ต้องใช้ thread ต่อ connection
+
+- อ่าน dongle-info header 12 bytes ("RTL0", tuner type, gain count)
+- ส่งคำสั่ง rtl_tcp (frequency, sample rate, gain) แบบไม่ต้อง sleep
+- Reconnect อัตโนมัติเมื่อ connection หลุด
+- Queue จำกัดขนาด - consumer ช้ากว่าสัญญาณจะทิ้ง block ที่เก่าที่สุด (นับเป็น drop)
+  เหมือน stream_samples ของ lab3_1a consumer จึงได้ข้อมูลล่าสุดเสมอ
+- วัด throughput และ latency แยกต่อ connection
+
+Usage:
+python3 rtl_tcp_async.py pi1.example.com:1234 pi2.example.com:1235 --duration 10
+
+Dependencies:
+pip install numpy
+"""
+
+import asyncio
+import struct
+import sys
+import time
+
+import numpy as np
+
+from capture_stats import CaptureStats
+from iq_file import iq_bytes_to_complex64
+
+# rtl_tcp command definitions (เหมือน lab3_1b.py)
+CMD_SET_FREQUENCY = 0x01
+CMD_SET_SAMPLE_RATE = 0x02
+CMD_SET_GAIN_MODE = 0x03
+CMD_SET_GAIN = 0x04
+CMD_SET_FREQ_CORRECTION = 0x05
+
+DONGLE_INFO_SIZE = 12
+
+TUNER_TYPES = {
+    0: 'Unknown', 1: 'E4000', 2: 'FC0012', 3: 'FC0013',
+    4: 'FC2580', 5: 'R820T', 6: 'R828D'
+}
+
+def parse_dongle_info(header):
+    """
+    แปลง dongle-info header 12 bytes: magic "RTL0" + tuner type + gain count (big-endian)
+    """
+    magic, tuner_type, gain_count = struct.unpack('>4sII', header)
+    if magic != b'RTL0':
+        raise ValueError(f"Invalid rtl_tcp header: {magic!r}")
+
+    return {
+        'tuner_type': tuner_type,
+        'tuner_name': TUNER_TYPES.get(tuner_type, 'Unknown'),
+        'gain_count': gain_count
+    }
+
+class AsyncRTLTCPClient:
+    def __init__(self, host='localhost', port=1234, frequency=185360000,
+                 sample_rate=2048000, gain=20, block_size=262144, queue_depth=16,
+                 reconnect_delay=2.0, name=None):
+        self.host = host
+        self.port = port
+        self.name = name or f"{host}:{port}"
+
+        self.frequency = frequency
+        self.sample_rate = sample_rate
+        self.gain = gain  # dB หรือ 'auto'
+
+        self.block_size = block_size  # samples ต่อ block
+        self.queue = asyncio.Queue(maxsize=queue_depth)
+        self.reconnect_delay = reconnect_delay
+
+        self.reader = None
+        self.writer = None
+        self.connected = False
+        self.running = False
+        self.dongle_info = None
+
+        # สถิติ
+        self.bytes_received = 0
+        self.samples_received = 0
+        self.blocks_received = 0
+        self.dropped_blocks = 0
+        self.reconnects = 0
+        self.connect_time = None        # เวลาที่ใช้เชื่อมต่อ + รับ header (วินาที)
+        self.first_block_latency = None # เวลาตั้งแต่เชื่อมต่อจนได้ block แรก (วินาที)
+        self.queue_latency_sum = 0.0    # เวลาที่ block รอใน queue ก่อน consumer รับ
+        self.queue_latency_max = 0.0
+        self.queue_latency_count = 0
+        self.start_time = None
+
+        # samples ที่ได้รับเทียบกับที่ควรได้, gaps, read latency, queue high-water
+        # (ingest_many แสดงผลเอง จึงปิดการ log อัตโนมัติ)
+        self.stats = CaptureStats(sample_rate, name=self.name, log_interval=0)
+        self.stats.set_queue_capacity(queue_depth)
+
+    async def connect(self):
+        """เชื่อมต่อ rtl_tcp server และอ่าน dongle-info header"""
+        connect_start = time.perf_counter()
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port,
+                                    limit=self.block_size * 4), timeout=10)
+
+        header = await asyncio.wait_for(
+            self.reader.readexactly(DONGLE_INFO_SIZE), timeout=10)
+        self.dongle_info = parse_dongle_info(header)
+        self.connect_time = time.perf_counter() - connect_start
+        self.connected = True
+
+        print(f"[{self.name}] Connected - tuner {self.dongle_info['tuner_name']}, "
+              f"{self.dongle_info['gain_count']} gain steps "
+              f"({self.connect_time*1000:.0f} ms)")
+
+        await self.configure()
+
+    async def send_command(self, cmd, value):
+        """ส่งคำสั่ง rtl_tcp: [cmd:1byte][value:4bytes big-endian]"""
+        if not self.connected:
+            return False
+
+        self.writer.write(struct.pack('>BI', cmd, value & 0xFFFFFFFF))
+        await self.writer.drain()
+        return True
+
+    async def configure(self):
+        """ตั้งค่า sample rate, ความถี่ และ gain (ไม่ต้อง sleep ระหว่างคำสั่ง)"""
+        await self.send_command(CMD_SET_SAMPLE_RATE, self.sample_rate)
+        await self.send_command(CMD_SET_FREQUENCY, self.frequency)
+
+        if self.gain == 'auto':
+            await self.send_command(CMD_SET_GAIN_MODE, 0)
+        else:
+            await self.send_command(CMD_SET_GAIN_MODE, 1)
+            await self.send_command(CMD_SET_GAIN, int(self.gain * 10))  # gain in 0.1 dB
+
+    async def set_frequency(self, frequency):
+        """เปลี่ยนความถี่ขณะรับข้อมูล"""
+        self.frequency = frequency
+        return await self.send_command(CMD_SET_FREQUENCY, frequency)
+
+    async def receive_loop(self):
+        """รับ blocks จาก socket แปลงเป็น complex64 และส่งเข้า queue"""
+        block_bytes = self.block_size * 2
+        connected_at = time.perf_counter()
+        self.first_block_latency = None
+
+        while self.running:
+            read_start = time.perf_counter()
+            data = await self.reader.readexactly(block_bytes)
+            arrival = time.perf_counter()
+
+            if self.first_block_latency is None:
+                self.first_block_latency = arrival - connected_at
+
+            self.bytes_received += len(data)
+            self.samples_received += len(data) // 2
+            self.blocks_received += 1
+
+            block = iq_bytes_to_complex64(data)
+            if self.queue.full():
+                # consumer ช้ากว่าสัญญาณ - ทิ้ง block ที่เก่าที่สุด consumer จึงได้ข้อมูลล่าสุดเสมอ
+                _, stale = self.queue.get_nowait()
+                self.dropped_blocks += 1
+                self.stats.record_drop(len(stale))
+            self.queue.put_nowait((arrival, block))
+            self.stats.record_block(len(block), arrival - read_start, self.queue.qsize())
+
+    async def run(self):
+        """เชื่อมต่อและรับข้อมูลจนกว่าจะ stop() - reconnect อัตโนมัติ"""
+        self.running = True
+        self.start_time = time.perf_counter()
+        self.stats.reset(self.sample_rate)
+
+        while self.running:
+            try:
+                await self.connect()
+                await self.receive_loop()
+            except asyncio.CancelledError:
+                break
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+                print(f"[{self.name}] Connection error: {e}")
+            finally:
+                await self.close_connection()
+
+            if self.running:
+                self.reconnects += 1
+                print(f"[{self.name}] Reconnecting in {self.reconnect_delay:.1f} s...")
+                await asyncio.sleep(self.reconnect_delay)
+
+    async def close_connection(self):
+        """ปิด socket ปัจจุบัน"""
+        self.connected = False
+        if self.writer:
+            try:
+                self.writer.close()
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+            self.writer = None
+            self.reader = None
+
+    def stop(self):
+        """หยุดรับข้อมูล (loop จะจบหลัง block ปัจจุบัน)"""
+        self.running = False
+
+    async def get_block(self):
+        """รอรับ complex64 block ถัดไป"""
+        arrival, block = await self.queue.get()
+        latency = time.perf_counter() - arrival
+        self.queue_latency_sum += latency
+        self.queue_latency_max = max(self.queue_latency_max, latency)
+        self.queue_latency_count += 1
+        return block
+
+    async def blocks(self):
+        """Async iterator: async for block in client.blocks(): ..."""
+        while self.running or not self.queue.empty():
+            yield await self.get_block()
+
+    def get_metrics(self):
+        """สถิติ throughput และ latency ของ connection นี้"""
+        elapsed = time.perf_counter() - self.start_time if self.start_time else 0
+        throughput = self.samples_received / elapsed if elapsed > 0 else 0
+        avg_latency = (self.queue_latency_sum / self.queue_latency_count
+                       if self.queue_latency_count else 0)
+        capture = self.stats.snapshot()
+
+        return {
+            'name': self.name,
+            'connected': self.connected,
+            'samples_received': self.samples_received,
+            'blocks_received': self.blocks_received,
+            'dropped_blocks': self.dropped_blocks,
+            'reconnects': self.reconnects,
+            'throughput_sps': throughput,
+            'realtime_ratio': throughput / self.sample_rate if self.sample_rate else 0,
+            'connect_time_ms': (self.connect_time or 0) * 1000,
+            'first_block_latency_ms': (self.first_block_latency or 0) * 1000,
+            'queue_latency_avg_ms': avg_latency * 1000,
+            'queue_latency_max_ms': self.queue_latency_max * 1000,
+            'queue_depth': self.queue.qsize(),
+            'queue_high_water': capture['queue_high_water'],
+            'samples_expected': capture['samples_expected'],
+            'gaps': capture['gaps'],
+            'stalls': capture['stalls'],
+            'read_latency_p99_ms': capture['latency_p99_ms'],
+            'read_latency_counts': capture['latency_counts']
+        }
+
+def print_metrics(clients):
+    """แสดงสถิติของทุก connection"""
+    for client in clients:
+        m = client.get_metrics()
+        status = "OK " if m['connected'] else "---"
+        print(f"  {status} {m['name']:<24s} {m['throughput_sps']/1e6:6.3f} Msps "
+              f"({m['realtime_ratio']*100:5.1f}%)  dropped {m['dropped_blocks']:4d}  "
+              f"gaps {m['gaps']:3d}  reconnects {m['reconnects']:2d}  "
+              f"queue {m['queue_latency_avg_ms']:5.1f}/{m['queue_latency_max_ms']:5.1f} ms "
+              f"(peak {m['queue_high_water']})")
+
+async def ingest_many(endpoints, duration_seconds=10, process_block=None,
+                      report_interval=2.0, **client_options):
+    """
+    รับข้อมูลจากหลาย rtl_tcp server พร้อมกัน
+
+    endpoints: list ของ (host, port)
+    process_block: ฟังก์ชัน process_block(client, block) สำหรับประมวลผลแต่ละ block
+    """
+    clients = [AsyncRTLTCPClient(host, port, **client_options) for host, port in endpoints]
+
+    async def consume(client):
+        async for block in client.blocks():
+            if process_block:
+                process_block(client, block)
+
+    async def report():
+        while True:
+            await asyncio.sleep(report_interval)
+            print(f"--- {time.strftime('%H:%M:%S')} ---")
+            print_metrics(clients)
+
+    tasks = [asyncio.create_task(client.run()) for client in clients]
+    tasks += [asyncio.create_task(consume(client)) for client in clients]
+    reporter = asyncio.create_task(report())
+
+    try:
+        await asyncio.sleep(duration_seconds)
+    finally:
+        for client in clients:
+            client.stop()
+        reporter.cancel()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, reporter, return_exceptions=True)
+
+    print("\n=== Final metrics ===")
+    print_metrics(clients)
+    return [client.get_metrics() for client in clients]
+
+def parse_endpoint(text, default_port=1234):
+    """แปลง "host:port" เป็น (host, port)"""
+    if ':' in text:
+        host, port = text.rsplit(':', 1)
+        return host, int(port)
+    return text, default_port
+
+def main():
+    """ฟังก์ชันหลักสำหรับทดสอบ"""
+    print("=== Lab 3: asyncio rtl_tcp multi-server client ===")
+
+    args = sys.argv[1:]
+    duration = 10
+    if '--duration' in args:
+        index = args.index('--duration')
+        duration = float(args[index + 1])
+        del args[index:index + 2]
+
+    endpoints = [parse_endpoint(arg) for arg in args] or [('localhost', 1234)]
+    print(f"Endpoints: {', '.join(f'{h}:{p}' for h, p in endpoints)}")
+
+    # ตัวอย่างการประมวลผล: คำนวณ signal power ของแต่ละ block
+    power = {}
+
+    def process_block(client, block):
+        power[client.name] = float(np.mean(np.abs(block) ** 2))
+
+    try:
+        asyncio.run(ingest_many(endpoints, duration, process_block))
+    except KeyboardInterrupt:
+        print("\nUser interrupted")
+
+    for name, value in power.items():
+        print(f"{name}: last block power {10 * np.log10(value + 1e-12):.1f} dB")
+
+if __name__ == "__main__":
+    main()
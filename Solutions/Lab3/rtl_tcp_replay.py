@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lab 3: rtl_tcp Replay Server (ทดสอบโดยไม่ต้องมี RTL-SDR)
+เป้าหมาย: จำลอง rtl_tcp server ที่ส่ง I/Q จากไฟล์ที่บันทึกไว้ หรือสัญญาณสังเคราะห์
+
+- ส่ง dongle-info header 12 bytes เหมือน rtl_tcp จริง
+- รับคำสั่ง frequency, sample rate, gain mode, gain (และบันทึกคำสั่งอื่นๆ)
+- ส่งข้อมูลแบบ real-time ตาม sample rate หรือเร็วที่สุด (--max-rate)
+- จำลองปัญหาได้: ทิ้ง block (--drop) และหน่วงเวลาแบบสุ่ม (--jitter)
+- --tone: เพิ่ม carrier ที่ความถี่ RF คงที่ - ตำแหน่งใน baseband เปลี่ยนตามความถี่ที่ client สั่ง
+  --retune-delay: ความถี่ใหม่มีผลหลังส่งไปอีก N samples (เหมือน USB buffer ของ rtl_tcp)
+- --check-retune: ตรวจว่า RTLTCPClient.retune() คืน block ที่เป็นข้อมูลความถี่ใหม่ล้วนๆ
+- ใช้ benchmark RTLTCPClient, rtl_tcp_async และ Colab notebooks บนเครื่อง CI
+
+Usage:
+python3 rtl_tcp_replay.py raw_iq_000.cu8 --port 1234
+python3 rtl_tcp_replay.py --synthetic --max-rate
+python3 rtl_tcp_replay.py --synthetic --drop 0.01 --jitter 20
+python3 rtl_tcp_replay.py --synthetic --tone 185.66 --retune-delay 131072
+python3 rtl_tcp_replay.py --check-retune
+
+Dependencies:
+pip install numpy
+"""
+
+import asyncio
+import random
+import struct
+import sys
+import time
+
+import numpy as np
+
+import fft_backend
+from iq_file import IQFileReader, complex64_to_cu8, iq_bytes_to_complex64
+from rtl_tcp_async import (CMD_SET_FREQUENCY, CMD_SET_SAMPLE_RATE,
+                           CMD_SET_GAIN_MODE, CMD_SET_GAIN)
+
+TUNER_R820T = 5
+R820T_GAIN_COUNT = 29
+COMMAND_SIZE = 5  # [cmd:1byte][value:4bytes big-endian]
+
+class SyntheticSource:
+    """สัญญาณสังเคราะห์คล้าย DAB+ (noise กว้าง 1.536 MHz บน noise floor) วนซ้ำ"""
+
+    def __init__(self, sample_rate=2048000, num_samples=262144, snr_db=15, seed=1, data=None):
+        # data: cu8 buffer ที่สร้างไว้แล้ว (ให้หลาย client ใช้ร่วมกันได้)
+        self.data = data if data is not None else self.generate(sample_rate, num_samples,
+                                                                 snr_db, seed)
+        self.position = 0
+
+    @staticmethod
+    def generate(sample_rate, num_samples, snr_db, seed):
+        """สร้าง cu8 buffer ของสัญญาณสังเคราะห์"""
+        rng = np.random.default_rng(seed)
+        noise = (rng.standard_normal(num_samples) +
+                 1j * rng.standard_normal(num_samples)).astype(np.complex64)
+
+        # จำกัด bandwidth ของ "ensemble" ด้วย FFT mask กว้าง 1.536 MHz
+        spectrum = fft_backend.fft(noise)
+        freqs = np.fft.fftfreq(num_samples, 1 / sample_rate)
+        spectrum[np.abs(freqs) > 768000] = 0
+        ensemble = fft_backend.ifft(spectrum).astype(np.complex64)
+
+        floor = (rng.standard_normal(num_samples) +
+                 1j * rng.standard_normal(num_samples)).astype(np.complex64)
+        signal = ensemble * 10 ** (snr_db / 20) + floor
+        signal *= 0.5 / np.sqrt(np.mean(np.abs(signal) ** 2))
+
+        return complex64_to_cu8(signal)
+
+    def read_cu8(self, num_samples):
+        """คืนค่า uint8 I/Q bytes ถัดไป (วนกลับต้น buffer)"""
+        num_bytes = num_samples * 2
+        if self.position + num_bytes > len(self.data):
+            self.position = 0
+        chunk = self.data[self.position:self.position + num_bytes]
+        self.position += num_bytes
+        return chunk
+
+class FileSource:
+    """อ่าน I/Q จากไฟล์ (cu8/cs16/cf32) แบบ memory-mapped วนซ้ำเมื่ออ่านจบ"""
+
+    def __init__(self, filename):
+        self.reader = IQFileReader(filename)
+        if self.reader.num_samples == 0:
+            raise ValueError(f"No samples in {filename}")
+        self.sample_rate = self.reader.sample_rate
+
+    def read_cu8(self, num_samples):
+        """คืนค่า uint8 I/Q bytes ถัดไป - ไฟล์ cu8 ส่งตรงจาก memmap ไม่ต้องแปลง"""
+        if self.reader.position >= self.reader.num_samples:
+            self.reader.seek(0)
+
+        start = self.reader.position
+        count = min(num_samples, self.reader.num_samples - start)
+        self.reader.seek(start + count)
+
+        if self.reader.data_format == 'cu8':
+            return self.reader.raw[start * 2:(start + count) * 2]
+        return complex64_to_cu8(self.reader.read(start, count))
+
+class RTLTCPReplayServer:
+    def __init__(self, source_factory, host='127.0.0.1', port=1234, sample_rate=2048000,
+                 block_size=16384, realtime=True, drop_rate=0.0, jitter_ms=0.0,
+                 tone_frequency=None, retune_delay=0):
+        self.source_factory = source_factory  # สร้าง source ใหม่ต่อ client
+        self.host = host
+        self.port = port
+        self.sample_rate = sample_rate
+        self.block_size = block_size  # samples ต่อ block
+        self.realtime = realtime
+        self.drop_rate = drop_rate
+        self.jitter_ms = jitter_ms
+        self.tone_frequency = tone_frequency  # Hz (RF) ของ carrier ที่เพิ่มเข้าไป หรือ None
+        self.retune_delay = retune_delay      # samples ที่ยังเป็นความถี่เก่าหลังได้รับคำสั่ง
+        self.server = None
+        self.client_count = 0
+
+    async def handle_commands(self, reader, state):
+        """รับคำสั่ง rtl_tcp จาก client"""
+        while True:
+            command = await reader.readexactly(COMMAND_SIZE)
+            cmd, value = struct.unpack('>BI', command)
+            state['commands'] += 1
+
+            if cmd == CMD_SET_FREQUENCY:
+                state['frequency'] = value
+                state['retune_at'] = state['samples_generated'] + self.retune_delay
+                print(f"[{state['name']}] Frequency: {value/1e6:.3f} MHz")
+            elif cmd == CMD_SET_SAMPLE_RATE:
+                state['sample_rate'] = value
+                state['pacing_reset'] = True
+                print(f"[{state['name']}] Sample rate: {value/1e6:.3f} Msps")
+            elif cmd == CMD_SET_GAIN_MODE:
+                state['gain_mode'] = 'manual' if value else 'auto'
+                print(f"[{state['name']}] Gain mode: {state['gain_mode']}")
+            elif cmd == CMD_SET_GAIN:
+                state['gain'] = value / 10
+                print(f"[{state['name']}] Gain: {value/10:.1f} dB")
+            else:
+                print(f"[{state['name']}] Command 0x{cmd:02x} value {value} (ignored)")
+
+    async def stream_samples(self, writer, source, state):
+        """ส่ง I/Q blocks ให้ client ตาม pacing และ fault injection ที่ตั้งไว้"""
+        start_time = time.perf_counter()
+        samples_since_start = 0
+
+        while True:
+            if state['pacing_reset']:
+                start_time = time.perf_counter()
+                samples_since_start = 0
+                state['pacing_reset'] = False
+
+            block = source.read_cu8(self.block_size)
+            num_samples = len(block) // 2
+            if self.tone_frequency:
+                block = self.add_tone(block, state)
+            state['samples_generated'] += num_samples
+
+            # จำลอง USB overflow - ข้าม block นี้ไป (client จะเห็น samples หาย)
+            if self.drop_rate and random.random() < self.drop_rate:
+                state['dropped_blocks'] += 1
+            else:
+                writer.write(memoryview(block))
+                await writer.drain()
+                state['bytes_sent'] += len(block)
+
+            samples_since_start += num_samples
+
+            delay = 0.0
+            if self.realtime:
+                target = start_time + samples_since_start / state['sample_rate']
+                delay = target - time.perf_counter()
+            if self.jitter_ms:
+                delay += random.uniform(0, self.jitter_ms) / 1000
+
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif not self.realtime:
+                await asyncio.sleep(0)  # ให้ client อื่นได้ทำงานบ้าง
+
+    def add_tone(self, block, state):
+        """
+        เพิ่ม carrier ที่ tone_frequency (RF) ลงใน block - ตำแหน่งใน baseband ขึ้นกับความถี่ที่จูนอยู่
+
+        ความถี่ที่สั่งมีผลเมื่อสร้าง samples ครบ retune_at (samples ก่อนหน้ายังเป็นความถี่เก่า)
+        """
+        samples = iq_bytes_to_complex64(block)
+        num_samples = len(samples)
+        index = np.arange(num_samples)
+        switch = min(max(state['retune_at'] - state['samples_generated'], 0), num_samples)
+
+        tuned = np.where(index < switch, state['tuned_frequency'], state['frequency'])
+        step = 2 * np.pi * (self.tone_frequency - tuned) / state['sample_rate']
+        phase = state['tone_phase'] + np.cumsum(step)
+        state['tone_phase'] = phase[-1] % (2 * np.pi)
+        if switch < num_samples:
+            state['tuned_frequency'] = state['frequency']
+
+        samples = samples * np.float32(0.5) + np.float32(0.4) * np.exp(1j * phase).astype(np.complex64)
+        return complex64_to_cu8(samples)
+
+    async def handle_client(self, reader, writer):
+        """จัดการ client หนึ่งตัว"""
+        self.client_count += 1
+        peer = writer.get_extra_info('peername')
+        state = {
+            'name': f"client {self.client_count} {peer[0]}:{peer[1]}" if peer else f"client {self.client_count}",
+            'frequency': 185360000,
+            'sample_rate': self.sample_rate,
+            'gain_mode': 'auto',
+            'gain': 0,
+            'commands': 0,
+            'bytes_sent': 0,
+            'dropped_blocks': 0,
+            'pacing_reset': False,
+            'samples_generated': 0,
+            'retune_at': 0,
+            'tuned_frequency': 185360000,  # ความถี่ที่ข้อมูลที่กำลังสร้างเป็นจริงๆ (--tone)
+            'tone_phase': 0.0
+        }
+        print(f"[{state['name']}] Connected")
+        connect_time = time.perf_counter()
+
+        writer.write(b'RTL0' + struct.pack('>II', TUNER_R820T, R820T_GAIN_COUNT))
+
+        tasks = [
+            asyncio.create_task(self.handle_commands(reader, state)),
+            asyncio.create_task(self.stream_samples(writer, self.source_factory(), state))
+        ]
+
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                error = task.exception()
+                if error and not isinstance(error, (asyncio.IncompleteReadError, ConnectionError)):
+                    print(f"[{state['name']}] Error: {error}")
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+        elapsed = time.perf_counter() - connect_time
+        rate = state['bytes_sent'] / 2 / elapsed if elapsed > 0 else 0
+        print(f"[{state['name']}] Disconnected - sent {state['bytes_sent']/1e6:.1f} MB "
+              f"({rate/1e6:.3f} Msps), dropped {state['dropped_blocks']} blocks, "
+              f"{state['commands']} commands")
+
+    async def serve(self):
+        """เริ่ม server และรอจนกว่าจะถูกยกเลิก"""
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        mode = "real-time" if self.realtime else "max rate"
+        print(f"rtl_tcp replay server listening on {self.host}:{self.port} ({mode})")
+        if self.tone_frequency:
+            print(f"Tone at {self.tone_frequency/1e6:.3f} MHz, retune delay {self.retune_delay} samples")
+        if self.drop_rate or self.jitter_ms:
+            print(f"Fault injection: drop {self.drop_rate*100:.1f}% of blocks, "
+                  f"jitter up to {self.jitter_ms:.0f} ms")
+
+        async with self.server:
+            await self.server.serve_forever()
+
+def tone_offsets(samples, sample_rate, chunk_size=4096):
+    """ความถี่ (Hz) ของ peak ในแต่ละช่วง chunk_size samples"""
+    num_chunks = len(samples) // chunk_size
+    chunks = samples[:num_chunks * chunk_size].reshape(num_chunks, chunk_size)
+    peaks = np.argmax(np.abs(np.fft.fft(chunks, axis=1)), axis=1)
+    return np.fft.fftfreq(chunk_size, 1 / sample_rate)[peaks]
+
+def check_retune(port=12345, retunes=6, backlog_seconds=0.5):
+    """
+    ตรวจ RTLTCPClient.retune() กับ replay server ที่มี tone และ retune delay
+
+    client หยุดอ่านไป backlog_seconds ก่อนเปลี่ยนความถี่ (ข้อมูลความถี่เก่าค้างใน socket buffers)
+    แล้วตรวจว่าทุกช่วงของ block แรกที่ retune() คืนมามี tone อยู่ที่ตำแหน่งของความถี่ใหม่
+    """
+    import threading
+    from lab3_1b import RTLTCPClient
+
+    sample_rate = 2048000
+    tone = 185660000
+    tunings = [185360000, 185960000, 186260000]  # tone อยู่ที่ +300 / -300 / -600 kHz
+    synthetic_data = SyntheticSource(sample_rate).data
+    server = RTLTCPReplayServer(lambda: SyntheticSource(data=synthetic_data), port=port,
+                                sample_rate=sample_rate, tone_frequency=tone, retune_delay=131072)
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    asyncio.run_coroutine_threadsafe(server.serve(), loop)
+    time.sleep(0.5)
+
+    client = RTLTCPClient(port=port)
+    client.sample_rate = sample_rate
+    if not client.connect_to_server():
+        return False
+
+    passed = 0
+    try:
+        client.read_block(65536)
+        for count in range(retunes):
+            frequency = tunings[(count + 1) % len(tunings)]
+            time.sleep(backlog_seconds)
+            samples = client.retune(frequency)
+            offsets = tone_offsets(samples, sample_rate)
+            clean = np.all(np.abs(offsets - (tone - frequency)) < 2000)
+            passed += clean
+            print(f"  retune to {frequency/1e6:.3f} MHz: tone at "
+                  f"{', '.join(f'{offset/1e3:+.0f}' for offset in np.unique(np.round(offsets, -3)))} kHz "
+                  f"-> {'clean' if clean else 'CONTAINS OLD-FREQUENCY DATA'}")
+    finally:
+        client.socket.close()
+        loop.call_soon_threadsafe(server.server.close)
+        time.sleep(0.2)
+
+    print(f"Retune check: {passed}/{retunes} first blocks contain only new-frequency data")
+    return passed == retunes
+
+def main():
+    """ฟังก์ชันหลัก"""
+    print("=== Lab 3: rtl_tcp Replay Server ===")
+
+    args = sys.argv[1:]
+    if '--check-retune' in sys.argv:
+        sys.exit(0 if check_retune() else 1)
+
+    options = {'--port': '1234', '--host': '127.0.0.1', '--drop': '0', '--jitter': '0',
+               '--tone': '0', '--retune-delay': '0'}
+    for name in list(options):
+        if name in args:
+            index = args.index(name)
+            options[name] = args[index + 1]
+            del args[index:index + 2]
+
+    realtime = '--max-rate' not in args
+    synthetic = '--synthetic' in args
+    files = [arg for arg in args if not arg.startswith('--')]
+
+    if not files and not synthetic:
+        print("Usage: python3 rtl_tcp_replay.py <file.cu8> [--port 1234] [--max-rate]")
+        print("       python3 rtl_tcp_replay.py --synthetic [--drop 0.01] [--jitter 20]")
+        return
+
+    if files:
+        filename = files[0]
+        try:
+            sample_rate = FileSource(filename).sample_rate
+        except Exception as e:
+            print(f"Error opening I/Q file: {e}")
+            return
+        source_factory = lambda: FileSource(filename)
+        print(f"Replaying {filename} at {sample_rate/1e6:.3f} Msps")
+    else:
+        sample_rate = 2048000
+        synthetic_data = SyntheticSource(sample_rate).data
+        source_factory = lambda: SyntheticSource(data=synthetic_data)
+        print("Streaming synthetic DAB-like signal")
+
+    server = RTLTCPReplayServer(source_factory, host=options['--host'],
+                                port=int(options['--port']), sample_rate=sample_rate,
+                                realtime=realtime, drop_rate=float(options['--drop']),
+                                jitter_ms=float(options['--jitter']),
+                                tone_frequency=float(options['--tone']) * 1e6 or None,
+                                retune_delay=int(options['--retune-delay']))
+
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        print("\nServer stopped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lab 3: Offline Spectrogram Batch Tool (memory-mapped + process pool)
+เป้าหมาย: คำนวณ spectrogram ของไฟล์ I/Q ยาวหลายชั่วโมงให้เร็วกว่า real-time หลายเท่า ด้วยทุก core
+
+- เปิดไฟล์ผ่าน IQFileReader (np.memmap) - ไม่โหลดทั้งไฟล์เข้า RAM
+- แบ่งไฟล์เป็น chunk ตามแถวของ spectrogram (เช่น 2 วินาที = 20 แถว x 0.1 วินาที)
+  แต่ละ chunk อ่านเกินท้ายไป fft_size - step samples (overlap) ให้ frame ต่อเนื่องข้าม chunk
+- Process pool: worker แต่ละตัวเปิด memmap ของตัวเอง แล้วเขียนแถวที่คำนวณเสร็จลงไฟล์ผลลัพธ์
+  (.npy แบบ memmap) โดยตรง - ไม่ส่ง spectrum กลับผ่าน pipe
+- แต่ละแถวคือ Welch PSD (dBFS) ของ frame ในช่วงเวลานั้น เก็บเป็น float16 (2 bytes/bin)
+- ภาพ PNG ตัวอย่าง: ภาพรวมทั้งไฟล์ + ทีละช่วง (ค่า max ต่อ pixel - burst สั้นๆ ไม่หาย)
+  render ใน pool เดียวกันด้วย backend Agg
+
+Usage:
+python3 spectrogram_batch.py recording.cu8                      # ทุก core, แถวละ 0.1 วินาที
+python3 spectrogram_batch.py recording.cu8 --fft-size 2048 --row-seconds 1 --workers 4
+python3 spectrogram_batch.py *.cu8 --output-dir spectrograms --segment-minutes 5
+python3 spectrogram_batch.py recording.cu8 --max-averages 16    # เร็วขึ้น: ใช้ไม่เกิน 16 frame ต่อแถว
+
+ผลลัพธ์ (ชื่อตามไฟล์ต้นฉบับ):
+<ชื่อ>.spectrogram.npy     float16 (แถว x bins) - เปิดด้วย load_spectrogram() หรือ np.load(mmap_mode='r')
+<ชื่อ>.spectrogram.json    sample rate, ความถี่, เวลาต่อแถว ฯลฯ
+<ชื่อ>.spectrogram.png     ภาพรวม
+<ชื่อ>.spectrogram_000.png ภาพทีละช่วง (--segment-minutes)
+
+Dependencies:
+pip install numpy matplotlib
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+import fft_backend
+from fft_backend import get_window
+from iq_file import IQFileReader
+
+SPECTROGRAM_EXTENSION = '.spectrogram'
+FRAMES_PER_BATCH = 4096   # frame ต่อ FFT หนึ่งครั้งใน worker (~32 MB ที่ fft_size 1024)
+
+# FFT ใน worker ใช้ thread เดียว - ความขนานมาจาก process pool อยู่แล้ว
+_worker_fft = fft_backend.FFTBackend('scipy' if fft_backend.HAVE_SCIPY else 'numpy')
+_worker_files = {}
+
+def output_paths(input_filename, output_dir=None):
+    """ชื่อไฟล์ผลลัพธ์ (.npy, .json) ของไฟล์ I/Q"""
+    base = os.path.splitext(input_filename)[0]
+    if output_dir:
+        base = os.path.join(output_dir, os.path.basename(base))
+    base += SPECTROGRAM_EXTENSION
+    return base + '.npy', base + '.json'
+
+def plan_chunks(num_samples, row_samples, rows_per_chunk):
+    """รายการ (first_row, num_rows) ของแต่ละ chunk - ตัดแถวสุดท้ายที่ไม่ครบทิ้ง"""
+    total_rows = num_samples // row_samples
+    return [(first_row, min(rows_per_chunk, total_rows - first_row))
+            for first_row in range(0, total_rows, rows_per_chunk)]
+
+def _open_worker_files(task):
+    """เปิด reader และไฟล์ผลลัพธ์ครั้งเดียวต่อ worker process (cache ตามชื่อไฟล์)"""
+    key = (task['input'], task['output'])
+    if key not in _worker_files:
+        _worker_files.clear()
+        reader = IQFileReader(task['input'], task['format'], task['sample_rate'])
+        _worker_files[key] = (reader, open_memmap(task['output'], mode='r+'))
+    return _worker_files[key]
+
+def process_chunk(task):
+    """
+    คำนวณแถว spectrogram ของ chunk หนึ่ง แล้วเขียนลงไฟล์ผลลัพธ์ (ทำงานใน worker process)
+
+    คืนค่า (จำนวนแถว, จำนวน samples ที่ประมวลผล)
+    """
+    reader, spectrogram = _open_worker_files(task)
+    fft_size = task['fft_size']
+    step = task['step']
+    row_samples = task['row_samples']
+    first_row, num_rows = task['first_row'], task['num_rows']
+    frames_per_row = row_samples // step
+    window = get_window('hann', fft_size)
+
+    # frame ที่เริ่มในแถวสุดท้ายอาจยาวเกินแถว - อ่านเกินไปอีก fft_size - step samples
+    start = first_row * row_samples
+    count = num_rows * row_samples + fft_size - step
+    samples = reader.read(start, count)
+    if len(samples) < count:
+        # chunk สุดท้ายของไฟล์ - เติมศูนย์ให้ frame สุดท้ายครบ
+        samples = np.concatenate((samples, np.zeros(count - len(samples), dtype=np.complex64)))
+
+    # frame ทั้งหมดของ chunk เป็น view (rows x frames_per_row x fft_size) ไม่ copy
+    frames = np.lib.stride_tricks.sliding_window_view(samples, fft_size)[::step]
+    frames = frames[:num_rows * frames_per_row].reshape(num_rows, frames_per_row, fft_size)
+
+    # ใช้ frame กระจายทั่วแถว ถ้าจำกัดจำนวน average
+    if task['max_averages'] and frames_per_row > task['max_averages']:
+        frames = frames[:, ::frames_per_row // task['max_averages']][:, :task['max_averages']]
+
+    rows_per_batch = max(1, FRAMES_PER_BATCH // frames.shape[1])
+    for batch_start in range(0, num_rows, rows_per_batch):
+        batch = frames[batch_start:batch_start + rows_per_batch]
+        spectra = _worker_fft.fft(batch * window, axis=2)
+        power = np.mean(spectra.real ** 2 + spectra.imag ** 2, axis=1)
+        rows = 10 * np.log10(np.fft.fftshift(power, axes=1) + 1e-12) - task['scale_db']
+        spectrogram[first_row + batch_start:first_row + batch_start + len(batch)] = rows
+
+    spectrogram.flush()
+    return num_rows, num_rows * row_samples
+
+def reduce_max(image, row_group, column_group):
+    """ลดขนาดภาพด้วยค่า max ต่อกลุ่ม (เติม NaN ให้หารลงตัว) - peak สั้น/แคบยังอยู่"""
+    rows, columns = image.shape
+    image = np.pad(image.astype(np.float32),
+                   ((0, -rows % row_group), (0, -columns % column_group)),
+                   constant_values=np.nan)
+    grouped = image.reshape(image.shape[0] // row_group, row_group,
+                            image.shape[1] // column_group, column_group)
+    return np.fmax.reduce(np.fmax.reduce(grouped, axis=3), axis=1)
+
+def load_spectrogram(filename):
+    """
+    เปิดผลลัพธ์แบบ memmap (ไม่โหลดทั้งไฟล์)
+
+    คืนค่า (times_seconds, frequencies_hz, spectrogram float16, metadata)
+    """
+    npy_filename = filename if filename.endswith('.npy') else filename + '.npy'
+    with open(os.path.splitext(npy_filename)[0] + '.json', 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    spectrogram = np.load(npy_filename, mmap_mode='r')
+    times = (np.arange(spectrogram.shape[0]) + 0.5) * metadata['row_seconds']
+    frequencies = (metadata['center_frequency'] +
+                   np.fft.fftshift(np.fft.fftfreq(metadata['fft_size'], 1 / metadata['sample_rate'])))
+    return times, frequencies, spectrogram, metadata
+
+def render_preview(task):
+    """Render PNG ของแถว [first_row, stop_row) ด้วย Agg (ทำงานใน worker process)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    times, frequencies, spectrogram, metadata = load_spectrogram(task['spectrogram'])
+    first_row, stop_row = task['first_row'], task['stop_row']
+    width, height = task['size']
+
+    # อ่านทีละ block (~4M ค่า) แล้วลดเหลือ ~1 แถวต่อ pixel
+    row_group = max(1, int(np.ceil((stop_row - first_row) / height)))
+    column_group = max(1, int(np.ceil(spectrogram.shape[1] / width)))
+    block_rows = row_group * max(1, (1 << 22) // (row_group * spectrogram.shape[1]))
+    image = np.vstack([reduce_max(spectrogram[start:min(start + block_rows, stop_row)],
+                                  row_group, column_group)
+                       for start in range(first_row, stop_row, block_rows)])
+
+    finite = image[np.isfinite(image)]
+    low, high = (np.percentile(finite, 5), np.max(finite)) if finite.size else (-100, 0)
+
+    figure = Figure(figsize=(width / 100, height / 100), dpi=100)
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot(1, 1, 1)
+    start_seconds = first_row * metadata['row_seconds']
+    stop_seconds = stop_row * metadata['row_seconds']
+    shown = ax.imshow(image, aspect='auto', interpolation='nearest', cmap='viridis',
+                     vmin=low, vmax=high, origin='upper',
+                     extent=[frequencies[0] / 1e6, frequencies[-1] / 1e6,
+                             stop_seconds / 60, start_seconds / 60])
+    ax.set_xlabel('Frequency (MHz)')
+    ax.set_ylabel('Time (minutes)')
+    ax.set_title(f"{os.path.basename(metadata['source'])}  "
+                 f"{start_seconds / 60:.1f}-{stop_seconds / 60:.1f} min")
+    figure.colorbar(shown, ax=ax, label='Power (dBFS)')
+    figure.tight_layout()
+    figure.savefig(task['output'])
+    return task['output']
+
+def process_file(filename, pool, fft_size=1024, overlap=0.5, row_seconds=0.1,
+                 chunk_seconds=2.0, max_averages=None, output_dir=None,
+                 segment_minutes=10.0, preview_size=(1200, 800)):
+    """คำนวณ spectrogram ของไฟล์หนึ่งด้วย pool ที่เปิดอยู่ แล้ว render PNG ตัวอย่าง"""
+    reader = IQFileReader(filename)
+    sample_rate = reader.sample_rate
+    step = max(1, int(round(fft_size * (1 - overlap))))
+
+    # แถวยาวเป็นจำนวนเต็มเท่าของ step - frame ไม่คร่อมระหว่างแถว
+    row_samples = max(1, int(round(row_seconds * sample_rate / step))) * step
+    rows_per_chunk = max(1, int(round(chunk_seconds * sample_rate / row_samples)))
+    chunks = plan_chunks(reader.num_samples, row_samples, rows_per_chunk)
+    total_rows = sum(num_rows for _, num_rows in chunks)
+    if not total_rows:
+        print(f"{filename}: shorter than one row ({row_samples} samples) - skipped")
+        return None
+
+    npy_filename, json_filename = output_paths(filename, output_dir)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    open_memmap(npy_filename, mode='w+', dtype=np.float16, shape=(total_rows, fft_size)).flush()
+
+    # dBFS: full-scale sinusoid ที่ผ่าน hann window = 0 dB
+    scale_db = 20 * np.log10(np.sum(get_window('hann', fft_size)))
+    metadata = {
+        'source': os.path.abspath(filename),
+        'format': reader.data_format,
+        'sample_rate': sample_rate,
+        'center_frequency': reader.center_frequency or 0,
+        'start_time': reader.start_time,
+        'fft_size': fft_size,
+        'overlap': overlap,
+        'row_seconds': row_samples / sample_rate,
+        'frames_per_row': min(row_samples // step, max_averages or row_samples),
+        'rows': total_rows,
+        'dtype': 'float16',
+        'units': 'dBFS',
+    }
+    with open(json_filename, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+
+    duration = total_rows * row_samples / sample_rate
+    print(f"{filename}: {duration / 60:.1f} min at {sample_rate / 1e6:.3f} Msps -> "
+          f"{total_rows} x {fft_size} ({len(chunks)} chunks)")
+
+    base_task = {
+        'input': filename, 'output': npy_filename, 'format': reader.data_format,
+        'sample_rate': sample_rate, 'fft_size': fft_size, 'step': step,
+        'row_samples': row_samples, 'max_averages': max_averages, 'scale_db': scale_db,
+    }
+    tasks = [dict(base_task, first_row=first_row, num_rows=num_rows)
+             for first_row, num_rows in chunks]
+    reader.close()
+
+    start_time = time.perf_counter()
+    processed = 0
+    next_report = 0.1
+    for _, num_samples in pool.imap_unordered(process_chunk, tasks):
+        processed += num_samples
+        if processed / sample_rate >= next_report * duration:
+            elapsed = time.perf_counter() - start_time
+            print(f"  {processed / sample_rate / duration * 100:5.1f}%  "
+                  f"{processed / sample_rate / elapsed:6.1f}x real-time")
+            next_report += 0.1
+    elapsed = time.perf_counter() - start_time
+    print(f"  Spectrogram: {elapsed:.1f} s ({duration / elapsed:.1f}x real-time) -> {npy_filename} "
+          f"({os.path.getsize(npy_filename) / 1e6:.1f} MB)")
+
+    # PNG: ภาพรวม + ทีละช่วง
+    base = os.path.splitext(npy_filename)[0]
+    previews = [{'spectrogram': npy_filename, 'first_row': 0, 'stop_row': total_rows,
+                 'size': preview_size, 'output': base + '.png'}]
+    if segment_minutes:
+        segment_rows = max(1, int(segment_minutes * 60 / metadata['row_seconds']))
+        if segment_rows < total_rows:
+            for index, first_row in enumerate(range(0, total_rows, segment_rows)):
+                previews.append({'spectrogram': npy_filename, 'first_row': first_row,
+                                 'stop_row': min(first_row + segment_rows, total_rows),
+                                 'size': preview_size, 'output': f"{base}_{index:03d}.png"})
+
+    start_time = time.perf_counter()
+    outputs = pool.map(render_preview, previews)
+    print(f"  Previews: {len(outputs)} PNG in {time.perf_counter() - start_time:.1f} s "
+          f"({os.path.basename(outputs[0])}{', ...' if len(outputs) > 1 else ''})")
+    return npy_filename
+
+def main():
+    """ฟังก์ชันหลัก"""
+    parser = argparse.ArgumentParser(
+        description='Lab 3: Offline spectrogram batch tool for long I/Q recordings',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+Examples:
+  python3 spectrogram_batch.py raw_iq_000.cu8
+  python3 spectrogram_batch.py raw_iq_000.cu8 --fft-size 2048 --row-seconds 1
+  python3 spectrogram_batch.py *.cu8 --workers 4 --output-dir spectrograms
+        '''
+    )
+    parser.add_argument('files', nargs='+', help='I/Q files (.cu8, .cs16, .cf32, .bin)')
+    parser.add_argument('--fft-size', type=int, default=1024, help='FFT size (default: 1024)')
+    parser.add_argument('--overlap', type=float, default=0.5, help='Frame overlap 0-0.9 (default: 0.5)')
+    parser.add_argument('--row-seconds', type=float, default=0.1,
+                        help='Time per spectrogram row (default: 0.1)')
+    parser.add_argument('--chunk-seconds', type=float, default=2.0,
+                        help='Samples per worker task (default: 2.0)')
+    parser.add_argument('--max-averages', type=int, default=None,
+                        help='Max frames averaged per row (default: all)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Worker processes (default: all cores)')
+    parser.add_argument('--output-dir', default=None, help='Output directory (default: next to input)')
+    parser.add_argument('--segment-minutes', type=float, default=10.0,
+                        help='Minutes per segment preview PNG, 0 = overview only (default: 10)')
+
+    args = parser.parse_args()
+    if not 0 <= args.overlap < 1:
+        parser.error("--overlap must be in [0, 1)")
+
+    print("=== Lab 3: Offline Spectrogram Batch ===")
+    print(f"Workers: {args.workers}, FFT {args.fft_size}, overlap {args.overlap:.0%}, "
+          f"{args.row_seconds} s per row")
+
+    with mp.Pool(args.workers) as pool:
+        for filename in args.files:
+            try:
+                process_file(filename, pool, args.fft_size, args.overlap, args.row_seconds,
+                             args.chunk_seconds, args.max_averages, args.output_dir,
+                             args.segment_minutes)
+            except (OSError, ValueError) as e:
+                print(f"{filename}: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lab 3: Spectrum Estimation (batched Welch PSD)
+เป้าหมาย: คำนวณสเปกตรัมเฉลี่ยจาก I/Q หลายวินาทีได้เร็ว ใช้ร่วมกันทุก Lab
+
+- จัด samples เป็น frame matrix (overlap ได้) แบบ view ไม่ copy
+- FFT ทีละหลาย frame ในครั้งเดียว (batched) แทนการวน loop ทีละ frame
+- Cache window ตามชนิดและขนาด ไม่สร้างใหม่ทุกครั้ง (fft_backend.get_window)
+- FFT ผ่าน fft_backend (numpy หรือ scipy หลาย thread ตามผล benchmark ของเครื่อง)
+- ใช้ rfft อัตโนมัติเมื่อ input เป็นสัญญาณจริง, fft เมื่อเป็น I/Q (complex)
+- คูณ window ลง buffer เดิมซ้ำทุก batch (ไม่สร้าง complex array ใหม่) และ batch เล็กพอให้อยู่ใน cache
+- ค่าเริ่มต้นเฉลี่ยทุก frame - ผลวิเคราะห์ที่บันทึกใช้ค่าเฉลี่ยเต็มเสมอ
+  num_averages (เช่น LIVE_DISPLAY_AVERAGES) เลือก frame กระจายทั่ว capture เป็น opt-in สำหรับ
+  กราฟ live เท่านั้น: 500 frame เร็วกว่ามากแต่ความแปรปรวนสูงขึ้น (~0.03 -> ~0.19 dB)
+- SpectrumAverager: เฉลี่ยแบบ streaming ทีละ block (linear, exponential, peak-hold)
+  ใช้ทุก sample, หน่วยความจำ O(fft_size) และส่งสเปกตรัมออกตาม display rate คงที่
+
+ความเร็ว (capture 10 วินาที, FFT 1024, ทุก frame ไม่ overlap - งานเท่ากับ loop เดิม):
+  เครื่อง x86 1 core วัดได้ ~7.5-8x (loop เดิม ~1.4 s, batched ~180 ms) ยังไม่ถึงเป้า 10x
+  สาเหตุ: FFT อย่างเดียวของทุก frame ใช้ ~160 ms แล้ว เพดานบน core เดียวจึงอยู่ที่ ~8-9x
+  ส่วนที่เหลือ (window, |X|^2) เป็นงาน memory-bound ที่ batch ขนาดพอดี L2 ลดได้ไม่มากกว่านี้
+  10x ต้องใช้หลาย core ผ่าน scipy.fft workers= (fft_backend เลือกให้เมื่อเร็วกว่า เช่น Pi 4)
+  --benchmark แสดงเวลา FFT อย่างเดียวไว้เทียบด้วย
+
+Usage:
+python3 spectrum.py --benchmark          # เทียบกับ loop แบบเดิม (10 วินาทีที่ 2.048 Msps)
+                                         # แสดงทั้งผลงานเท่ากัน (ทุก frame) และแบบ subsample
+
+Dependencies:
+pip install numpy
+"""
+
+import sys
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import fft_backend
+from fft_backend import get_window
+
+# จำนวน frame สำหรับกราฟสเปกตรัมแบบ live (opt-in ผ่าน num_averages) - ห้ามใช้กับผลที่บันทึก
+LIVE_DISPLAY_AVERAGES = 500
+
+def frame_matrix(samples, fft_size, overlap=0.5, num_frames=None):
+    """
+    จัด samples เป็น matrix (frames x fft_size) แบบ view (ไม่ copy ข้อมูล)
+
+    overlap: สัดส่วนที่ frame ซ้อนกัน (0 - <1)
+    num_frames: จำนวน frame สูงสุด (None = ทั้งหมด) - ถ้ามี frame มากกว่านี้
+                จะเลือกแบบเว้นระยะเท่าๆ กันทั่วทั้ง samples (ยังเป็น view)
+    """
+    if not 0 <= overlap < 1:
+        raise ValueError("overlap must be in [0, 1)")
+
+    samples = np.asarray(samples)
+    if len(samples) < fft_size:
+        return samples[:0].reshape(0, fft_size)
+
+    step = max(1, int(round(fft_size * (1 - overlap))))
+    frames = sliding_window_view(samples, fft_size)[::step]
+    if num_frames and len(frames) > num_frames:
+        frames = frames[::len(frames) // num_frames][:num_frames]
+    return frames
+
+def welch_psd(samples, fft_size=1024, sample_rate=1.0, center_frequency=0.0,
+              overlap=0.5, window='hann', num_averages=None, scaling='power',
+              shift=True, batch_frames=32):
+    """
+    Welch PSD: ค่าเฉลี่ย |FFT|^2 ของ frame ที่คูณ window แล้ว
+
+    samples: I/Q (complex) หรือสัญญาณจริง - สัญญาณจริงใช้ rfft (ครึ่งเดียว)
+    num_averages: จำนวน frame ที่ใช้เฉลี่ย (None = ใช้ทุก frame) - subsample สำหรับ live display เท่านั้น
+    scaling: 'power' = ค่าเฉลี่ย |FFT|^2 ตรงๆ (เหมือนโค้ด Lab 3 เดิม)
+             'density' = V^2/Hz (หารด้วย sample_rate * sum(window^2))
+    shift: เรียงความถี่จากต่ำไปสูง (fftshift) สำหรับ I/Q
+    batch_frames: จำนวน frame ต่อ FFT หนึ่งครั้ง (32 x 1024 complex64 = 256 KB อยู่ใน L2 cache)
+
+    คืนค่า (frequencies, psd) - psd เป็น float64 linear (ใช้ power_db แปลงเป็น dB)
+    """
+    samples = np.asarray(samples)
+    is_complex = np.iscomplexobj(samples)
+    dtype = np.complex64 if is_complex else np.float32
+    if samples.dtype != dtype:
+        samples = samples.astype(dtype)
+
+    frames = frame_matrix(samples, fft_size, overlap, num_averages)
+    num_frames = len(frames)
+    win = get_window(window, fft_size)
+    transform = fft_backend.fft if is_complex else fft_backend.rfft
+
+    num_bins = fft_size if is_complex else fft_size // 2 + 1
+    psd = np.zeros(num_bins, dtype=np.float64)
+
+    # buffer สำหรับ frame x window ใช้ซ้ำทุก batch
+    windowed = np.empty((min(batch_frames, num_frames), fft_size), dtype=dtype)
+
+    for start in range(0, num_frames, batch_frames):
+        batch = frames[start:start + batch_frames]
+        block = windowed[:len(batch)]
+        np.multiply(batch, win, out=block)
+        spectra = transform(block, axis=1)
+        # |X|^2 รวมทุก frame ในครั้งเดียว: view เป็น (re, im) แล้วรวม re^2 + im^2
+        parts = spectra.view(np.float32 if spectra.dtype == np.complex64 else np.float64)
+        power = np.einsum('ij,ij->j', parts, parts)
+        psd += power[0::2] + power[1::2]
+
+    if num_frames:
+        psd /= num_frames
+
+    if scaling == 'density':
+        psd /= sample_rate * np.sum(win.astype(np.float64) ** 2)
+        if not is_complex:
+            psd[1:-1 if fft_size % 2 == 0 else None] *= 2  # รวมพลังงานความถี่ลบ
+
+    if is_complex:
+        frequencies = np.fft.fftfreq(fft_size, 1 / sample_rate)
+        if shift:
+            frequencies = np.fft.fftshift(frequencies)
+            psd = np.fft.fftshift(psd)
+    else:
+        frequencies = np.fft.rfftfreq(fft_size, 1 / sample_rate)
+
+    return frequencies + center_frequency, psd
+
+class SpectrumAverager:
+    """
+    เฉลี่ยสเปกตรัมแบบ streaming จาก I/Q blocks ที่ทยอยเข้ามา
+
+    mode: 'linear'      = ค่าเฉลี่ยของทุก frame ในช่วง display หนึ่งรอบ (ใช้ทุก sample)
+          'exponential' = ค่าเฉลี่ยถ่วงน้ำหนัก (alpha ต่อ frame) ต่อเนื่องข้ามรอบ
+          'peak'        = ค่าสูงสุดตั้งแต่ reset() (peak-hold)
+    alpha: น้ำหนักของ frame ใหม่ในโหมด exponential หรือกำหนดเป็น time_constant (วินาที)
+    display_rate: จำนวนครั้งต่อวินาทีที่ process() คืนสเปกตรัมใหม่ ไม่ขึ้นกับ input rate
+
+    เก็บเฉพาะ accumulator และเศษ samples ที่ยังไม่ครบ frame - หน่วยความจำ O(fft_size)
+
+    ตัวอย่าง:
+        averager = SpectrumAverager(2048, 2048000, 185.36e6, mode='exponential')
+        for block in rtl.stream_samples():
+            result = averager.process(block)
+            if result:
+                frequencies, power = result
+    """
+
+    MODES = ('linear', 'exponential', 'peak')
+
+    def __init__(self, fft_size=1024, sample_rate=2048000, center_frequency=0.0,
+                 mode='exponential', alpha=0.05, time_constant=None, display_rate=10.0,
+                 overlap=0.0, window='hann'):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown averaging mode: {mode}")
+
+        self.fft_size = fft_size
+        self.sample_rate = sample_rate
+        self.center_frequency = center_frequency
+        self.mode = mode
+        self.alpha = alpha
+        self.display_interval = 1.0 / display_rate if display_rate else 0.0
+        self.step = max(1, int(round(fft_size * (1 - overlap))))
+        if time_constant:
+            self.alpha = min(1.0, self.step / (time_constant * sample_rate))
+        self.window = get_window(window, fft_size)
+
+        self.frequencies = np.fft.fftshift(np.fft.fftfreq(fft_size, 1 / sample_rate)) + center_frequency
+        self.tail = np.zeros(0, dtype=np.complex64)
+        self.last_display = 0.0
+        self.reset()
+
+    def reset(self):
+        """ล้างค่าเฉลี่ย / peak (เช่น หลังเปลี่ยนความถี่)"""
+        self.accumulator = np.zeros(self.fft_size, dtype=np.float64)
+        self.frame_count = 0      # frame ใน accumulator ปัจจุบัน
+        self.total_frames = 0     # frame ทั้งหมดตั้งแต่ reset
+        self.published = None     # สเปกตรัม (linear power, fftshift แล้ว) ที่ส่งออกล่าสุด
+        self.tail = self.tail[:0]
+
+    def set_mode(self, mode):
+        """เปลี่ยน averaging mode (เริ่มเฉลี่ยใหม่)"""
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown averaging mode: {mode}")
+        self.mode = mode
+        self.reset()
+
+    def add_frames(self, power):
+        """รวม |FFT|^2 ของหลาย frame (frames x fft_size) เข้า accumulator"""
+        received = num_frames = len(power)
+        if num_frames == 0:
+            return
+
+        if self.mode == 'linear':
+            self.accumulator += power.sum(axis=0, dtype=np.float64)
+        elif self.mode == 'peak':
+            np.maximum(self.accumulator, power.max(axis=0), out=self.accumulator)
+        else:
+            if self.total_frames == 0:
+                self.accumulator[:] = power[0]
+                power = power[1:]
+                num_frames -= 1
+            # EMA ทีละ frame แบบ vectorized: frame ล่าสุดมีน้ำหนัก alpha, ก่อนหน้าลดลงทีละ (1 - alpha)
+            decay = 1.0 - self.alpha
+            weights = self.alpha * decay ** np.arange(num_frames - 1, -1, -1)
+            self.accumulator *= decay ** num_frames
+            self.accumulator += weights @ power
+
+        self.frame_count += received
+        self.total_frames += received
+
+    def process(self, block):
+        """
+        รับ I/Q block ถัดไป คืน (frequencies, power_db) เมื่อถึงรอบแสดงผล มิฉะนั้นคืน None
+        """
+        buffer = np.concatenate((self.tail, np.asarray(block, dtype=np.complex64)))
+        num_frames = (len(buffer) - self.fft_size) // self.step + 1 if len(buffer) >= self.fft_size else 0
+
+        if num_frames:
+            frames = sliding_window_view(buffer, self.fft_size)[::self.step][:num_frames]
+            for start in range(0, num_frames, 256):
+                spectra = fft_backend.fft(frames[start:start + 256] * self.window, axis=1)
+                self.add_frames(spectra.real ** 2 + spectra.imag ** 2)
+
+        # เก็บเฉพาะ samples ที่ยังไม่ได้เริ่ม frame (น้อยกว่า fft_size)
+        self.tail = buffer[num_frames * self.step:].copy()
+
+        now = time.monotonic()
+        if self.frame_count and now - self.last_display >= self.display_interval:
+            self.last_display = now
+            return self.publish()
+        return None
+
+    def publish(self):
+        """สร้างสเปกตรัมสำหรับแสดงผลจาก accumulator ปัจจุบัน"""
+        if self.mode == 'linear':
+            spectrum = self.accumulator / self.frame_count
+            self.accumulator[:] = 0  # รอบถัดไปเฉลี่ยใหม่จาก frame ของรอบนั้น
+        else:
+            spectrum = self.accumulator.copy()
+
+        self.frame_count = 0
+        self.published = np.fft.fftshift(spectrum)
+        return self.frequencies, power_db(self.published)
+
+    def get_spectrum(self):
+        """สเปกตรัมล่าสุดที่ส่งออก (frequencies, power_db) หรือ (None, None) ถ้ายังไม่มี"""
+        if self.published is None:
+            return None, None
+        return self.frequencies, power_db(self.published)
+
+def power_db(psd):
+    """แปลง power เป็น dB"""
+    return 10 * np.log10(psd + 1e-12)
+
+def legacy_average_spectrum(samples, fft_size=1024):
+    """สเปกตรัมเฉลี่ยแบบเดิมของ lab3_1a/lab3_1b (วน loop ทีละ frame) - ใช้เปรียบเทียบเท่านั้น"""
+    num_ffts = len(samples) // fft_size
+    spectrum = np.zeros(fft_size)
+    for i in range(num_ffts):
+        start_idx = i * fft_size
+        end_idx = start_idx + fft_size
+        window = np.hanning(fft_size)
+        fft_data = np.fft.fft(samples[start_idx:end_idx] * window)
+        spectrum += np.abs(fft_data)**2
+    return spectrum / num_ffts
+
+def benchmark(duration_seconds=10, sample_rate=2048000, fft_size=1024,
+              num_averages=LIVE_DISPLAY_AVERAGES, repeats=3):
+    """
+    เทียบความเร็ว welch_psd กับ loop แบบเดิมบน capture ความยาว duration_seconds
+
+    สัญญาณทดสอบเป็น white noise จึงวัดความแปรปรวนของแต่ละวิธีได้จาก std (dB) ข้าม bins
+    speedup หลักวัดจากงานเท่ากัน (ทุก frame, ไม่ overlap) - แบบ subsample แสดงแยกพร้อม spread
+    โหลดผล FFT benchmark และ warm-up ก่อนจับเวลา แต่ละวิธีใช้เวลาที่ดีที่สุดจาก repeats รอบ
+    """
+    num_samples = int(duration_seconds * sample_rate)
+    rng = np.random.default_rng(1)
+    samples = (rng.standard_normal(num_samples, dtype=np.float32) +
+               1j * rng.standard_normal(num_samples, dtype=np.float32)).astype(np.complex64)
+
+    print(f"Capture: {duration_seconds} s at {sample_rate/1e6:.3f} Msps "
+          f"({num_samples:,} samples), FFT size {fft_size}")
+
+    # เลือก backend และสร้าง twiddle / window ก่อน - ไม่ให้ benchmark ของ fft_backend ปนในเวลาที่วัด
+    fft_backend.load_benchmark()
+    welch_psd(samples[:fft_size * 64], fft_size, sample_rate, overlap=0)
+
+    def run(label, function):
+        elapsed = float('inf')
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            psd = function()
+            elapsed = min(elapsed, time.perf_counter() - start_time)
+        spread = f"   spread {np.std(power_db(psd)):.3f} dB" if psd is not None else ""
+        print(f"{label:<36s} {elapsed*1000:8.1f} ms{spread}")
+        return elapsed, psd
+
+    legacy_time, legacy = run("Per-frame loop (all frames)",
+                              lambda: legacy_average_spectrum(samples, fft_size))
+    full_time, full = run("Batched, all frames, no overlap",
+                          lambda: welch_psd(samples, fft_size, sample_rate, overlap=0,
+                                            shift=False)[1])
+    run("Batched, all frames, 50% overlap",
+        lambda: welch_psd(samples, fft_size, sample_rate, shift=False)[1])
+    live_time, _ = run(f"Live display: {num_averages} averages",
+                       lambda: welch_psd(samples, fft_size, sample_rate,
+                                         num_averages=num_averages)[1])
+    frames = samples[:len(samples) // fft_size * fft_size].reshape(-1, fft_size)
+
+    def fft_only():
+        fft_backend.fft(frames, axis=1)
+
+    fft_time, _ = run("FFT only, all frames (lower bound)", fft_only)
+
+    print(f"Speedup (same work, all frames):  {legacy_time / full_time:5.1f}x "
+          f"(max difference {np.max(np.abs(power_db(full) - power_db(legacy))):.4f} dB)")
+    print(f"Speedup (live display, subsampled): {legacy_time / live_time:5.1f}x "
+          f"- not the same work, higher spread")
+    print(f"FFT-bound limit on this machine:  {legacy_time / fft_time:5.1f}x "
+          f"({fft_backend.select_backend(fft_size, batched=True)})")
+
+    return legacy_time / full_time
+
+def main():
+    """ฟังก์ชันหลัก"""
+    print("=== Lab 3: Batched Welch PSD ===")
+
+    if '--benchmark' in sys.argv:
+        args = [arg for arg in sys.argv[1:] if arg != '--benchmark']
+        benchmark(float(args[0]) if args else 10)
+    else:
+        print("Usage: python3 spectrum.py --benchmark [seconds]")
+
+if __name__ == "__main__":
+    main()
@@ -18,7 +18,6 @@ import subprocess
 import threading
 import time
 from datetime import datetime, timedelta
-from collections import defaultdict
 
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QPushButton,
@@ -34,10 +33,15 @@ import numpy as np
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
 
 # นำเข้า modules จาก Lab 3
 try:
     sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Lab3'))
+    import fft_backend
+    from band_sweep import BandSweeper
+    from block_occupancy import BlockIndex, BlockOccupancyDetector
+    from decimation import minmax_decimate
     from lab3_1a import RTLSDRDataAcquisition
     from lab3_2 import ETIProcessor
     from lab3_3 import ETIFrameParser
@@ -256,6 +260,10 @@ class DABScannerEngine(QThread):
         self.is_scanning = False
         self._stop_flag = False
 
+        # Pre-filter: sweep Band III ครั้งเดียว แล้วสแกนเฉพาะ block ที่มีสัญญาณ
+        self.use_prefilter = True
+        self.occupancy_table = None
+
     def set_scan_mode(self, mode, frequencies=None):
         """ตั้งค่าโหมดการสแกน"""
         self.scan_mode = mode
@@ -264,12 +272,8 @@ class DABScannerEngine(QThread):
         elif mode == 'custom' and frequencies:
             self.frequency_list = frequencies
         elif mode == 'full':
-            # Band III DAB+ frequencies (174-240 MHz)
-            self.frequency_list = []
-            for i in range(5, 14):  # Blocks 5A-13F
-                for block in ['A', 'B', 'C', 'D']:
-                    freq = 174.928 + (i - 5) * 1.712 + ['A', 'B', 'C', 'D'].index(block) * 0.032
-                    self.frequency_list.append(freq)
+            # Band III DAB+ frequencies (174-240 MHz), blocks 5A-13F
+            self.frequency_list = list(BlockIndex().frequencies_mhz)
 
     def run(self):
         """เริ่มการสแกน"""
@@ -288,6 +292,9 @@ class DABScannerEngine(QThread):
             self.eti_processor = ETIProcessor()
             self.eti_parser = ETIFrameParser()
 
+            if self.scan_mode == 'full' and self.use_prefilter:
+                self.frequency_list = self.prefilter_frequencies(self.frequency_list)
+
             total_freqs = len(self.frequency_list)
 
             for i, frequency in enumerate(self.frequency_list):
@@ -304,9 +311,6 @@ class DABScannerEngine(QThread):
                         self.station_found.emit(station)
                         stations_found += 1
 
-                # หน่วงเวลาระหว่างการสแกน
-                self.msleep(500)
-
             self.scan_completed.emit(stations_found)
 
         except Exception as e:
@@ -315,12 +319,39 @@ class DABScannerEngine(QThread):
             self.cleanup()
             self.is_scanning = False
 
+    def prefilter_frequencies(self, frequencies):
+        """ตรวจ occupancy ของทุก block จาก sweep เดียว (~2 วินาที) แทนการ capture 5 วินาทีทุกช่อง"""
+        try:
+            self.scan_progress.emit(0, "ตรวจ occupancy ทั้ง Band III...", frequencies[0])
+
+            sweeper = BandSweeper(sample_rate=self.rtl_sdr.sample_rate)
+            spectrum_frequencies, power_db = sweeper.sweep(sdr=self.rtl_sdr.sdr)
+            detector = BlockOccupancyDetector()
+            self.occupancy_table = detector.detect(spectrum_frequencies, power_db)
+            occupied = self.occupancy_table[self.occupancy_table['occupied']]
+
+            logger.info(f"Pre-filter: {len(occupied)}/{len(self.occupancy_table)} blocks occupied "
+                        f"({', '.join(occupied['block']) or 'none'})")
+
+            # ตัดเฉพาะความถี่ที่ตรงกับ block ว่าง - ความถี่ที่ไม่ตรง block ใดเก็บไว้สแกนตามเดิม
+            occupied_blocks = set(occupied['block'])
+            kept = []
+            for frequency in frequencies:
+                block = detector.index.lookup(frequency)
+                if block is None or block[0] in occupied_blocks:
+                    kept.append(frequency)
+            return kept
+
+        except Exception as e:
+            logger.error(f"Occupancy pre-filter error: {e} - scanning all frequencies")
+            return frequencies
+
     def scan_frequency(self, frequency):
         """สแกนความถี่เฉพาะด้วย Lab 3 pipeline"""
         try:
-            # Step 1: รับ I/Q data
-            self.rtl_sdr.frequency = int(frequency * 1000000)
-            samples = self.rtl_sdr.capture_samples(duration_seconds=5)
+            # Step 1: เปลี่ยนความถี่บน device เดิม (fast retune) แล้วรับ I/Q data 5 วินาทีต่อจากช่วง settling
+            samples = self.rtl_sdr.retune(int(frequency * 1000000),
+                                          num_samples=int(5 * self.rtl_sdr.sample_rate))
 
             if samples is None:
                 return None
@@ -343,7 +374,7 @@ class DABScannerEngine(QThread):
         """แปลง I/Q samples เป็น ETI stream"""
         try:
             # วิเคราะห์ power spectrum เพื่อตรวจหาสัญญาณ DAB+
-            power_spectrum = np.abs(np.fft.fft(samples[:1024])) ** 2
+            power_spectrum = np.abs(fft_backend.fft(samples[:1024])) ** 2
             peak_power = np.max(power_spectrum)
             avg_power = np.mean(power_spectrum)
 
@@ -433,15 +464,118 @@ class DABScannerEngine(QThread):
         except:
             pass
 
+# Sync status เก็บเป็น uint8 (index ในรายการนี้)
+SYNC_STATUSES = ('unknown', 'poor', 'fair', 'good')
+
+class StationSignalRing:
+    """
+    ประวัติสัญญาณของสถานีเดียว: buffer ขนาดคงที่แบบ column (NumPy)
+
+    จองที่เผื่อไว้ (slack) ต่อท้าย capacity - เขียนต่อท้ายไปเรื่อยๆ เมื่อเต็มจึงย้าย
+    capacity samples ล่าสุดกลับไปต้น buffer (ทุก slack ครั้ง, amortized O(1))
+    ช่วงล่าสุด n samples จึงเป็น slice ต่อเนื่องเสมอ - ได้ view โดยไม่ต้อง copy
+    ใช้ ~24 bytes ต่อ sample (list ของ dict + datetime เดิม ~280 bytes)
+    """
+
+    COLUMNS = (('timestamp', np.float64), ('signal_strength', np.float32),
+               ('snr', np.float32), ('ber', np.float32), ('sync_status', np.uint8))
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        size = capacity + max(8, capacity // 8)
+        self.data = np.zeros(size, dtype=list(self.COLUMNS))   # column = self.data[name]
+        self.end = 0      # ตำแหน่งถัดไปที่จะเขียน
+        self.count = 0
+
+    def append(self, timestamp, signal_strength, snr, ber, sync_status='unknown'):
+        """เพิ่ม sample ใหม่ - O(1) (amortized) ทิ้ง sample เก่าสุดเมื่อเต็ม"""
+        sync_code = SYNC_STATUSES.index(sync_status) if sync_status in SYNC_STATUSES else 0
+        values = (timestamp, signal_strength, snr, ber, sync_code)
+
+        if self.end == len(self.data):
+            keep = self.capacity - 1
+            self.data[:keep] = self.data[self.end - keep:self.end]
+            self.end = keep
+
+        self.data[self.end] = values
+        self.end += 1
+        self.count = min(self.count + 1, self.capacity)
+
+    def __len__(self):
+        return self.count
+
+    def window(self, name, count=None):
+        """View ของ column เรียงจากเก่าไปใหม่ (count ล่าสุด หรือทั้งหมด)"""
+        count = self.count if count is None else min(count, self.count)
+        return self.data[name][self.end - count:self.end]
+
+    def window_since(self, name, start_time):
+        """View ของ column ตั้งแต่ start_time (epoch) - หาจุดเริ่มด้วย searchsorted"""
+        timestamps = self.window('timestamp')
+        first = int(np.searchsorted(timestamps, start_time))
+        return self.window(name)[first:]
+
+    def aggregate(self, name, seconds=None):
+        """min / max / mean ของ column ในช่วง seconds ล่าสุด (หรือทั้งหมด)"""
+        values = self.window(name)
+        if seconds is not None and self.count:
+            values = self.window_since(name, self.window('timestamp')[-1] - seconds)
+        if len(values) == 0:
+            return {'min': None, 'max': None, 'mean': None, 'count': 0}
+        return {'min': float(values.min()), 'max': float(values.max()),
+                'mean': float(values.mean()), 'count': len(values)}
+
+    def records(self):
+        """แถวข้อมูลทั้งหมด (timestamp, strength, snr, ber, sync status) สำหรับ export"""
+        for timestamp, strength, snr, ber, sync_code in self.data[self.end - self.count:self.end]:
+            yield (datetime.fromtimestamp(timestamp), float(strength), float(snr),
+                   float(ber), SYNC_STATUSES[sync_code])
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+class SignalHistoryStore:
+    """Ring ต่อสถานี (สร้างเมื่อมีข้อมูลครั้งแรก)"""
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self.stations = {}
+
+    def append(self, station_id, signal_strength, snr, ber, sync_status='unknown', timestamp=None):
+        ring = self.stations.get(station_id)
+        if ring is None:
+            ring = self.stations[station_id] = StationSignalRing(self.capacity)
+        ring.append(time.time() if timestamp is None else timestamp,
+                    signal_strength, snr, ber, sync_status)
+
+    def get(self, station_id):
+        return self.stations.get(station_id)
+
+    def items(self):
+        return self.stations.items()
+
+    def clear(self):
+        self.stations.clear()
+
+    @property
+    def nbytes(self):
+        return sum(ring.nbytes for ring in self.stations.values())
+
 class SignalMonitorWidget(QWidget):
     """Widget สำหรับติดตามคุณภาพสัญญาณแบบ real-time"""
 
     def __init__(self):
         super().__init__()
-        self.setup_ui()
-        self.setup_plot()
-        self.signal_history = defaultdict(list)
         self.max_history = 100
+        self.signal_history = SignalHistoryStore(self.max_history)
+
+        # เส้นกราฟถาวรต่อสถานี: station_id -> (signal, snr, ber) - อัปเดตเฉพาะข้อมูล
+        self.station_lines = {}
+        self.dirty_stations = set()   # สถานีที่มีข้อมูลใหม่ตั้งแต่อัปเดตครั้งก่อน
+        self.time_window = 120        # วินาทีที่แสดงบนแกนเวลา
+        self.background = None        # ภาพแกน/legend ที่เก็บไว้สำหรับ blit
+        self.setup_ui()
 
         # Timer สำหรับอัปเดต
         self.update_timer = QTimer()
@@ -503,76 +637,113 @@ class SignalMonitorWidget(QWidget):
         self.ax_ber.set_title('Bit Error Rate')
         self.ax_ber.set_ylabel('BER')
         self.ax_ber.set_xlabel('Time')
+        self.ax_ber.set_yscale('log')
         self.ax_ber.grid(True, alpha=0.3)
 
+        # เวลาเก็บเป็น epoch (UTC) - แสดงตามเขตเวลาของเครื่อง
+        local_timezone = datetime.now().astimezone().tzinfo
+        for ax in (self.ax_signal, self.ax_snr, self.ax_ber):
+            ax.xaxis_date()
+            ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S', tz=local_timezone))
+
+        # Layout ครั้งเดียว - update_plots ไม่เรียก tight_layout ซ้ำ
         self.figure.tight_layout()
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+    def on_draw(self, event):
+        """เก็บภาพพื้นหลัง (แกน, ticks, legend) หลัง full redraw แล้ววาดเส้นทับ"""
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.draw_lines()
+
+    def draw_lines(self):
+        for lines in self.station_lines.values():
+            for ax, line in zip((self.ax_signal, self.ax_snr, self.ax_ber), lines):
+                ax.draw_artist(line)
 
     def add_signal_data(self, station_id, signal_data):
         """เพิ่มข้อมูลสัญญาณใหม่"""
-        self.signal_history[station_id].append({
-            'timestamp': datetime.now(),
-            'signal_strength': signal_data.get('signal_strength', 0),
-            'snr': signal_data.get('snr', 0),
-            'ber': signal_data.get('ber', 0),
-            'sync_status': signal_data.get('sync_status', 'unknown')
-        })
-
-        # จำกัดข้อมูล
-        if len(self.signal_history[station_id]) > self.max_history:
-            self.signal_history[station_id].pop(0)
+        self.signal_history.append(
+            station_id,
+            signal_data.get('signal_strength', 0),
+            signal_data.get('snr', 0),
+            signal_data.get('ber', 0),
+            signal_data.get('sync_status', 'unknown')
+        )
+        self.dirty_stations.add(station_id)
+
+    def create_station_lines(self, station_id):
+        """สร้างเส้นกราฟของสถานีใหม่ (ครั้งเดียวต่อสถานี)"""
+        colors = ['blue', 'red', 'green', 'orange', 'purple']
+        color = colors[len(self.station_lines) % len(colors)]
+        label = f'Station {station_id}'
+
+        lines = tuple(ax.plot([], [], color=color, label=label, linewidth=2, animated=True)[0]
+                      for ax in (self.ax_signal, self.ax_snr, self.ax_ber))
+        self.station_lines[station_id] = lines
+
+        # Legend เดียวที่กราฟบน สร้างใหม่เฉพาะตอนมีสถานีเพิ่ม
+        self.ax_signal.legend(loc='upper left', fontsize='small',
+                              ncol=max(1, len(self.station_lines) // 8))
+        return lines
 
     def update_plots(self):
-        """อัปเดตกราฟ"""
-        try:
-            # เคลียร์กราฟ
-            self.ax_signal.clear()
-            self.ax_snr.clear()
-            self.ax_ber.clear()
+        """อัปเดตกราฟ (เปลี่ยนข้อมูลของเส้นเดิมเฉพาะสถานีที่มีข้อมูลใหม่)"""
+        # ไม่มีข้อมูลใหม่ หรือ tab ไม่ได้แสดงอยู่ - ไม่ต้องวาด
+        if not self.dirty_stations or not self.isVisible():
+            return
 
-            colors = ['blue', 'red', 'green', 'orange', 'purple']
+        try:
+            axes = (self.ax_signal, self.ax_snr, self.ax_ber)
+            width = self.ax_signal.bbox.width   # ประวัติยาวกว่ากราฟ - วาด min/max ~2 จุดต่อ pixel
+            needs_redraw = self.background is None
+            latest_time = None
 
-            for i, (station_id, history) in enumerate(self.signal_history.items()):
+            for station_id in self.dirty_stations:
+                history = self.signal_history.get(station_id)
                 if not history:
                     continue
 
-                color = colors[i % len(colors)]
-
-                times = [h['timestamp'] for h in history]
-                signals = [h['signal_strength'] for h in history]
-                snrs = [h['snr'] for h in history]
-                bers = [h['ber'] for h in history]
-
-                # กราฟ Signal Strength
-                self.ax_signal.plot(times, signals, color=color,
-                                  label=f'Station {station_id}', linewidth=2)
-
-                # กราฟ SNR
-                self.ax_snr.plot(times, snrs, color=color,
-                               label=f'Station {station_id}', linewidth=2)
-
-                # กราฟ BER
-                self.ax_ber.semilogy(times, bers, color=color,
-                                   label=f'Station {station_id}', linewidth=2)
-
-            # ตั้งค่ากราฟ
-            self.ax_signal.set_title('Signal Strength')
-            self.ax_signal.set_ylabel('dBm')
-            self.ax_signal.grid(True, alpha=0.3)
-            self.ax_signal.legend()
-
-            self.ax_snr.set_title('Signal-to-Noise Ratio')
-            self.ax_snr.set_ylabel('SNR (dB)')
-            self.ax_snr.grid(True, alpha=0.3)
-            self.ax_snr.legend()
-
-            self.ax_ber.set_title('Bit Error Rate')
-            self.ax_ber.set_ylabel('BER')
-            self.ax_ber.set_xlabel('Time')
-            self.ax_ber.grid(True, alpha=0.3)
-            self.ax_ber.legend()
+                lines = self.station_lines.get(station_id)
+                if lines is None:
+                    lines = self.create_station_lines(station_id)
+                    needs_redraw = True     # legend เปลี่ยน
+
+                # epoch (วินาที) -> หน่วยวันของ matplotlib.dates; ค่าอื่นเป็น view ของ ring
+                times = history.window('timestamp') / 86400.0
+                latest_time = max(latest_time or times[-1], times[-1])
+
+                for ax, line, name in zip(axes, lines, ('signal_strength', 'snr', 'ber')):
+                    values = history.window(name)
+                    line.set_data(*minmax_decimate(times, values, width))
+
+                    # แกน log (BER) ไม่แสดงค่า <= 0 เช่น BER เริ่มต้น 0 - ไม่นับเป็นค่าที่ล้นแกน
+                    shown = values[np.isfinite(values)]
+                    if ax.get_yscale() == 'log':
+                        shown = shown[shown > 0]
+                    low, high = ax.get_ylim()
+                    if len(shown) and (shown.min() < low or shown.max() > high):
+                        needs_redraw = True
+
+            self.dirty_stations.clear()
+
+            # แกนเวลาเลื่อนเป็นช่วงๆ (ไม่ใช่ทุก tick) - ระหว่างนั้นใช้ blit ได้
+            window = self.time_window / 86400.0   # วินาที -> หน่วยวันของ matplotlib.dates
+            if latest_time is not None and latest_time > self.ax_signal.get_xlim()[1]:
+                for ax in axes:
+                    ax.set_xlim(latest_time - 0.8 * window, latest_time + 0.2 * window)
+                needs_redraw = True
+
+            if needs_redraw:
+                for ax in axes:
+                    ax.relim(visible_only=True)
+                    ax.autoscale_view(scalex=False)
+                self.canvas.draw_idle()
+                return
 
-            self.figure.tight_layout()
-            self.canvas.draw_idle()
+            # Blit: คืนพื้นหลังแล้ววาดเฉพาะเส้น
+            self.canvas.restore_region(self.background)
+            self.draw_lines()
+            self.canvas.blit(self.figure.bbox)
 
         except Exception as e:
             logger.error(f"Update plots error: {e}")
@@ -589,7 +760,18 @@ class SignalMonitorWidget(QWidget):
     def clear_data(self):
         """เคลียร์ข้อมูล"""
         self.signal_history.clear()
-        self.update_plots()
+        self.dirty_stations.clear()
+
+        for lines in self.station_lines.values():
+            for line in lines:
+                line.remove()
+        self.station_lines.clear()
+
+        legend = self.ax_signal.get_legend()
+        if legend:
+            legend.remove()
+        self.background = None
+        self.canvas.draw_idle()
 
     def export_data(self):
         """ส่งออกข้อมูล"""
@@ -606,15 +788,8 @@ class SignalMonitorWidget(QWidget):
                     writer.writerow(['Station ID', 'Timestamp', 'Signal Strength', 'SNR', 'BER', 'Sync Status'])
 
                     for station_id, history in self.signal_history.items():
-                        for record in history:
-                            writer.writerow([
-                                station_id,
-                                record['timestamp'],
-                                record['signal_strength'],
-                                record['snr'],
-                                record['ber'],
-                                record['sync_status']
-                            ])
+                        for record in history.records():
+                            writer.writerow([station_id, *record])
 
                 QMessageBox.information(self, "ส่งออกสำเร็จ", f"บันทึกไฟล์: {filename}")
 
@@ -803,6 +978,11 @@ class ScanControlWidget(QWidget):
         self.scan_time_spin.setSuffix(" วินาที")
         scan_layout.addWidget(self.scan_time_spin, 2, 1)
 
+        # Pre-filter ด้วย occupancy detector (เฉพาะโหมดสแกนครบทุกช่อง)
+        self.prefilter_check = QCheckBox("ตรวจ occupancy ก่อนสแกน (ข้ามช่องว่าง)")
+        self.prefilter_check.setChecked(True)
+        scan_layout.addWidget(self.prefilter_check, 3, 0, 1, 2)
+
         scan_group.setLayout(scan_layout)
         layout.addWidget(scan_group)
 
@@ -985,6 +1165,7 @@ class Lab4MainWindow(QMainWindow):
                 return
 
             self.scanner.set_scan_mode(mode, frequencies)
+            self.scanner.use_prefilter = self.scan_control.prefilter_check.isChecked()
             self.scanner.start()
 
             self.status_label.setText(f"กำลังสแกน ({mode})...")
@@ -1044,6 +1225,8 @@ def main():
     font.setPointSize(12)
     app.setFont(font)
 
+    fft_backend.load_benchmark()
+
     # สร้างและแสดงหน้าต่างหลัก
     window = Lab4MainWindow()
     window.show()
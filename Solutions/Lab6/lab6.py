@@ -14,6 +14,7 @@ import csv
 import json
 import sqlite3
 import logging
+import time
 import numpy as np
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -36,6 +37,11 @@ from matplotlib.animation import FuncAnimation
 # นำเข้า modules จาก Lab 3
 try:
     sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Lab3'))
+    import fft_backend
+    from iq_file import IQFileReader
+    from spectrum import SpectrumAverager
+    from waterfall import WaterfallBuffer, WaterfallHistory
+    from decimation import minmax_decimate
     from lab3_1a import RTLSDRDataAcquisition
     from lab3_2 import ETIProcessor
     from lab3_3 import ETIFrameParser
@@ -257,19 +263,27 @@ class DABSignalAnalyzer(QThread):
         self.sample_rate = 2048000  # Hz
         self.gain = 'auto'
         self.fft_size = 2048
+        self.stream_block_size = 262144  # samples ต่อ block จาก Lab 3 streaming API
+        self.iq_stream = None
+        self.update_interval = 0.5  # วินาทีระหว่างการวิเคราะห์คุณภาพสัญญาณ / ETI
+        self.iq_file = None  # IQFileReader เมื่อวิเคราะห์จากไฟล์ที่บันทึกไว้
+        self.spectrum_mode = 'exponential'  # linear / exponential / peak
+        self.spectrum_averager = None
+        self.spectrum_updated = False
         self._stop_flag = False
 
     def setup_lab3_pipeline(self):
         """ตั้งค่า Lab 3 pipeline สำหรับการวิเคราะห์"""
         try:
-            # เริ่มต้น RTL-SDR
-            self.rtl_sdr = RTLSDRDataAcquisition()
-            self.rtl_sdr.frequency = int(self.frequency * 1000000)
-            self.rtl_sdr.sample_rate = self.sample_rate
+            # เริ่มต้น RTL-SDR (ไม่ต้องใช้เมื่อวิเคราะห์จากไฟล์)
+            if self.iq_file is None:
+                self.rtl_sdr = RTLSDRDataAcquisition()
+                self.rtl_sdr.frequency = int(self.frequency * 1000000)
+                self.rtl_sdr.sample_rate = self.sample_rate
 
-            if not self.rtl_sdr.setup_rtlsdr():
-                logger.warning("Cannot connect to RTL-SDR, using simulation mode")
-                self.rtl_sdr = None
+                if not self.rtl_sdr.setup_rtlsdr():
+                    logger.warning("Cannot connect to RTL-SDR, using simulation mode")
+                    self.rtl_sdr = None
 
             # เริ่มต้น ETI processor และ parser
             self.eti_processor = ETIProcessor()
@@ -283,6 +297,8 @@ class DABSignalAnalyzer(QThread):
 
     def set_frequency(self, frequency_mhz):
         """ตั้งค่าความถี่ที่จะวิเคราะห์"""
+        if self.iq_file is not None and self.iq_file.center_frequency:
+            return  # วิเคราะห์จากไฟล์ - ใช้ความถี่กลางที่บันทึกไว้ใน sidecar
         self.frequency = frequency_mhz
         if self.rtl_sdr:
             try:
@@ -290,12 +306,37 @@ class DABSignalAnalyzer(QThread):
                 logger.info(f"Set frequency: {frequency_mhz:.3f} MHz")
             except Exception as e:
                 self.error_occurred.emit(f"Set frequency error: {e}")
+        self.spectrum_averager = None  # เริ่มเฉลี่ยใหม่ที่ความถี่ใหม่
+
+    def set_spectrum_mode(self, mode):
+        """เลือกวิธีเฉลี่ยสเปกตรัม: 'linear', 'exponential' หรือ 'peak'"""
+        self.spectrum_mode = mode
+        if self.spectrum_averager:
+            self.spectrum_averager.set_mode(mode)
+
+    def set_input_file(self, filename):
+        """วิเคราะห์จากไฟล์ I/Q ที่บันทึกไว้ (memory-mapped) แทน RTL-SDR"""
+        try:
+            self.iq_file = IQFileReader(filename)
+            self.spectrum_averager = None
+            self.sample_rate = self.iq_file.sample_rate
+            if self.iq_file.center_frequency:
+                self.frequency = self.iq_file.center_frequency / 1e6
+            logger.info(f"Input file: {filename} ({self.iq_file.duration:.1f} s, "
+                        f"{self.iq_file.data_format})")
+            return True
+        except Exception as e:
+            self.iq_file = None
+            self.error_occurred.emit(f"Open I/Q file error: {e}")
+            return False
 
     def set_parameters(self, sample_rate, gain, fft_size):
         """ตั้งค่าพารามิเตอร์การวิเคราะห์"""
-        self.sample_rate = sample_rate
+        # วิเคราะห์จากไฟล์ - sample rate ต้องตรงกับที่บันทึกไว้
+        self.sample_rate = self.iq_file.sample_rate if self.iq_file is not None else sample_rate
         self.gain = gain
         self.fft_size = fft_size
+        self.spectrum_averager = None
 
         if self.rtl_sdr:
             try:
@@ -313,6 +354,20 @@ class DABSignalAnalyzer(QThread):
             self.error_occurred.emit("Cannot setup Lab 3 pipeline")
             return
 
+        try:
+            self.analysis_loop()
+        finally:
+            # ปิด stream ใน thread นี้เอง - generator ปิดจาก GUI thread ขณะอยู่ใน next() ไม่ได้
+            self.close_stream()
+
+    def analysis_loop(self):
+        """
+        Loop วิเคราะห์จนกว่าจะสั่งหยุด
+
+        ทุก block จาก RTL-SDR stream เข้า spectrum averager (ไม่มี sample ถูกข้าม)
+        ส่วนการวิเคราะห์ ETI / คุณภาพสัญญาณทำทุก update_interval วินาทีกับ block ล่าสุด
+        """
+        next_update = 0.0
         while self.is_analyzing and not self._stop_flag:
             try:
                 # Step 1: รับ I/Q data
@@ -323,9 +378,15 @@ class DABSignalAnalyzer(QThread):
 
                 # Step 2: วิเคราะห์สเปกตรัม
                 frequencies, power_spectrum = self.analyze_spectrum(iq_data)
-                if frequencies is not None and power_spectrum is not None:
+                if self.spectrum_updated and frequencies is not None:
                     self.spectrum_ready.emit(frequencies, power_spectrum)
 
+                # stream: รับ block ถัดไปทันที (next() รอข้อมูลเอง) จนถึงรอบวิเคราะห์
+                streaming = self.iq_stream is not None
+                if streaming and time.monotonic() < next_update:
+                    continue
+                next_update = time.monotonic() + self.update_interval
+
                 # Step 3: ประมวลผล ETI (ถ้ามีสัญญาณแรงพอ)
                 eti_analysis = self.process_eti_analysis(iq_data)
 
@@ -340,7 +401,8 @@ class DABSignalAnalyzer(QThread):
                 if eti_analysis:
                     self.eti_analysis_ready.emit(eti_analysis)
 
-                self.msleep(500)  # อัปเดตทุก 0.5 วินาที
+                if not streaming:
+                    self.msleep(int(self.update_interval * 1000))  # ไฟล์ / ข้อมูลจำลอง: อัปเดตทุก 0.5 วินาที
 
             except Exception as e:
                 self.error_occurred.emit(f"Analysis error: {e}")
@@ -349,9 +411,21 @@ class DABSignalAnalyzer(QThread):
     def capture_iq_data(self):
         """รับ I/Q data จาก RTL-SDR"""
         try:
-            if self.rtl_sdr:
-                # ใช้ Lab 3 RTL-SDR capture
-                samples = self.rtl_sdr.capture_samples(duration_seconds=2)
+            if self.iq_file is not None:
+                # อ่านทีละ block จากไฟล์ วนกลับต้นไฟล์เมื่ออ่านจบ
+                samples = self.iq_file.read_next(self.stream_block_size)
+                if len(samples) == 0:
+                    self.iq_file.seek(0)
+                    samples = self.iq_file.read_next(self.stream_block_size)
+                return samples if len(samples) else None
+            elif self.rtl_sdr:
+                # ใช้ Lab 3 streaming API - ประมวลผลทีละ block ขณะที่ข้อมูลเข้ามา
+                if self.iq_stream is None:
+                    self.iq_stream = self.rtl_sdr.stream_samples(block_size=self.stream_block_size)
+
+                samples = next(self.iq_stream, None)
+                if samples is None:
+                    self.iq_stream = None
                 return samples
             else:
                 # สร้างข้อมูลจำลอง
@@ -399,29 +473,19 @@ class DABSignalAnalyzer(QThread):
             return None
 
     def analyze_spectrum(self, iq_data):
-        """วิเคราะห์สเปกตรัมความถี่"""
+        """
+        วิเคราะห์สเปกตรัมความถี่ - เฉลี่ยแบบ streaming ทุก sample ของทุก block
+
+        คืนสเปกตรัมเฉลี่ยล่าสุด และตั้ง spectrum_updated เมื่อถึงรอบแสดงผล (2 ครั้ง/วินาที)
+        """
         try:
-            # ตัดข้อมูลให้เหมาะสมกับ FFT size
-            if len(iq_data) > self.fft_size:
-                iq_data = iq_data[:self.fft_size]
-            elif len(iq_data) < self.fft_size:
-                # Zero padding
-                padded = np.zeros(self.fft_size, dtype=complex)
-                padded[:len(iq_data)] = iq_data
-                iq_data = padded
-
-            # คำนวณ FFT
-            window = np.hanning(self.fft_size)
-            windowed_data = iq_data * window
-            fft_data = np.fft.fft(windowed_data)
-            fft_shifted = np.fft.fftshift(fft_data)
-            power_spectrum = 20 * np.log10(np.abs(fft_shifted) + 1e-12)
-
-            # คำนวณความถี่
-            frequencies = np.fft.fftfreq(self.fft_size, 1/self.sample_rate)
-            frequencies = np.fft.fftshift(frequencies) + self.frequency * 1e6
-
-            return frequencies, power_spectrum
+            if self.spectrum_averager is None:
+                self.spectrum_averager = SpectrumAverager(
+                    self.fft_size, self.sample_rate, self.frequency * 1e6,
+                    mode=self.spectrum_mode, time_constant=1.0, display_rate=2.0)
+
+            self.spectrum_updated = self.spectrum_averager.process(iq_data) is not None
+            return self.spectrum_averager.get_spectrum()
 
         except Exception as e:
             logger.error(f"Spectrum analysis error: {e}")
@@ -767,9 +831,23 @@ class DABSignalAnalyzer(QThread):
         self.is_analyzing = False
         self._stop_flag = True
 
+    def close_stream(self):
+        """หยุด Lab 3 streaming (เรียกจาก thread ที่ใช้ stream เท่านั้น)"""
+        if self.iq_stream is not None:
+            try:
+                self.iq_stream.close()
+            except Exception as e:
+                logger.error(f"Close stream error: {e}")
+            self.iq_stream = None
+
     def cleanup(self):
-        """ทำความสะอาด resources"""
+        """ทำความสะอาด resources (เรียกหลัง thread วิเคราะห์หยุดแล้ว)"""
         try:
+            if self.isRunning():
+                self.stop_analysis()
+                self.wait(3000)
+            if not self.isRunning():
+                self.close_stream()
             if self.rtl_sdr:
                 self.rtl_sdr.cleanup()
         except:
@@ -778,12 +856,22 @@ class DABSignalAnalyzer(QThread):
 class AdvancedSpectrumWidget(QWidget):
     """Widget แสดงสเปกตรัมขั้นสูง พร้อม waterfall display"""
 
+    averaging_changed = pyqtSignal(str)  # 'linear' / 'exponential' / 'peak'
+
     def __init__(self):
         super().__init__()
-        self.setup_ui()
-        self.setup_plots()
-        self.spectrum_history = []
         self.max_history = 200
+        # Ring buffer ขนาดคงที่ (ไม่โตขึ้นตามเวลา) - แถวใหม่แปลงสีครั้งเดียวแล้วเก็บเป็น RGBA
+        self.waterfall = WaterfallBuffer(self.max_history)
+        # ประวัติย้อนหลังหลายระดับเวลา (float16) - ย้อนดูได้ถึง 1 วัน
+        # แยกต่อแกนความถี่ (bins, ความถี่ต่ำสุด, สูงสุด): เปลี่ยนความถี่แล้วกลับมา ประวัติเดิมยังอยู่
+        self.histories = {}
+        self.max_history_axes = 4    # ~14 MB ต่อแกนที่ 2048 bins - ทิ้งแกนที่ใช้นานที่สุดก่อน
+        self.history = WaterfallHistory()
+        self.history_axis = None      # แกนความถี่ของ self.history
+        self.history_span = 0         # 0 = live, อื่นๆ = วินาทีย้อนหลังที่แสดง
+        self.history_drawn = 0.0
+        self.setup_ui()
 
     def setup_ui(self):
         layout = QVBoxLayout()
@@ -809,6 +897,23 @@ class AdvancedSpectrumWidget(QWidget):
             btn.setMinimumHeight(40)
             controls_layout.addWidget(btn)
 
+        # วิธีเฉลี่ยสเปกตรัม (ส่งต่อไปที่ DABSignalAnalyzer.set_spectrum_mode)
+        self.averaging_combo = QComboBox()
+        self.averaging_combo.addItem("Exponential", 'exponential')
+        self.averaging_combo.addItem("Linear", 'linear')
+        self.averaging_combo.addItem("Peak Hold", 'peak')
+        self.averaging_combo.setMinimumHeight(40)
+        controls_layout.addWidget(self.averaging_combo)
+
+        # ช่วงเวลาของ waterfall: live หรือย้อนหลังจาก WaterfallHistory
+        self.history_combo = QComboBox()
+        self.history_combo.addItem("Live", 0)
+        self.history_combo.addItem("Last 10 min", 600)
+        self.history_combo.addItem("Last 1 h", 3600)
+        self.history_combo.addItem("Last 24 h", 86400)
+        self.history_combo.setMinimumHeight(40)
+        controls_layout.addWidget(self.history_combo)
+
         layout.addLayout(controls_layout)
         self.setLayout(layout)
 
@@ -817,6 +922,9 @@ class AdvancedSpectrumWidget(QWidget):
         self.clear_btn.clicked.connect(self.clear_display)
         self.save_btn.clicked.connect(self.save_plots)
         self.waterfall_btn.clicked.connect(self.toggle_waterfall)
+        self.averaging_combo.currentIndexChanged.connect(
+            lambda index: self.averaging_changed.emit(self.averaging_combo.itemData(index)))
+        self.history_combo.currentIndexChanged.connect(self.set_history_span)
 
         self.frozen = False
         self.show_waterfall = True
@@ -836,48 +944,121 @@ class AdvancedSpectrumWidget(QWidget):
         self.ax_waterfall = self.figure.add_subplot(2, 1, 2)
         self.ax_waterfall.set_title('Waterfall Display')
         self.ax_waterfall.set_xlabel('Frequency (MHz)')
-        self.ax_waterfall.set_ylabel('Time')
+        self.ax_waterfall.set_ylabel('Time (samples)')
+
+        # Artists ถาวร - update_spectrum เปลี่ยนเฉพาะข้อมูล (animated = วาดเองด้วย blit)
+        self.spectrum_line, = self.ax_spectrum.plot([], [], 'b-', linewidth=1, animated=True)
+        self.waterfall_image = self.ax_waterfall.imshow(
+            np.zeros((self.max_history, 1, 4), dtype=np.uint8),
+            aspect='auto',
+            extent=[0, 1, 0, self.max_history],
+            interpolation='nearest',
+            origin='lower',
+            animated=True
+        )
+        self.spectrum_axis = None   # (bins, first, last) ของแกนความถี่ปัจจุบัน
+        self.background = None
 
         self.figure.tight_layout()
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+    def on_draw(self, event):
+        """เก็บภาพพื้นหลัง (แกน, grid, label) หลัง full redraw แล้ววาด artists ทับ"""
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.draw_artists()
+
+    def draw_artists(self):
+        self.ax_spectrum.draw_artist(self.spectrum_line)
+        if self.show_waterfall:
+            self.ax_waterfall.draw_artist(self.waterfall_image)
+
+    def configure_axes(self, freq_mhz, powers):
+        """ตั้งแกนใหม่เมื่อความถี่/ช่วง power เปลี่ยน (ต้อง full redraw - เกิดไม่บ่อย)"""
+        self.spectrum_axis = (len(freq_mhz), freq_mhz[0], freq_mhz[-1])
+        self.ax_spectrum.set_xlim(freq_mhz[0], freq_mhz[-1])
+        self.ax_spectrum.set_ylim(np.min(powers) - 10, np.max(powers) + 10)
+        self.ax_waterfall.set_xlim(freq_mhz[0], freq_mhz[-1])
+        self.waterfall_image.set_extent([freq_mhz[0], freq_mhz[-1], 0, self.max_history])
+        self.waterfall.set_levels(np.percentile(powers, 5) - 5, np.max(powers) + 5)
+        self.canvas.draw_idle()
+
+    def history_rgba(self):
+        """ภาพ RGBA ของประวัติช่วง history_span ล่าสุด ขนาดเท่า waterfall บนจอ"""
+        now = datetime.now().timestamp()
+        _, image = self.history.window(now - self.history_span, now, self.max_history,
+                                       self.ax_waterfall.bbox.width)
+        self.history_drawn = now
+        return self.waterfall.colorize(image)
+
+    def select_history(self, axis):
+        """ใช้ประวัติของแกนความถี่ axis (สร้างใหม่ถ้ายังไม่มี)"""
+        history = self.histories.pop(axis, None)
+        if history is None:
+            history = WaterfallHistory()
+            history.reset(axis[0])
+        self.histories[axis] = history  # แกนที่ใช้ล่าสุดอยู่ท้าย dict
+        while len(self.histories) > self.max_history_axes:
+            del self.histories[next(iter(self.histories))]
+
+        self.history = history
+        self.history_axis = axis
+
+    def set_history_span(self, index):
+        """เลือกช่วงเวลาของ waterfall (live หรือย้อนหลัง)"""
+        self.history_span = self.history_combo.itemData(index)
+        label = self.history_combo.itemText(index)
+        if self.history_span and self.history.levels:
+            self.waterfall_image.set_data(self.history_rgba())
+            self.ax_waterfall.set_ylabel(f'Time ({label.lower()})')
+        else:
+            if self.waterfall.rgba() is not None:
+                self.waterfall_image.set_data(self.waterfall.rgba())
+            self.ax_waterfall.set_ylabel('Time (samples)')
+        self.canvas.draw_idle()
 
     def update_spectrum(self, frequencies, powers):
-        """อัปเดตสเปกตรัม"""
+        """อัปเดตสเปกตรัม (เปลี่ยนข้อมูลของ artists เดิม แล้ว blit)"""
+        try:
+            # ประวัติบันทึกต่อแม้ freeze อยู่
+            axis = (len(frequencies), float(frequencies[0]), float(frequencies[-1]))
+            if axis != self.history_axis:
+                self.select_history(axis)
+            self.history.push(powers)
+        except Exception as e:
+            logger.error(f"Spectrum history error: {e}")
+
         if self.frozen:
             return
 
         try:
             freq_mhz = frequencies / 1e6
 
-            # อัปเดต spectrum plot
-            self.ax_spectrum.clear()
-            self.ax_spectrum.plot(freq_mhz, powers, 'b-', linewidth=1)
-            self.ax_spectrum.set_title('Real-time Spectrum')
-            self.ax_spectrum.set_ylabel('Power (dB)')
-            self.ax_spectrum.grid(True, alpha=0.3)
-
-            # เพิ่มเข้า history สำหรับ waterfall
-            self.spectrum_history.append(powers.copy())
-            if len(self.spectrum_history) > self.max_history:
-                self.spectrum_history.pop(0)
-
-            # อัปเดต waterfall
-            if self.show_waterfall and len(self.spectrum_history) > 1:
-                waterfall_data = np.array(self.spectrum_history)
-                self.ax_waterfall.clear()
-
-                extent = [freq_mhz[0], freq_mhz[-1], 0, len(self.spectrum_history)]
-                im = self.ax_waterfall.imshow(
-                    waterfall_data,
-                    aspect='auto',
-                    extent=extent,
-                    cmap='viridis',
-                    origin='lower'
-                )
-                self.ax_waterfall.set_title('Waterfall Display')
-                self.ax_waterfall.set_xlabel('Frequency (MHz)')
-                self.ax_waterfall.set_ylabel('Time (samples)')
-
-            self.canvas.draw_idle()
+            # เขียนแถวใหม่ลง ring buffer ของ waterfall (ไม่มีการจองหน่วยความจำใหม่)
+            self.waterfall.push(powers)
+            # เส้นสเปกตรัม ~2 จุดต่อ pixel (min/max) - เวลาวาดขึ้นกับความกว้างกราฟ ไม่ใช่ FFT size
+            self.spectrum_line.set_data(
+                *minmax_decimate(freq_mhz, powers, self.ax_spectrum.bbox.width))
+            if not self.history_span:
+                self.waterfall_image.set_data(self.waterfall.rgba())
+            elif datetime.now().timestamp() - self.history_drawn >= 1.0:
+                # ภาพย้อนหลังเปลี่ยนช้า - ดึงจากประวัติไม่เกินวินาทีละครั้ง
+                self.waterfall_image.set_data(self.history_rgba())
+
+            low, high = self.ax_spectrum.get_ylim()
+            axis = (len(freq_mhz), freq_mhz[0], freq_mhz[-1])
+            if (axis != self.spectrum_axis or np.max(powers) > high or
+                    np.max(powers) < low + (high - low) / 3):
+                self.configure_axes(freq_mhz, powers)
+                return
+
+            if self.background is None:
+                self.canvas.draw_idle()
+                return
+
+            # Blit: คืนพื้นหลัง แล้ววาดเฉพาะเส้นสเปกตรัมและภาพ waterfall
+            self.canvas.restore_region(self.background)
+            self.draw_artists()
+            self.canvas.blit(self.figure.bbox)
 
         except Exception as e:
             logger.error(f"Spectrum update error: {e}")
@@ -891,14 +1072,16 @@ class AdvancedSpectrumWidget(QWidget):
         """เปิด/ปิด waterfall display"""
         self.show_waterfall = not self.show_waterfall
         self.waterfall_btn.setText("Hide Waterfall" if self.show_waterfall else "Show Waterfall")
+        self.canvas.draw_idle()
 
     def clear_display(self):
         """เคลียร์การแสดงผล"""
-        self.spectrum_history.clear()
-        self.ax_spectrum.clear()
-        self.ax_waterfall.clear()
-        self.setup_plots()
-        self.canvas.draw()
+        self.waterfall.reset()
+        self.spectrum_line.set_data([], [])
+        if self.waterfall.rgba() is not None:
+            self.waterfall_image.set_data(self.waterfall.rgba())
+        self.spectrum_axis = None
+        self.canvas.draw_idle()
 
     def save_plots(self):
         """บันทึกกราฟ"""
@@ -911,7 +1094,15 @@ class AdvancedSpectrumWidget(QWidget):
             )
 
             if filename:
-                self.figure.savefig(filename, dpi=300, bbox_inches='tight')
+                # savefig ไม่วาด animated artists - ปิดชั่วคราวระหว่างบันทึก
+                for artist in (self.spectrum_line, self.waterfall_image):
+                    artist.set_animated(False)
+                try:
+                    self.figure.savefig(filename, dpi=300, bbox_inches='tight')
+                finally:
+                    for artist in (self.spectrum_line, self.waterfall_image):
+                        artist.set_animated(True)
+                    self.canvas.draw_idle()
                 QMessageBox.information(self, "Saved", f"Plots saved to: {filename}")
 
         except Exception as e:
@@ -1067,6 +1258,7 @@ class AnalysisControlPanel(QWidget):
     analysis_started = pyqtSignal(dict)
     analysis_stopped = pyqtSignal()
     frequency_changed = pyqtSignal(float)
+    input_file_selected = pyqtSignal(str)  # ไฟล์ I/Q ที่บันทึกไว้ (แทน RTL-SDR)
 
     def __init__(self):
         super().__init__()
@@ -1144,8 +1336,9 @@ class AnalysisControlPanel(QWidget):
         self.start_btn = QPushButton("Start Analysis")
         self.stop_btn = QPushButton("Stop Analysis")
         self.export_btn = QPushButton("Export Data")
+        self.open_btn = QPushButton("Open I/Q File")
 
-        for btn in [self.start_btn, self.stop_btn, self.export_btn]:
+        for btn in [self.start_btn, self.stop_btn, self.export_btn, self.open_btn]:
             btn.setMinimumHeight(48)
 
         self.stop_btn.setEnabled(False)
@@ -1154,6 +1347,7 @@ class AnalysisControlPanel(QWidget):
         buttons_layout.addWidget(self.stop_btn)
         buttons_layout.addWidget(self.export_btn)
         layout.addLayout(buttons_layout)
+        layout.addWidget(self.open_btn)
 
         self.setLayout(layout)
 
@@ -1163,6 +1357,7 @@ class AnalysisControlPanel(QWidget):
         self.start_btn.clicked.connect(self.start_analysis)
         self.stop_btn.clicked.connect(self.stop_analysis)
         self.export_btn.clicked.connect(self.export_data)
+        self.open_btn.clicked.connect(self.open_input_file)
 
     def set_frequency(self, frequency_khz):
         """ตั้งค่าความถี่"""
@@ -1207,6 +1402,15 @@ class AnalysisControlPanel(QWidget):
         self.start_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
 
+    def open_input_file(self):
+        """เลือกไฟล์ I/Q ที่บันทึกไว้ (cu8/cs16/cf32 + .sigmf-meta) มาวิเคราะห์แทน RTL-SDR"""
+        filename, _ = QFileDialog.getOpenFileName(
+            self, "Open I/Q Recording", "",
+            "I/Q Files (*.cu8 *.cs16 *.cf32 *.bin);;All Files (*)"
+        )
+        if filename:
+            self.input_file_selected.emit(filename)
+
     def export_data(self):
         """ส่งออกข้อมูล"""
         try:
@@ -1241,6 +1445,10 @@ class Lab6MainWindow(QMainWindow):
         if '--fullscreen' in sys.argv:
             self.showFullScreen()
 
+        # python3 lab6.py --input raw_iq_000.cu8 - วิเคราะห์ไฟล์ที่บันทึกไว้แทน RTL-SDR
+        if '--input' in sys.argv[:-1]:
+            self.open_input_file(sys.argv[sys.argv.index('--input') + 1])
+
     def setup_ui(self):
         """สร้าง UI หลัก"""
         central_widget = QWidget()
@@ -1291,10 +1499,12 @@ class Lab6MainWindow(QMainWindow):
         self.control_panel.analysis_started.connect(self.start_analysis)
         self.control_panel.analysis_stopped.connect(self.stop_analysis)
         self.control_panel.frequency_changed.connect(self.analyzer.set_frequency)
+        self.control_panel.input_file_selected.connect(self.open_input_file)
 
         # Analyzer
         self.analyzer.measurement_ready.connect(self.on_measurement_ready)
         self.analyzer.spectrum_ready.connect(self.spectrum_widget.update_spectrum)
+        self.spectrum_widget.averaging_changed.connect(self.analyzer.set_spectrum_mode)
         self.analyzer.eti_analysis_ready.connect(self.on_eti_analysis_ready)
         self.analyzer.error_occurred.connect(self.show_error)
 
@@ -1315,6 +1525,15 @@ class Lab6MainWindow(QMainWindow):
         except Exception as e:
             self.show_error(f"Start analysis error: {e}")
 
+    def open_input_file(self, filename):
+        """ใช้ไฟล์ I/Q เป็น input ของการวิเคราะห์ (หยุดการวิเคราะห์ที่ทำอยู่ก่อน)"""
+        if self.analyzer.isRunning():
+            self.control_panel.stop_analysis()
+
+        if self.analyzer.set_input_file(filename):
+            self.control_panel.set_frequency(self.analyzer.frequency * 1000)
+            self.status_label.setText(f"Input file: {os.path.basename(filename)} - press Start Analysis")
+
     def stop_analysis(self):
         """หยุดการวิเคราะห์"""
         try:
@@ -1390,6 +1609,8 @@ def main():
     font.setPointSize(12)
     app.setFont(font)
 
+    fft_backend.load_benchmark()
+
     # สร้างและแสดงหน้าต่างหลัก
     window = Lab6MainWindow()
     window.show()